@@ -0,0 +1,51 @@
+"""JSON encoding shared by the client, database and HTTP services.
+
+orjson is used when installed (``pip install agentpass[fast]``), with the
+stdlib as the fallback for anything orjson handles differently, so callers
+get the same values either way:
+
+- Non-finite floats are written as the stdlib's ``NaN`` / ``Infinity``
+  literals (orjson would write ``null``) and parsed back to floats.
+- Integers beyond 64 bits are written and parsed exactly (orjson rejects
+  them when encoding and rounds them to floats when decoding).
+- Non-str dict keys are coerced to strings, as the stdlib does.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speedup (pip install agentpass[fast])
+    orjson = None
+
+# A run of 19+ digits may be an integer outside orjson's 64-bit range
+_LONG_INT_RE = re.compile(r"\d{19}")
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize *obj* to a JSON string."""
+    if orjson is not None:
+        try:
+            out = orjson.dumps(obj)
+        except TypeError:  # non-str keys, ints beyond 64 bits
+            pass
+        else:
+            # orjson writes NaN/Infinity as null, indistinguishable from None,
+            # so only null-free output is known to match the stdlib's
+            if b"null" not in out:
+                return out.decode()
+    return json.dumps(obj)
+
+
+def json_loads(data: str) -> Any:
+    """Parse a JSON document; malformed input raises json.JSONDecodeError."""
+    if orjson is not None and _LONG_INT_RE.search(data) is None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:  # NaN/Infinity literals, which the stdlib accepts
+            pass
+    return json.loads(data)
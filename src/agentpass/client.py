@@ -8,6 +8,8 @@ import json
 
 import websockets
 
+from agentpass._json import json_dumps, json_loads
+
 # ---------------------------------------------------------------------------
 # Error hierarchy
 # ---------------------------------------------------------------------------
@@ -88,7 +90,7 @@ class AgentPassClient:
             raise AgentPassConnectionError(-1, "Client is closed")
 
         await self._ws.send(
-            json.dumps(
+            json_dumps(
                 {
                     "jsonrpc": "2.0",
                     "method": "tool_request",
@@ -111,7 +113,7 @@ class AgentPassClient:
             await self._connected.wait()
 
         await self._ws.send(
-            json.dumps(
+            json_dumps(
                 {
                     "jsonrpc": "2.0",
                     "method": "list_tools",
@@ -131,7 +133,7 @@ class AgentPassClient:
         self._pending[request_id] = future
 
         await self._ws.send(
-            json.dumps(
+            json_dumps(
                 {
                     "jsonrpc": "2.0",
                     "method": "get_pending_results",
@@ -180,7 +182,7 @@ class AgentPassClient:
     async def _authenticate(self) -> None:
         """Send auth, validate response."""
         await self._ws.send(
-            json.dumps(
+            json_dumps(
                 {
                     "jsonrpc": "2.0",
                     "method": "auth",
@@ -190,7 +192,7 @@ class AgentPassClient:
             )
         )
         raw = await self._ws.recv()
-        msg = json.loads(raw)
+        msg = json_loads(raw)
         if "error" in msg:
             err = msg["error"]
             raise AgentPassConnectionError(
@@ -206,7 +208,7 @@ class AgentPassClient:
         try:
             async for raw in self._ws:
                 try:
-                    msg = json.loads(raw)
+                    msg = json_loads(raw)
                 except json.JSONDecodeError:
                     continue  # Skip malformed messages
 
@@ -252,7 +254,7 @@ class AgentPassClient:
             result_str = item.get("result")
             if isinstance(result_str, str):
                 try:
-                    parsed = json.loads(result_str)
+                    parsed = json_loads(result_str)
                 except json.JSONDecodeError:
                     continue
             elif isinstance(result_str, dict):
@@ -328,7 +330,7 @@ class AgentPassClient:
             return
         request_id = self._next_id()
         await self._ws.send(
-            json.dumps(
+            json_dumps(
                 {
                     "jsonrpc": "2.0",
                     "method": "get_pending_results",
@@ -338,7 +340,7 @@ class AgentPassClient:
             )
         )
         raw = await self._ws.recv()
-        msg = json.loads(raw)
+        msg = json_loads(raw)
         if "error" not in msg:
             results = msg.get("result", {}).get("results", [])
             self._resolve_offline_results(results)
@@ -4,12 +4,21 @@ from __future__ import annotations
 
 import os
 import re
+import sys
+from collections import OrderedDict
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+# Prefer the libyaml-backed C loader; fall back to the pure-Python one.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
 
 class ConfigError(Exception):
     """Raised on configuration loading or validation errors."""
@@ -28,20 +37,43 @@ def _replacer(match: re.Match) -> str:
     return val
 
 
+def _substitute_str(value: str) -> str:
+    """Substitute ${VAR} in a single string, skipping the regex when absent."""
+    return _ENV_VAR_RE.sub(_replacer, value) if "${" in value else value
+
+
 def substitute_env_vars(obj: Any) -> Any:
-    """Recursively substitute ${VAR} in all string values."""
+    """Substitute ${VAR} in all string values of a parsed YAML tree.
+
+    Dicts and lists are walked iteratively and updated in place (the same
+    object is returned), so no copy of the tree is built.
+    """
     if isinstance(obj, str):
-        return _ENV_VAR_RE.sub(_replacer, obj)
-    if isinstance(obj, dict):
-        return {k: substitute_env_vars(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [substitute_env_vars(item) for item in obj]
+        return _substitute_str(obj)
+    if not isinstance(obj, dict | list):
+        return obj
+
+    stack = [obj]
+    seen: set[int] = set()  # YAML aliases can share containers
+    while stack:
+        container = stack.pop()
+        if id(container) in seen:
+            continue
+        seen.add(id(container))
+        items = container.items() if isinstance(container, dict) else enumerate(container)
+        for key, value in list(items):
+            if isinstance(value, str):
+                new = _substitute_str(value)
+                if new is not value:
+                    container[key] = new
+            elif isinstance(value, dict | list):
+                stack.append(value)
     return obj
 
 
 def substitute_env_vars_in_text(text: str) -> str:
     """Substitute ${VAR} in raw text before YAML parsing."""
-    return _ENV_VAR_RE.sub(_replacer, text)
+    return _substitute_str(text)  # most config files have no placeholders
 
 
 # --- Config dataclasses ---
@@ -72,6 +104,9 @@ class TelegramConfig:
     token: str
     chat_id: int
     allowed_users: list[int]
+    # Edit the prompt when it is resolved; when False, the guardian only gets a
+    # toast and timeouts leave the message untouched (one API call instead of two)
+    edit_on_resolve: bool = True
 
 
 @dataclass
@@ -90,6 +125,7 @@ class StorageConfig:
 class RateLimitConfig:
     max_pending_approvals: int = 10
     max_requests_per_minute: int = 60
+    max_concurrent_per_service: int = 16
 
 
 @dataclass
@@ -119,9 +155,16 @@ class RequestDefinition:
     body_exclude: list[str] | None = None
 
 
+@dataclass
+class ResponseFilter:
+    field: str  # item key to test, e.g. "entity_id"
+    prefix: str  # "{domain}." -- applied only when all referenced args are given
+
+
 @dataclass
 class ResponseDefinition:
     wrap: str | None = None  # wrap response in {wrap: data}
+    filter: ResponseFilter | None = None  # drop list items not matching the prefix
 
 
 @dataclass
@@ -205,17 +248,88 @@ def _coerce_int(value: Any, field_name: str) -> int:
         raise ConfigError(f"Cannot convert {field_name} to int: {value!r}") from None
 
 
+# --- Load cache ---
+
+_LOAD_CACHE_SIZE = 16
+
+
+def _file_stamp(path: str | Path) -> tuple[int, int]:
+    """Return (mtime_ns, size) used to detect file changes."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+@dataclass
+class _LoadDeps:
+    """Files and env vars a loaded config object was derived from."""
+
+    files: dict[str, tuple[int, int]] = field(default_factory=dict)
+    env: dict[str, str | None] = field(default_factory=dict)
+
+    def is_current(self) -> bool:
+        """Return True if no recorded file or env var has changed."""
+        for path, stamp in self.files.items():
+            try:
+                if _file_stamp(path) != stamp:
+                    return False
+            except OSError:
+                return False
+        return all(os.environ.get(var) == val for var, val in self.env.items())
+
+
+# (loader kind, absolute path) -> (dependencies, parsed result), least recent first
+_LOAD_CACHE: OrderedDict[tuple[str, str], tuple[_LoadDeps, Any]] = OrderedDict()
+
+
+def _cached_load(kind: str, path: str, parse: Callable[[str, _LoadDeps], Any], force: bool) -> Any:
+    """Return a cached parse result for *path*, re-parsing if stale or *force*."""
+    key = (kind, os.path.abspath(path))
+    entry = _LOAD_CACHE.get(key)
+    if not force and entry is not None and entry[0].is_current():
+        _LOAD_CACHE.move_to_end(key)
+        return entry[1]
+
+    deps = _LoadDeps()
+    result = parse(path, deps)
+    _LOAD_CACHE[key] = (deps, result)
+    _LOAD_CACHE.move_to_end(key)
+    while len(_LOAD_CACHE) > _LOAD_CACHE_SIZE:
+        _LOAD_CACHE.popitem(last=False)
+    return result
+
+
+def _read_yaml(p: Path, deps: _LoadDeps | None = None) -> Any:
+    """Read a YAML file with ${VAR} substitution, recording it in *deps*."""
+    if deps is not None:
+        deps.files[str(p.resolve())] = _file_stamp(p)
+    with open(p) as f:
+        text = f.read()
+    if deps is not None:
+        for var in _ENV_VAR_RE.findall(text):
+            deps.env[var] = os.environ.get(var)
+    return yaml.load(substitute_env_vars_in_text(text), Loader=_YamlLoader)
+
+
 # --- Loaders ---
 
 
-def load_config(path: str = "config.yaml") -> Config:
-    """Load and validate config.yaml, returning a typed Config."""
+def load_config(path: str = "config.yaml", *, force: bool = False) -> Config:
+    """Load and validate config.yaml, returning a typed Config.
+
+    Results are cached until the config file, any referenced tools file, or
+    a referenced env var changes.  Pass ``force=True`` to bypass the cache
+    (e.g. for hot reload).  The returned Config is shared and must not be
+    mutated.
+    """
+    return _cached_load("config", path, _parse_config, force)
+
+
+def _parse_config(path: str, deps: _LoadDeps | None = None) -> Config:
     p = Path(path)
     if not p.exists():
         raise ConfigError(f"Config file not found: {path}")
 
-    with open(p) as f:
-        raw = yaml.safe_load(substitute_env_vars_in_text(f.read()))
+    raw = _read_yaml(p, deps)
 
     # Gateway
     gw_raw = _require(raw, "gateway", "")
@@ -268,7 +382,18 @@ def load_config(path: str = "config.yaml") -> Config:
         allowed_users = [
             _coerce_int(u, "messenger.telegram.allowed_users[]") for u in allowed_users
         ]
-        telegram_cfg = TelegramConfig(token=tg_token, chat_id=chat_id, allowed_users=allowed_users)
+        edit_on_resolve = tg_raw.get("edit_on_resolve", True)
+        if not isinstance(edit_on_resolve, bool):
+            raise ConfigError(
+                f"messenger.telegram.edit_on_resolve must be true or false, "
+                f"got: {edit_on_resolve!r}"
+            )
+        telegram_cfg = TelegramConfig(
+            token=tg_token,
+            chat_id=chat_id,
+            allowed_users=allowed_users,
+            edit_on_resolve=edit_on_resolve,
+        )
 
     messenger = MessengerConfig(type=msg_type, telegram=telegram_cfg)
 
@@ -329,7 +454,7 @@ def load_config(path: str = "config.yaml") -> Config:
         if tools_file:
             config_dir = Path(path).parent
             tools_path = str(config_dir / tools_file)
-            tools = load_tools_file(tools_path, svc_name)
+            tools = _parse_tools_file(tools_path, svc_name, deps)
 
         services[svc_name] = ServiceConfig(
             name=svc_name,
@@ -361,9 +486,16 @@ def load_config(path: str = "config.yaml") -> Config:
     if not isinstance(approval_timeout, int) or approval_timeout <= 0:
         raise ConfigError(f"approval_timeout must be a positive integer, got: {approval_timeout!r}")
     rate_limit_raw = raw.get("rate_limit", {})
+    max_concurrent = rate_limit_raw.get("max_concurrent_per_service", 16)
+    if not isinstance(max_concurrent, int) or max_concurrent <= 0:
+        raise ConfigError(
+            f"rate_limit.max_concurrent_per_service must be a positive integer, "
+            f"got: {max_concurrent!r}"
+        )
     rate_limit = RateLimitConfig(
         max_pending_approvals=rate_limit_raw.get("max_pending_approvals", 10),
         max_requests_per_minute=rate_limit_raw.get("max_requests_per_minute", 60),
+        max_concurrent_per_service=max_concurrent,
     )
 
     return Config(
@@ -377,14 +509,20 @@ def load_config(path: str = "config.yaml") -> Config:
     )
 
 
-def load_permissions(path: str = "permissions.yaml") -> Permissions:
-    """Load and parse permissions.yaml into typed Permissions."""
+def load_permissions(path: str = "permissions.yaml", *, force: bool = False) -> Permissions:
+    """Load and parse permissions.yaml into typed Permissions.
+
+    Cached like load_config(); pass ``force=True`` to bypass the cache.
+    """
+    return _cached_load("permissions", path, _parse_permissions, force)
+
+
+def _parse_permissions(path: str, deps: _LoadDeps | None = None) -> Permissions:
     p = Path(path)
     if not p.exists():
         raise ConfigError(f"Permissions file not found: {path}")
 
-    with open(p) as f:
-        raw = yaml.safe_load(substitute_env_vars_in_text(f.read()))
+    raw = _read_yaml(p, deps)
 
     _VALID_ACTIONS = {"allow", "deny", "ask"}
 
@@ -393,6 +531,7 @@ def load_permissions(path: str = "permissions.yaml") -> Permissions:
         action = item["action"]
         if action not in _VALID_ACTIONS:
             raise ConfigError(f"Invalid permission action: {action!r} (must be allow/deny/ask)")
+        action = sys.intern(action)
         defaults.append(
             PermissionRule(
                 pattern=item["pattern"],
@@ -406,6 +545,7 @@ def load_permissions(path: str = "permissions.yaml") -> Permissions:
         action = item["action"]
         if action not in _VALID_ACTIONS:
             raise ConfigError(f"Invalid permission action: {action!r} (must be allow/deny/ask)")
+        action = sys.intern(action)
         rules.append(
             PermissionRule(
                 pattern=item["pattern"],
@@ -426,12 +566,17 @@ def load_tools_file(path: str, service_name: str) -> list[ToolDefinition]:
     - Compiles validation regexes at load time (raise ConfigError if invalid)
     - Returns list of ToolDefinition objects
     """
+    return _parse_tools_file(path, service_name)
+
+
+def _parse_tools_file(
+    path: str, service_name: str, deps: _LoadDeps | None = None
+) -> list[ToolDefinition]:
     p = Path(path)
     if not p.exists():
         raise ConfigError(f"Tools file not found: {path}")
 
-    with open(p) as f:
-        raw = yaml.safe_load(substitute_env_vars_in_text(f.read()))
+    raw = _read_yaml(p, deps)
 
     if raw is None:
         return []
@@ -441,7 +586,13 @@ def load_tools_file(path: str, service_name: str) -> list[ToolDefinition]:
         return []
 
     result: list[ToolDefinition] = []
+    # Tool and service names are looked up on every request; interning them
+    # lets those dict lookups short-circuit on identity.
+    service_name = sys.intern(service_name)
     for tool_name, tool_data in tools_raw.items():
+        if not isinstance(tool_name, str):
+            raise ConfigError(f"Tool name must be a string, got {tool_name!r}")
+        tool_name = sys.intern(tool_name)
         if tool_data is None:
             tool_data = {}
 
@@ -478,8 +629,18 @@ def load_tools_file(path: str, service_name: str) -> list[ToolDefinition]:
         response: ResponseDefinition | None = None
         resp_raw = tool_data.get("response")
         if resp_raw is not None:
+            resp_filter: ResponseFilter | None = None
+            filter_raw = resp_raw.get("filter")
+            if filter_raw is not None:
+                if not isinstance(filter_raw, dict):
+                    raise ConfigError(f"Tool '{tool_name}' response.filter must be a mapping")
+                resp_filter = ResponseFilter(
+                    field=_require(filter_raw, "field", f"tools.{tool_name}.response.filter"),
+                    prefix=_require(filter_raw, "prefix", f"tools.{tool_name}.response.filter"),
+                )
             response = ResponseDefinition(
                 wrap=resp_raw.get("wrap"),
+                filter=resp_filter,
             )
 
         result.append(
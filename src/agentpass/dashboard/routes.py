@@ -16,7 +16,7 @@ from agentpass.db import Database
 logger = logging.getLogger("agentpass.dashboard")
 
 _db_key = web.AppKey("db", Database)
-_jinja2_key = web.AppKey("jinja2_env", jinja2.Environment)
+_template_key = web.AppKey("audit_template", jinja2.Template)
 
 _TEMPLATE_DIR = Path(__file__).parent / "templates"
 
@@ -108,7 +108,6 @@ async def handle_api_stats(request: web.Request) -> web.Response:
 async def handle_audit_page(request: web.Request) -> web.Response:
     """GET /audit/ — HTML dashboard page."""
     db: Database = request.app[_db_key]
-    env: jinja2.Environment = request.app[_jinja2_key]
     filters = _parse_filters(request)
     per_page = filters.pop("per_page")
     page = filters.pop("page")
@@ -127,8 +126,7 @@ async def handle_audit_page(request: web.Request) -> web.Response:
         params = {k: v for k, v in {**raw_params, **overrides}.items() if v}
         return urlencode(params)
 
-    template = env.get_template("audit.html")
-    html = template.render(
+    html = request.app[_template_key].render(
         entries=entries,
         total=total,
         page=page,
@@ -154,12 +152,15 @@ def setup_dashboard(app: web.Application, db: Database) -> None:
     """Register dashboard routes on an aiohttp Application."""
     app[_db_key] = db
 
+    # Load and compile the template now, before the loop serves requests, and
+    # skip jinja2's auto-reload mtime check: page views then do no file I/O.
     env = jinja2.Environment(
         loader=jinja2.FileSystemLoader(str(_TEMPLATE_DIR)),
         autoescape=True,
+        auto_reload=False,
     )
     env.filters["format_ts"] = _format_ts
-    app[_jinja2_key] = env
+    app[_template_key] = env.get_template("audit.html")
 
     app.router.add_get("/audit/", handle_audit_page)
     app.router.add_get("/audit/api/log", handle_api_log)
@@ -2,17 +2,20 @@
 
 from __future__ import annotations
 
-import json
 import os
 import stat
+from collections.abc import Iterable
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 
 import aiosqlite
 
+from agentpass._json import json_dumps, json_loads
 from agentpass.models import AuditEntry
 
+_MEMORY_PATH = ":memory:"
+
 _SCHEMA = """\
 CREATE TABLE IF NOT EXISTS audit_log (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -46,10 +49,25 @@ CREATE INDEX IF NOT EXISTS idx_audit_tool ON audit_log(tool_name);
 CREATE INDEX IF NOT EXISTS idx_pending_expires ON pending_requests(expires_at);
 """
 
+_INSERT_AUDIT = """\
+INSERT INTO audit_log
+    (timestamp, request_id, tool_name, args, signature, decision,
+     resolution, resolved_by, resolved_at, execution_result, agent_id)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+# Last (second, formatted) pair: timestamps are second-resolution and audit
+# writes come in bursts, so consecutive calls usually hit the same second.
+_last_iso: tuple[int, str] = (-1, "")
+
 
 def _epoch_to_iso(epoch: float) -> str:
     """Convert epoch float to ISO 8601 string."""
-    return datetime.fromtimestamp(epoch, tz=UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    global _last_iso
+    second = int(epoch)
+    if _last_iso[0] != second:
+        _last_iso = (second, datetime.fromtimestamp(second, tz=UTC).strftime("%Y-%m-%dT%H:%M:%SZ"))
+    return _last_iso[1]
 
 
 class Database:
@@ -60,8 +78,14 @@ class Database:
         self._conn: aiosqlite.Connection | None = None
 
     async def initialize(self) -> None:
-        """Create schema, open persistent connection, and set file permissions."""
-        Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+        """Create schema, open persistent connection, and set file permissions.
+
+        A path of ``":memory:"`` opens a private in-memory database, with no
+        directory or file to create.
+        """
+        in_memory = self._path == _MEMORY_PATH
+        if not in_memory:
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
 
         self._conn = await aiosqlite.connect(self._path)
         self._conn.row_factory = aiosqlite.Row
@@ -69,7 +93,8 @@ class Database:
         await self._conn.commit()
 
         # Set file permissions to 0600
-        os.chmod(self._path, stat.S_IRUSR | stat.S_IWUSR)
+        if not in_memory:
+            os.chmod(self._path, stat.S_IRUSR | stat.S_IWUSR)
 
     def _get_conn(self) -> aiosqlite.Connection:
         """Return the persistent connection, or raise if not initialized."""
@@ -80,31 +105,31 @@ class Database:
     async def log_audit(self, entry: AuditEntry) -> None:
         """Insert an audit log entry."""
         conn = self._get_conn()
-        timestamp = _epoch_to_iso(entry.timestamp)
-        resolved_at = _epoch_to_iso(entry.resolved_at) if entry.resolved_at else None
-        args_json = json.dumps(entry.args)
-        result_json = json.dumps(entry.execution_result) if entry.execution_result else None
+        await conn.execute(_INSERT_AUDIT, self._audit_row(entry))
+        await conn.commit()
+
+    async def log_audit_many(self, entries: Iterable[AuditEntry]) -> None:
+        """Insert several audit log entries with one statement and one commit."""
+        conn = self._get_conn()
+        await conn.executemany(_INSERT_AUDIT, [self._audit_row(e) for e in entries])
+        await conn.commit()
 
-        await conn.execute(
-            """INSERT INTO audit_log
-               (timestamp, request_id, tool_name, args, signature, decision,
-                resolution, resolved_by, resolved_at, execution_result, agent_id)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                timestamp,
-                entry.request_id,
-                entry.tool_name,
-                args_json,
-                entry.signature,
-                entry.decision,
-                entry.resolution,
-                entry.resolved_by,
-                resolved_at,
-                result_json,
-                entry.agent_id,
-            ),
+    @staticmethod
+    def _audit_row(entry: AuditEntry) -> tuple[Any, ...]:
+        """Serialize *entry* into the parameter tuple for _INSERT_AUDIT."""
+        return (
+            _epoch_to_iso(entry.timestamp),
+            entry.request_id,
+            entry.tool_name,
+            json_dumps(entry.args),
+            entry.signature,
+            entry.decision,
+            entry.resolution,
+            entry.resolved_by,
+            _epoch_to_iso(entry.resolved_at) if entry.resolved_at else None,
+            json_dumps(entry.execution_result) if entry.execution_result else None,
+            entry.agent_id,
         )
-        await conn.commit()
 
     async def get_audit_log(self, limit: int = 100) -> list[AuditEntry]:
         """Query recent audit log entries in reverse chronological order."""
@@ -127,13 +152,13 @@ class Database:
             resolved_at = datetime.fromisoformat(row["resolved_at"]).replace(tzinfo=UTC).timestamp()
 
         # Parse JSON args back to dict
-        args = json.loads(row["args"]) if isinstance(row["args"], str) else row["args"]
+        args = json_loads(row["args"]) if isinstance(row["args"], str) else row["args"]
 
         # Parse execution_result JSON back to dict if present
         execution_result: dict[str, Any] | None = None
         if row.get("execution_result"):
             execution_result = (
-                json.loads(row["execution_result"])
+                json_loads(row["execution_result"])
                 if isinstance(row["execution_result"], str)
                 else row["execution_result"]
             )
@@ -162,7 +187,7 @@ class Database:
     ) -> None:
         """Insert a pending approval request."""
         conn = self._get_conn()
-        args_json = json.dumps(args)
+        args_json = json_dumps(args)
         await conn.execute(
             """INSERT INTO pending_requests
                (request_id, tool_name, args, signature, expires_at)
@@ -236,7 +261,7 @@ class Database:
         """Update an existing audit entry with resolution details."""
         conn = self._get_conn()
         resolved_at_iso = _epoch_to_iso(resolved_at)
-        result_json = json.dumps(execution_result) if execution_result else None
+        result_json = json_dumps(execution_result) if execution_result else None
         await conn.execute(
             """UPDATE audit_log
                SET resolution = ?, resolved_by = ?, resolved_at = ?, execution_result = ?
@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import functools
 import re
-from fnmatch import fnmatch
+from fnmatch import translate
 from typing import TYPE_CHECKING
 
 from agentpass.config import Permissions
@@ -15,6 +16,9 @@ if TYPE_CHECKING:
 # Characters forbidden in ANY argument value (prevents glob/signature injection)
 FORBIDDEN_CHARS_RE = re.compile(r"[*?\[\](),\x00-\x1f]")
 
+# Bound once: a single-class regex search beats str.translate / set scans here
+_find_forbidden_char = FORBIDDEN_CHARS_RE.search
+
 
 def validate_args(tool_name: str, args: dict, registry: ToolRegistry | None = None) -> None:
     """Reject args with forbidden characters and validate against tool definition.
@@ -27,25 +31,20 @@ def validate_args(tool_name: str, args: dict, registry: ToolRegistry | None = No
     for key, value in args.items():
         if not isinstance(value, str):
             continue
-        if FORBIDDEN_CHARS_RE.search(value):
+        if _find_forbidden_char(value):
             raise ValueError(f"Argument '{key}' contains forbidden characters")
 
-    if registry:
-        tool = registry.get_tool(tool_name)
-        if tool:
-            # Check required args
-            required = registry.get_required_args(tool_name)
-            for req_arg in required:
-                if req_arg not in args:
-                    raise ValueError(f"Missing required argument: {req_arg}")
-            # Check per-arg validation patterns from YAML
-            validators = registry.get_arg_validators(tool_name)
-            for key, value in args.items():
-                if not isinstance(value, str):
-                    continue
-                pattern = validators.get(key)
-                if pattern and not pattern.match(value):
-                    raise ValueError(f"Invalid value for {key}: {value!r}")
+    if registry and registry.get_tool(tool_name):
+        # Check required args
+        for req_arg in registry.get_required_args(tool_name):
+            if req_arg not in args:
+                raise ValueError(f"Missing required argument: {req_arg}")
+        # Check per-arg validation patterns from YAML -- walk the tool's few
+        # validated args rather than every arg in the request
+        for key, pattern in registry.get_arg_validators(tool_name).items():
+            value = args.get(key)
+            if isinstance(value, str) and not pattern.match(value):
+                raise ValueError(f"Invalid value for {key}: {value!r}")
 
 
 def build_signature(tool_name: str, args: dict, registry: ToolRegistry | None = None) -> str:
@@ -64,15 +63,82 @@ def build_signature(tool_name: str, args: dict, registry: ToolRegistry | None =
         -> "ha_call_service(light.turn_on, light.bedroom)"
     """
     validate_args(tool_name, args, registry)
-
     if registry:
         parts = registry.get_signature_parts(tool_name, args)
         if parts is not None:  # Tool found in registry
             return f"{tool_name}({', '.join(parts)})" if parts else tool_name
 
     # Fallback for tools not in registry: sorted keys for determinism
-    parts = [str(args[k]) for k in sorted(args.keys())]
-    return f"{tool_name}({', '.join(parts)})" if parts else tool_name
+    if not args:
+        return tool_name
+    return f"{tool_name}({', '.join([str(args[k]) for k in sorted(args)])})"
+
+
+# Literal tool name at the start of a rule pattern, e.g. "ha_get_state(sensor.*)"
+_RULE_TOOL_RE = re.compile(r"([A-Za-z_]\w*)(?:\(|\Z)")
+
+# Bucket key for rule patterns that may match any tool (e.g. "ha_get_*", "*")
+_ANY_TOOL = "*"
+
+# Decisions remembered per engine, keyed by signature
+DECISION_CACHE_SIZE = 4096
+
+
+# fnmatch.translate is uncached; any-tool rules and the defaults are translated
+# again for every tool bucket, and again by each engine a reload builds
+_translate = functools.lru_cache(maxsize=1024)(translate)
+
+
+def _alternation(patterns: tuple[str, ...]) -> str:
+    """Join fnmatch-style globs into one regex source matching any of them.
+
+    Each translated glob is self-anchored, so the alternation needs no
+    extra grouping.
+    """
+    return "|".join(_translate(p) for p in patterns)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_policy(
+    deny: tuple[str, ...],
+    allow: tuple[str, ...],
+    ask: tuple[str, ...],
+    defaults: tuple[str, ...],
+) -> re.Pattern | None:
+    """Compile one tool's rules and the defaults into a single regex.
+
+    Alternatives are tried left to right, so ordering the branches
+    deny, allow, ask, then each default in file order keeps both the tier
+    precedence and first-match-wins for defaults.  Translated globs contain
+    no capturing groups, so ``lastgroup`` names the branch that matched.
+    Cached process-wide so engines rebuilt on a permissions reload reuse
+    the compiled policy when the rules are unchanged.
+    """
+    branches = [
+        f"(?P<{name}>{_alternation(patterns)})"
+        for name, patterns in (("deny", deny), ("allow", allow), ("ask", ask))
+        if patterns
+    ]
+    branches.extend(f"(?P<default{i}>{_translate(p)})" for i, p in enumerate(defaults))
+    return re.compile("|".join(branches)) if branches else None
+
+
+def _rule_bucket(pattern: str) -> str:
+    """Return the tool name a rule pattern is restricted to, or ``_ANY_TOOL``.
+
+    Signatures are always ``tool_name`` or ``tool_name(...)``, so a pattern
+    whose leading identifier is followed by ``(`` or the end of the pattern
+    can only ever match that one tool.
+    """
+    m = _RULE_TOOL_RE.match(pattern)
+    return m.group(1) if m else _ANY_TOOL
+
+
+def _tool_patterns(buckets: dict[str, list[str]], tool: str) -> tuple[str, ...]:
+    """Return the patterns that can match *tool*: its own bucket, then the any-tool one."""
+    if tool == _ANY_TOOL:
+        return tuple(buckets.get(_ANY_TOOL, ()))
+    return (*buckets.get(tool, ()), *buckets.get(_ANY_TOOL, ()))
 
 
 class PermissionEngine:
@@ -82,20 +148,60 @@ class PermissionEngine:
         self._permissions = permissions
         self._registry = registry
 
-    def evaluate(self, tool_name: str, args: dict) -> Decision:
-        """Evaluate a tool request and return allow/deny/ask."""
-        signature = build_signature(tool_name, args, self._registry)
-
-        # Phase 1: Check explicit rules (deny > allow > ask)
-        for action_type in ("deny", "allow", "ask"):
-            for rule in self._permissions.rules:
-                if rule.action == action_type and fnmatch(signature, rule.pattern):
-                    return Decision(action_type)
-
-        # Phase 2: Check defaults (first match wins)
-        for default in self._permissions.defaults:
-            if fnmatch(signature, default.pattern):
-                return Decision(default.action)
-
-        # Phase 3: Global fallback
-        return Decision.ASK
+        # Pre-compile glob patterns once.  Rules are bucketed by tool name so
+        # only candidate patterns are matched, and each tool's rules plus the
+        # defaults become one regex: a request costs a single match, with the
+        # named group that matched giving the decision.
+        tiers: dict[str, dict[str, list[str]]] = {"deny": {}, "allow": {}, "ask": {}}
+        for rule in permissions.rules:
+            tiers[rule.action].setdefault(_rule_bucket(rule.pattern), []).append(rule.pattern)
+        defaults = tuple(d.pattern for d in permissions.defaults)
+        tools = {tool for buckets in tiers.values() for tool in buckets} | {_ANY_TOOL}
+        self._policy_by_tool: dict[str, re.Pattern | None] = {
+            tool: _compile_policy(
+                *(_tool_patterns(buckets, tool) for buckets in tiers.values()), defaults
+            )
+            for tool in tools
+        }
+        self._decision_by_group: dict[str, Decision] = {
+            "deny": Decision.DENY,
+            "allow": Decision.ALLOW,
+            "ask": Decision.ASK,
+        }
+        for i, d in enumerate(permissions.defaults):
+            self._decision_by_group[f"default{i}"] = Decision(d.action)
+        # A decision depends only on the rules above (fixed for this engine;
+        # a permissions reload builds a new one) and the signature, so repeat
+        # requests for the same tool and entity skip the regex matching.
+        self._decide = functools.lru_cache(maxsize=DECISION_CACHE_SIZE)(self._match_rules)
+
+    def build_signature(self, tool_name: str, args: dict) -> str:
+        """Validate *args* and build the signature this engine's rules match against.
+
+        Uses the engine's own registry, so callers that also record or display
+        the signature see the same one evaluate() decides on.  Raises
+        ValueError for invalid args.
+        """
+        return build_signature(tool_name, args, self._registry)
+
+    def evaluate(self, tool_name: str, args: dict, signature: str | None = None) -> Decision:
+        """Evaluate a tool request and return allow/deny/ask.
+
+        *signature*, if given, must come from this engine's build_signature();
+        it lets callers that already built it skip validating and building again.
+        """
+        if signature is None:
+            signature = build_signature(tool_name, args, self._registry)
+        return self._decide(signature)
+
+    def _match_rules(self, signature: str) -> Decision:
+        """Match *signature* against the rules (deny > allow > ask), then the defaults.
+
+        Takes the signature alone so the decision cache is keyed by the string
+        itself, not a wrapping tuple; the tool name is its leading part.
+        """
+        tool_name = signature.partition("(")[0]
+        policy = self._policy_by_tool.get(tool_name, self._policy_by_tool[_ANY_TOOL])
+        m = policy.match(signature) if policy is not None else None
+        # Global fallback when nothing matches
+        return self._decision_by_group[m.lastgroup] if m is not None else Decision.ASK
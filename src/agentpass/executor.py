@@ -2,13 +2,20 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, NoReturn
 
 from agentpass.services.base import ServiceHandler
 
 if TYPE_CHECKING:
     from agentpass.registry import ToolRegistry
 
+# Default cap on concurrent in-flight calls to a single service
+DEFAULT_MAX_CONCURRENT_PER_SERVICE = 16
+
+_ExecuteFn = Callable[[str, dict[str, Any]], Awaitable[dict[str, Any]]]
+
 
 class ExecutionError(Exception):
     """Raised when tool dispatch or execution fails."""
@@ -21,19 +28,32 @@ class Executor:
         self,
         services: dict[str, ServiceHandler],
         registry: ToolRegistry | None = None,
+        max_concurrent_per_service: int = DEFAULT_MAX_CONCURRENT_PER_SERVICE,
     ) -> None:
         self._services = services
         self._registry = registry
+        # One gate per service so a burst of approvals can't flood a backend
+        self._gates = {name: asyncio.Semaphore(max_concurrent_per_service) for name in services}
+        # Resolve tool -> (service gate, bound handler.execute) once instead of per request
+        self._dispatch: dict[str, tuple[asyncio.Semaphore, _ExecuteFn]] = {}
+        if registry:
+            for tool in registry.all_tools():
+                handler = services.get(tool.service_name)
+                if handler is not None:
+                    self._dispatch[tool.name] = (self._gates[tool.service_name], handler.execute)
 
     async def execute(self, tool_name: str, args: dict[str, Any]) -> dict[str, Any]:
         """Dispatch a tool request to the appropriate service handler."""
-        service_name = None
-        if self._registry:
-            service_name = self._registry.get_service_name(tool_name)
-
+        entry = self._dispatch.get(tool_name)
+        if entry is None:
+            self._raise_dispatch_error(tool_name)
+        gate, execute = entry
+        async with gate:
+            return await execute(tool_name, args)
+
+    def _raise_dispatch_error(self, tool_name: str) -> NoReturn:
+        """Raise the ExecutionError explaining why *tool_name* has no handler."""
+        service_name = self._registry.get_service_name(tool_name) if self._registry else None
         if service_name is None:
             raise ExecutionError(f"Unknown tool: {tool_name}")
-        handler = self._services.get(service_name)
-        if handler is None:
-            raise ExecutionError(f"Service not configured: {service_name}")
-        return await handler.execute(tool_name, args)
+        raise ExecutionError(f"Service not configured: {service_name}")
@@ -5,7 +5,7 @@ from collections.abc import Awaitable, Callable
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class ApprovalRequest:
     """A tool request awaiting human approval."""
 
@@ -15,7 +15,7 @@ class ApprovalRequest:
     signature: str  # human-readable tool signature
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ApprovalChoice:
     """A button option presented to the guardian."""
 
@@ -23,7 +23,7 @@ class ApprovalChoice:
     action: str  # "allow", "deny"
 
 
-@dataclass
+@dataclass(slots=True)
 class ApprovalResult:
     """The guardian's decision on a tool request."""
 
@@ -1,18 +1,16 @@
 """Telegram Guardian bot adapter using python-telegram-bot (PTB) v21 with manual lifecycle."""
 
 import asyncio
+import heapq
+import itertools
 import logging
+import secrets
 import time
+from collections import OrderedDict
 from collections.abc import Awaitable, Callable
-from pathlib import Path
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.ext import (
-    Application,
-    CallbackQueryHandler,
-    InvalidCallbackData,
-    PicklePersistence,
-)
+from telegram.ext import Application, CallbackQueryHandler
 
 from agentpass.config import TelegramConfig
 from agentpass.messenger.base import (
@@ -24,51 +22,58 @@ from agentpass.messenger.base import (
 
 logger = logging.getLogger(__name__)
 
+# Max callback IDs kept in memory; the oldest buttons stop resolving past this
+CALLBACK_MAP_SIZE = 10_000
+
+
+class _Approval:
+    """Timeout state for one pending approval message."""
+
+    __slots__ = ("deadline", "message_id")
+
+    def __init__(self, message_id: str | None, deadline: float | None = None) -> None:
+        self.message_id = message_id
+        self.deadline = deadline
+
 
 class TelegramAdapter(MessengerAdapter):
     """Telegram-based guardian approval bot.
 
     Uses PTB v21 manual lifecycle (NOT run_polling) so the event loop is shared
-    with the WebSocket server in __main__.py.
+    with the WebSocket server in serve.py.
 
     Configuration:
-        - arbitrary_callback_data=True with PicklePersistence so callback data
-          (Python dicts) survives restarts.
-        - Each pending approval gets an asyncio timeout task.
-        - asyncio.Lock ensures race-safe resolution between user callback and timeout.
+        - Buttons carry compact "<session>:<id>:<action>" strings; the id maps to
+          the request_id in a bounded in-memory map.  The random per-process
+          session prefix makes buttons from before a restart read as expired
+          rather than colliding with new ids.
+        - Pending approval deadlines live in one heap drained by a single
+          ``loop.call_at`` timer armed for the earliest deadline, instead of
+          one sleeping task per approval.  A task is only created when an
+          approval actually expires.
+        - Resolution is a synchronous check-and-set in ``_settle`` (no await in
+          between), so a user callback and a timeout can never both win.  It drops
+          the pending state; only a bounded record of recent resolutions is kept
+          to answer double taps.
     """
 
-    def __init__(
-        self,
-        config: TelegramConfig,
-        *,
-        persistence_path: str | None = None,
-    ) -> None:
+    def __init__(self, config: TelegramConfig) -> None:
         self._config = config
+        self._allowed_users = frozenset(config.allowed_users)  # checked on every button press
         self._callback: Callable[[ApprovalResult], Awaitable[None]] | None = None
-        self._pending: dict[str, asyncio.Task] = {}  # request_id -> timeout task
-        self._resolve_lock = asyncio.Lock()
-        self._resolved: set[str] = set()  # already-resolved request_ids
-
-        # Persistence for arbitrary callback data survival across restarts
-        pp = persistence_path or "data/callback_data.pickle"
-        Path(pp).parent.mkdir(parents=True, exist_ok=True)
-        persistence = PicklePersistence(filepath=pp)
-
-        self._app = (
-            Application.builder()
-            .token(config.token)
-            .persistence(persistence)
-            .arbitrary_callback_data(True)
-            .build()
-        )
-
-        # Major 4: InvalidCallbackData handler MUST be registered first so it catches
-        # stale/expired callback data before the valid handler tries to access dict keys.
-        self._app.add_handler(
-            CallbackQueryHandler(self._handle_invalid_callback, pattern=InvalidCallbackData)
-        )
-        # Valid callback data handler (dict payloads)
+        self._approvals: dict[str, _Approval] = {}  # request_id -> pending timeout state
+        self._resolved: OrderedDict[str, None] = OrderedDict()  # recent resolutions, bounded
+        # (deadline, request_id); entries resolved early are skipped on pop
+        self._deadlines: list[tuple[float, str]] = []
+        self._timer: asyncio.TimerHandle | None = None  # armed for the earliest deadline
+        self._expiring: set[asyncio.Task] = set()  # in-progress expiry notifications
+
+        # Compact callback data: per-process prefix + counter id -> request_id
+        self._cb_prefix = secrets.token_hex(4)
+        self._cb_ids = itertools.count()
+        self._cb_map: OrderedDict[int, str] = OrderedDict()
+
+        self._app = Application.builder().token(config.token).build()
         self._app.add_handler(CallbackQueryHandler(self._handle_callback))
 
     @property
@@ -85,27 +90,24 @@ class TelegramAdapter(MessengerAdapter):
 
         Returns the Telegram message_id as a string for later editing.
         """
-        keyboard = [
+        # PTB buttons are immutable, so only the per-request data prefix is shared
+        data_prefix = f"{self._cb_prefix}:{self._callback_id(request.request_id)}:"
+        markup = InlineKeyboardMarkup(
             [
-                InlineKeyboardButton(
-                    choice.label,
-                    callback_data={"request_id": request.request_id, "action": choice.action},
-                )
-                for choice in choices
+                [
+                    InlineKeyboardButton(choice.label, callback_data=data_prefix + choice.action)
+                    for choice in choices
+                ]
             ]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
+        )
 
         # Build request message: signature + any extra args not in the signature
         lines = [f"\U0001f6a8 {request.tool_name}"]
-        if request.signature:
-            lines.append(request.signature)
-        # Show args not captured by the signature template
         sig_text = request.signature or ""
-        extra = {k: v for k, v in request.args.items() if str(v) not in sig_text}
-        if extra:
-            for k, v in extra.items():
-                lines.append(f"  {k}: {v}")
+        if sig_text:
+            lines.append(sig_text)
+        # Show args not captured by the signature template
+        lines.extend(f"  {k}: {v}" for k, v in request.args.items() if str(v) not in sig_text)
 
         msg = await self._app.bot.send_message(
             chat_id=self._config.chat_id,
@@ -114,13 +116,34 @@ class TelegramAdapter(MessengerAdapter):
         )
         return str(msg.message_id)
 
+    def _callback_id(self, request_id: str) -> int:
+        """Assign a compact callback id to *request_id*, evicting the oldest past the cap."""
+        cid = next(self._cb_ids)
+        self._cb_map[cid] = request_id
+        if len(self._cb_map) > CALLBACK_MAP_SIZE:
+            self._cb_map.popitem(last=False)
+        return cid
+
+    def _settle(self, request_id: str) -> bool:
+        """Mark *request_id* resolved and drop its pending state; False if already resolved."""
+        if request_id in self._resolved:
+            return False
+        self._approvals.pop(request_id, None)
+        self._resolved[request_id] = None
+        if len(self._resolved) > CALLBACK_MAP_SIZE:
+            self._resolved.popitem(last=False)
+        return True
+
     async def update_approval(self, message_id: str, status: str, detail: str) -> None:
         """Edit the approval message to reflect a decision or expiry.
 
         Best-effort: logs a warning on failure, never raises.
         """
+        await self._edit_message(message_id, f"{status}\n\n{detail}")
+
+    async def _edit_message(self, message_id: int | str, text: str) -> None:
+        """Replace an approval message's text, logging (not raising) on failure."""
         try:
-            text = f"{status}\n\n{detail}"
             await self._app.bot.edit_message_text(
                 chat_id=self._config.chat_id,
                 message_id=int(message_id),
@@ -129,6 +152,17 @@ class TelegramAdapter(MessengerAdapter):
         except Exception:
             logger.warning("Failed to edit Telegram message %s", message_id, exc_info=True)
 
+    async def _resolve(self, edit: Awaitable[None], result: ApprovalResult) -> None:
+        """Run the best-effort message edit alongside the resolution callback.
+
+        The edit's response is discarded, so the gateway (and the waiting
+        agent) shouldn't sit behind a Telegram round trip for it.
+        """
+        if self._callback is None:
+            await edit
+        else:
+            await asyncio.gather(edit, self._callback(result))
+
     async def on_approval_callback(
         self, callback: Callable[[ApprovalResult], Awaitable[None]]
     ) -> None:
@@ -136,13 +170,39 @@ class TelegramAdapter(MessengerAdapter):
         self._callback = callback
 
     async def start(self) -> None:
-        """Start listening — actual PTB lifecycle is managed by __main__.py."""
+        """Start listening — actual PTB lifecycle is managed by serve.py."""
 
     async def stop(self) -> None:
-        """Cancel all pending timeout tasks and clean up."""
-        for task in self._pending.values():
+        """Stop the timeout timer, mark still-open prompts expired, and drop all state."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for task in self._expiring:
             task.cancel()
-        self._pending.clear()
+        self._expiring.clear()
+        await self._expire_open_messages()
+        self._resolved.clear()
+        self._deadlines.clear()
+
+    async def _expire_open_messages(self) -> None:
+        """Edit every unresolved approval message to expired, all at once.
+
+        Their buttons stop working after a restart, so leaving them looking
+        live would mislead the guardian.  The edits are independent, so they
+        go out concurrently over PTB's connection pool rather than one round
+        trip after another.
+        """
+        message_ids = [a.message_id for a in self._approvals.values() if a.message_id is not None]
+        for request_id in list(self._approvals):
+            self._settle(request_id)
+        if not message_ids or not self._config.edit_on_resolve:
+            return
+        await asyncio.gather(
+            *(
+                self.update_approval(message_id, "\u23f0 Expired", "Gateway shut down")
+                for message_id in message_ids
+            )
+        )
 
     async def health_check(self) -> bool:
         """Return True if the Telegram bot application is running."""
@@ -156,31 +216,64 @@ class TelegramAdapter(MessengerAdapter):
     # ------------------------------------------------------------------
 
     def schedule_timeout(self, request_id: str, timeout: int, message_id: str) -> None:
-        """Schedule an asyncio task that auto-denies after *timeout* seconds."""
-        task = asyncio.create_task(self._timeout_handler(request_id, timeout, message_id))
-        self._pending[request_id] = task
-
-    async def _timeout_handler(self, request_id: str, timeout: int, message_id: str) -> None:
-        """Fire after *timeout* seconds — resolve as deny if still pending."""
-        await asyncio.sleep(timeout)
-
-        async with self._resolve_lock:
-            if request_id in self._resolved:
-                return  # Already resolved by a user callback
-            self._resolved.add(request_id)
-            self._pending.pop(request_id, None)
-
+        """Auto-deny *request_id* after *timeout* seconds unless resolved first."""
+        if request_id in self._resolved:
+            return  # tapped before the timeout was scheduled
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self._approvals[request_id] = _Approval(message_id, deadline)
+        heapq.heappush(self._deadlines, (deadline, request_id))
+        if self._timer is None or deadline < self._timer.when():
+            self._arm(loop)  # new earliest deadline
+
+    def _arm(self, loop: asyncio.AbstractEventLoop) -> None:
+        """(Re)arm the timer for the earliest deadline in the heap, if any."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._deadlines:
+            deadline = self._deadlines[0][0]
+            self._timer = loop.call_at(deadline, self._reap, deadline)
+
+    def _reap(self, fired_at: float) -> None:
+        """Expire every approval whose deadline has passed, earliest first.
+
+        The loop may run a timer slightly before its ``when()``, so the
+        deadline it was armed for counts as passed.
+        """
+        loop = asyncio.get_running_loop()
+        self._timer = None
+        now = max(fired_at, loop.time())
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, request_id = heapq.heappop(self._deadlines)
+            approval = self._approvals.get(request_id)
+            if approval is None or approval.deadline != deadline:
+                continue  # resolved (or rescheduled) before its deadline
+            self._settle(request_id)
+
+            # Notify in a task so slow Telegram/DB calls don't delay later expiries
+            task = asyncio.create_task(self._expire(request_id, approval.message_id))
+            self._expiring.add(task)
+            task.add_done_callback(self._expiring.discard)
+        self._arm(loop)
+
+    async def _expire(self, request_id: str, message_id: str) -> None:
+        """Mark the approval message expired and resolve the request as deny."""
+        result = ApprovalResult(
+            request_id=request_id,
+            action="deny",
+            user_id="timeout",
+            timestamp=time.time(),
+        )
+        if not self._config.edit_on_resolve:
+            # Nobody tapped the prompt, so skip the edit API call entirely
+            if self._callback is not None:
+                await self._callback(result)
+            return
         # Best-effort edit (may fail if message was already edited, network, etc.)
-        await self.update_approval(message_id, "\u23f0 Expired", "Approval timed out")
-
-        if self._callback:
-            result = ApprovalResult(
-                request_id=request_id,
-                action="deny",
-                user_id="timeout",
-                timestamp=time.time(),
-            )
-            await self._callback(result)
+        await self._resolve(
+            self.update_approval(message_id, "\u23f0 Expired", "Approval timed out"), result
+        )
 
     # ------------------------------------------------------------------
     # PTB callback query handlers
@@ -190,60 +283,48 @@ class TelegramAdapter(MessengerAdapter):
         """Handle a valid inline-button press from a guardian."""
         query = update.callback_query
 
-        # Major 4: Guard against non-dict data (defense-in-depth)
-        if not isinstance(query.data, dict):
+        # Guard against malformed data (defense-in-depth); parsed with one split
+        parts = query.data.split(":") if query.data else ()
+        if len(parts) != 3:
             await query.answer("Invalid callback data")
             return
 
         # FR5-AC2: only allowed users
-        if query.from_user.id not in self._config.allowed_users:
+        if query.from_user.id not in self._allowed_users:
             return  # silently ignore
 
-        data = query.data  # dict: {"request_id": ..., "action": ...}
-        request_id = data["request_id"]
-        action = data["action"]
-
-        async with self._resolve_lock:
-            if request_id in self._resolved:
-                await query.answer("Already resolved")
-                return
-            self._resolved.add(request_id)
-            # Cancel the timeout task
-            timeout_task = self._pending.pop(request_id, None)
-            if timeout_task:
-                timeout_task.cancel()
-
-        await query.answer()
+        prefix, cid, action = parts
+        request_id = None
+        if prefix == self._cb_prefix and cid.isascii() and cid.isdigit():
+            request_id = self._cb_map.get(int(cid))
+        if request_id is None:
+            # From before a restart, or evicted from the callback map
+            await query.answer("This button has expired")
+            return
 
-        # Replace the header line with the resolution, keep all detail lines
-        original_text = query.message.text or ""
-        original_lines = original_text.strip().split("\n")
-        detail_lines = original_lines[1:] if len(original_lines) > 1 else []
+        # Check-and-set with no await in between: atomic on the event loop.
+        # A pending heap entry is skipped lazily when its timer fires.
+        if not self._settle(request_id):
+            await query.answer("Already resolved")
+            return
 
         header = "\u2705 Approved" if action == "allow" else "\u274c Denied"
+        result = ApprovalResult(
+            request_id=request_id,
+            action=action,
+            user_id=str(query.from_user.id),
+            timestamp=time.time(),
+        )
 
-        resolved_text = "\n".join([header, *detail_lines])
+        if not self._config.edit_on_resolve:
+            # The toast is the guardian's feedback; no second API call to edit
+            await self._resolve(query.answer(header), result)
+            return
 
-        try:
-            await self._app.bot.edit_message_text(
-                chat_id=self._config.chat_id,
-                message_id=int(query.message.message_id),
-                text=resolved_text,
-            )
-        except Exception:
-            logger.warning(
-                "Failed to edit Telegram message %s", query.message.message_id, exc_info=True
-            )
+        await query.answer()
 
-        if self._callback:
-            result = ApprovalResult(
-                request_id=request_id,
-                action=action,
-                user_id=str(query.from_user.id),
-                timestamp=time.time(),
-            )
-            await self._callback(result)
+        # Replace the header line with the resolution, keep all detail lines
+        _, _, details = (query.message.text or "").strip().partition("\n")
+        resolved_text = f"{header}\n{details}" if details else header
 
-    async def _handle_invalid_callback(self, update: Update, context: object) -> None:
-        """Handle stale callback data from buttons that survived a restart."""
-        await update.callback_query.answer("This button has expired")
+        await self._resolve(self._edit_message(query.message.message_id, resolved_text), result)
@@ -15,7 +15,7 @@ class Decision(Enum):
     ASK = "ask"
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolRequest:
     """Incoming tool request from an agent."""
 
@@ -25,7 +25,7 @@ class ToolRequest:
     signature: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolResult:
     """Result of an executed tool request."""
 
@@ -34,19 +34,18 @@ class ToolResult:
     data: dict[str, Any] | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class PendingApproval:
     """A tool request awaiting human approval."""
 
     request: ToolRequest
     future: asyncio.Future
     message_id: str | None = None
-    timeout_task: asyncio.Task | None = None
     created_at: float = field(default_factory=time.time)
     expires_at: float = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class AuditEntry:
     """A record of a tool request and its outcome."""
 
@@ -6,20 +6,40 @@ import re
 
 from agentpass.config import ConfigError, ServiceConfig, ToolDefinition
 
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def _split_signature(template: str | None) -> list[list[str]]:
+    """Pre-split a signature template into one [literal, arg, literal, ...] list per part.
+
+    "{domain}.{service}, {entity_id}" -> [["", "domain", ".", "service", ""],
+                                          ["", "entity_id", ""]]
+    """
+    if not template:
+        return []
+    return [_PLACEHOLDER_RE.split(part.strip()) for part in template.split(",")]
+
 
 class ToolRegistry:
     """Central registry mapping tool names to definitions and services."""
 
     def __init__(self, tools: dict[str, ToolDefinition]) -> None:
         self._tools = tools
-        # Pre-compile arg validators
+        # Pre-compile arg validators and collect required args
         self._validators: dict[str, dict[str, re.Pattern]] = {}
+        self._required: dict[str, frozenset[str]] = {}
+        # Signature templates parsed once, so building a signature is a join
+        self._signatures: dict[str, list[list[str]]] = {}
         for name, tool in tools.items():
             validators: dict[str, re.Pattern] = {}
             for arg_name, arg_def in tool.args.items():
                 if arg_def.validate:
                     validators[arg_name] = re.compile(arg_def.validate)
             self._validators[name] = validators
+            self._required[name] = frozenset(
+                arg_name for arg_name, arg_def in tool.args.items() if arg_def.required
+            )
+            self._signatures[name] = _split_signature(tool.signature)
 
     def get_tool(self, name: str) -> ToolDefinition | None:
         """Return the tool definition for the given name, or None."""
@@ -38,34 +58,22 @@ class ToolRegistry:
 
         Returns None if tool not in registry (caller should use fallback).
         """
-        tool = self._tools.get(name)
-        if tool is None:
+        parts = self._signatures.get(name)
+        if parts is None:
             return None
-        if not tool.signature:
-            return []
-        # Split by ", " to get parts, then interpolate each part
-        parts = [p.strip() for p in tool.signature.split(",")]
-        result: list[str] = []
-        for part in parts:
-            # Replace {arg_name} with actual values, support {a}.{b} composites
-            def replacer(m: re.Match, _args: dict = args) -> str:
-                key = m.group(1)
-                return str(_args.get(key, ""))
-
-            interpolated = re.sub(r"\{(\w+)\}", replacer, part)
-            result.append(interpolated)
-        return result
+        # Odd segments are arg names, even ones literal text around them
+        return [
+            "".join(str(args.get(seg, "")) if i % 2 else seg for i, seg in enumerate(segments))
+            for segments in parts
+        ]
 
     def get_arg_validators(self, name: str) -> dict[str, re.Pattern]:
         """Return pre-compiled regex validators for the tool's args."""
         return self._validators.get(name, {})
 
-    def get_required_args(self, name: str) -> set[str]:
+    def get_required_args(self, name: str) -> frozenset[str]:
         """Return the set of required argument names for the tool."""
-        tool = self._tools.get(name)
-        if tool is None:
-            return set()
-        return {arg_name for arg_name, arg_def in tool.args.items() if arg_def.required}
+        return self._required.get(name, frozenset())
 
     def all_tools(self) -> list[ToolDefinition]:
         """Return all tool definitions in the registry."""
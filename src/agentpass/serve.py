@@ -0,0 +1,261 @@
+"""Gateway server orchestration for ``agentpass serve``.
+
+Kept separate from ``__main__`` so the client subcommands (request, tools,
+pending) don't pay for importing Telegram, aiohttp, and the server stack.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import logging
+import signal
+import ssl
+import sys
+from collections.abc import Awaitable
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+import websockets.asyncio.server
+from aiohttp import web
+
+from agentpass.config import ConfigError, ServiceConfig, load_config, load_permissions
+from agentpass.dashboard import setup_dashboard
+from agentpass.db import Database
+from agentpass.engine import PermissionEngine
+from agentpass.executor import Executor
+from agentpass.messenger.telegram import TelegramAdapter
+from agentpass.registry import build_registry
+from agentpass.server import GatewayServer
+from agentpass.services.base import ServiceHandler
+from agentpass.services.http import GenericHTTPService
+
+logger = logging.getLogger("agentpass")
+
+# Telegram long-poll timeout (seconds): an idle gateway makes one getUpdates
+# call per timeout window instead of re-polling every few seconds.
+TELEGRAM_POLL_TIMEOUT = 30
+
+# Threads behind the loop's default executor. Only blocking I/O belongs there
+# (aiohttp's getaddrinfo DNS lookups, any run_in_executor(None, ...) call);
+# tool execution and approval messaging stay on the event loop as coroutines.
+IO_THREADS = 8
+
+
+def _load_plugin_service(config: ServiceConfig) -> ServiceHandler:
+    """Load a Python plugin service handler from handler_class spec.
+
+    The handler_class field must be in "module.path:ClassName" format.
+    The class receives (config, tools) as constructor arguments.
+    """
+    handler_class = config.handler_class
+    if not handler_class:
+        raise ConfigError(
+            f"Service '{config.name}' has handler=python but no handler_class specified"
+        )
+
+    # Parse "module.path:ClassName"
+    if ":" not in handler_class:
+        raise ConfigError(
+            f"Invalid handler_class format for service '{config.name}': "
+            f"expected 'module.path:ClassName', got '{handler_class}'"
+        )
+
+    module_path, class_name = handler_class.rsplit(":", 1)
+
+    try:
+        module = importlib.import_module(module_path)
+    except ImportError as e:
+        raise ConfigError(
+            f"Cannot import module '{module_path}' for service '{config.name}': {e}"
+        ) from e
+
+    try:
+        cls = getattr(module, class_name)
+    except AttributeError:
+        raise ConfigError(
+            f"Class '{class_name}' not found in module '{module_path}' for service '{config.name}'"
+        ) from None
+
+    missing = [
+        name
+        for name in ("execute", "health_check", "close")
+        if getattr(cls, name, None) in (None, getattr(ServiceHandler, name))
+    ]
+    if missing:
+        raise ConfigError(
+            f"Class '{class_name}' for service '{config.name}' does not implement: "
+            f"{', '.join(missing)}"
+        )
+
+    return cls(config, config.tools)
+
+
+async def _shutdown_step(name: str, coro: Awaitable[None]) -> None:
+    """Await one shutdown step, logging failures so sibling steps still run."""
+    try:
+        await coro
+    except Exception:
+        logger.exception("Error stopping %s", name)
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Main async entrypoint -- orchestrates all components."""
+    # 1. Load config
+    config = load_config(args.config)
+    permissions = load_permissions(args.permissions)
+
+    # 2. TLS check
+    if not args.insecure and config.gateway.tls is None:
+        logger.error("TLS not configured. Use --insecure to allow plaintext WS.")
+        sys.exit(1)
+
+    # 3. Signal handling and the blocking-I/O thread pool
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="agentpass-io")
+    )
+
+    # 4. Build registry from all service tool definitions
+    registry = build_registry(config.services)
+
+    # 5. Initialize services
+    services: dict[str, ServiceHandler] = {}
+    for name, svc_config in config.services.items():
+        if svc_config.handler == "python":
+            services[name] = _load_plugin_service(svc_config)
+        else:
+            services[name] = GenericHTTPService(svc_config)
+
+    # 6. Initialize database, run service health checks, and build the Telegram
+    # adapter concurrently. Building the adapter sets up PTB's HTTP client,
+    # which reads the CA bundle from disk, so it runs off the loop thread.
+    db = Database(config.storage.path)
+
+    async def _init_db() -> None:
+        await db.initialize()
+        await db.cleanup_stale_requests()
+
+    db_result, telegram, *health_results = await asyncio.gather(
+        _init_db(),
+        asyncio.to_thread(TelegramAdapter, config.messenger.telegram),
+        *(service.health_check() for service in services.values()),
+        return_exceptions=True,
+    )
+    for failure in (db_result, telegram):
+        if isinstance(failure, BaseException):
+            # Release the service sessions and DB connection already opened
+            await asyncio.gather(
+                *(_shutdown_step(f"service '{n}'", svc.close()) for n, svc in services.items())
+            )
+            await _shutdown_step("database", db.close())
+            raise failure
+    for name, healthy in zip(services, health_results, strict=True):
+        if isinstance(healthy, BaseException):
+            logger.warning("Service '%s' unreachable (%r) — continuing anyway", name, healthy)
+        elif not healthy:
+            logger.warning("Service '%s' unreachable — continuing anyway", name)
+
+    executor = Executor(
+        services,
+        registry,
+        max_concurrent_per_service=config.rate_limit.max_concurrent_per_service,
+    )
+
+    # 7. Initialize permission engine
+    engine = PermissionEngine(permissions, registry=registry)
+
+    # 8. Initialize gateway server
+    gateway = GatewayServer(
+        agent_token=config.agent.token,
+        engine=engine,
+        executor=executor,
+        messenger=telegram,
+        db=db,
+        approval_timeout=config.approval_timeout,
+        rate_limit_config=config.rate_limit,
+        registry=registry,
+        services=services,
+    )
+
+    # Wire approval callback
+    await telegram.on_approval_callback(gateway.resolve_approval)
+
+    # 9. PTB manual lifecycle -- NOT run_polling()
+    ptb_app = telegram.application
+    async with ptb_app:
+        await ptb_app.start()
+        await ptb_app.updater.start_polling(timeout=TELEGRAM_POLL_TIMEOUT)
+
+        # 10. SSL context
+        ssl_ctx = None
+        if config.gateway.tls:
+            ssl_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ssl_ctx.load_cert_chain(config.gateway.tls.cert, config.gateway.tls.key)
+
+        # 11. Start health HTTP server
+        async def _health_handler(request: web.Request) -> web.Response:
+            try:
+                status = await gateway.health_status()
+                code = 200 if status["status"] == "healthy" else 503
+                return web.json_response(status, status=code)
+            except Exception:
+                logger.exception("Health check failed")
+                return web.json_response(
+                    {"status": "unhealthy", "error": "internal error"},
+                    status=500,
+                )
+
+        health_app = web.Application()
+        health_app.router.add_get("/healthz", _health_handler)
+
+        # Wire dashboard routes
+        setup_dashboard(health_app, db)
+
+        health_runner = web.AppRunner(health_app)
+        await health_runner.setup()
+        health_host = config.gateway.health_host
+        health_port = config.gateway.health_port
+        health_site = web.TCPSite(health_runner, health_host, health_port)
+        await health_site.start()
+        logger.info("Health/dashboard on http://%s:%d", health_host, health_port)
+
+        # 12. Start WebSocket server
+        async with websockets.asyncio.server.serve(
+            gateway.handle_connection,
+            config.gateway.host,
+            config.gateway.port,
+            ssl=ssl_ctx,
+        ):
+            proto = "wss" if ssl_ctx else "ws"
+            logger.info(
+                "agentpass ready on %s://%s:%d",
+                proto,
+                config.gateway.host,
+                config.gateway.port,
+            )
+            await stop_event.wait()
+
+        # 13. Graceful shutdown -- pending requests are resolved first (this
+        # still needs Telegram and the DB), then independent components stop
+        # concurrently, and the DB closes last.
+        logger.info("Shutting down...")
+        await gateway.resolve_all_pending("gateway_shutdown")
+
+        async def _stop_ptb() -> None:
+            await ptb_app.updater.stop()  # updater must stop before the app
+            await ptb_app.stop()
+
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(_shutdown_step("health server", health_runner.cleanup()))
+            tg.create_task(_shutdown_step("telegram", telegram.stop()))
+            tg.create_task(_shutdown_step("telegram application", _stop_ptb()))
+            for name, svc in services.items():
+                tg.create_task(_shutdown_step(f"service '{name}'", svc.close()))
+
+    await db.close()
+    logger.info("agentpass stopped")
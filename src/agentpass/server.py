@@ -16,7 +16,7 @@ if TYPE_CHECKING:
     from agentpass.registry import ToolRegistry
 
 from agentpass.db import Database
-from agentpass.engine import PermissionEngine, build_signature, validate_args
+from agentpass.engine import PermissionEngine
 from agentpass.executor import ExecutionError, Executor
 from agentpass.messenger.base import (
     ApprovalChoice,
@@ -41,6 +41,12 @@ RATE_LIMIT_EXCEEDED = -32006
 
 AUTH_TIMEOUT = 10  # seconds
 
+# Every approval prompt offers the same buttons; built once and shared
+_APPROVAL_CHOICES = [
+    ApprovalChoice(label="Allow", action="allow"),
+    ApprovalChoice(label="Deny", action="deny"),
+]
+
 
 def _epoch_to_iso(epoch: float) -> str:
     """Convert epoch float to ISO 8601 string."""
@@ -227,16 +233,14 @@ class GatewayServer:
             await self._send_error(websocket, RATE_LIMIT_EXCEEDED, "Rate limit exceeded", msg_id)
             return
 
-        # Validate args
+        # Validate args and build the signature with the engine's registry, so
+        # the audit log and approval prompt show what the rules matched against
         try:
-            validate_args(tool_name, args)
+            signature = self._engine.build_signature(tool_name, args)
         except ValueError as e:
             await self._send_error(websocket, INVALID_REQUEST, str(e), msg_id)
             return
 
-        # Build signature
-        signature = build_signature(tool_name, args)
-
         # Generate unique request ID (decoupled from client msg_id)
         request_id = str(uuid.uuid4())
 
@@ -244,7 +248,7 @@ class GatewayServer:
         request = ToolRequest(id=request_id, tool_name=tool_name, args=args, signature=signature)
 
         # Evaluate permission
-        decision = self._engine.evaluate(tool_name, args)
+        decision = self._engine.evaluate(tool_name, args, signature=signature)
 
         # Log audit (initial decision)
         audit = AuditEntry(
@@ -289,40 +293,38 @@ class GatewayServer:
         """Send approval request to messenger and wait for response."""
         request_id = request.id
 
-        # Store in DB
+        # Register the future before anything is sent: the guardian may tap
+        # the prompt before the DB insert below has finished.
         expires_at_epoch = time.time() + self._approval_timeout
         expires_at_iso = _epoch_to_iso(expires_at_epoch)
-        await self._db.insert_pending(
-            request_id=request_id,
-            tool_name=request.tool_name,
-            args=request.args,
-            signature=request.signature,
-            expires_at=expires_at_iso,
-        )
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[ApprovalResult] = loop.create_future()
+        pending = PendingApproval(request=request, future=future, expires_at=expires_at_epoch)
+        self._pending[request_id] = pending
 
-        # Send to messenger
+        # Store in DB and send to messenger concurrently -- the two round trips
+        # are independent, so the guardian sees the prompt sooner.
         approval_req = ApprovalRequest(
             request_id=request_id,
             tool_name=request.tool_name,
             args=request.args,
             signature=request.signature,
         )
-        choices = [
-            ApprovalChoice(label="Allow", action="allow"),
-            ApprovalChoice(label="Deny", action="deny"),
-        ]
-        message_id = await self._messenger.send_approval(approval_req, choices)
-
-        # Create future and pending approval
-        loop = asyncio.get_running_loop()
-        future: asyncio.Future[ApprovalResult] = loop.create_future()
-        pending = PendingApproval(
-            request=request,
-            future=future,
-            message_id=message_id,
-            expires_at=expires_at_epoch,
-        )
-        self._pending[request_id] = pending
+        try:
+            _, message_id = await asyncio.gather(
+                self._db.insert_pending(
+                    request_id=request_id,
+                    tool_name=request.tool_name,
+                    args=request.args,
+                    signature=request.signature,
+                    expires_at=expires_at_iso,
+                ),
+                self._messenger.send_approval(approval_req, _APPROVAL_CHOICES),
+            )
+        except BaseException:
+            self._pending.pop(request_id, None)
+            raise
+        pending.message_id = message_id
 
         # Critical 2: Schedule timeout via messenger
         if hasattr(self._messenger, "schedule_timeout"):
@@ -1,25 +1,25 @@
-"""ServiceHandler abstract base class."""
+"""ServiceHandler base class."""
 
 from __future__ import annotations
 
-from abc import ABC, abstractmethod
 from typing import Any
 
 
-class ServiceHandler(ABC):
-    """Interface for service integrations."""
+class ServiceHandler:
+    """Interface for service integrations.
+
+    A plain base class rather than an ABC: handlers are built once at startup,
+    and plugin classes are checked for the required methods when loaded.
+    """
 
-    @abstractmethod
     async def execute(self, tool_name: str, args: dict[str, Any]) -> dict[str, Any]:
         """Execute a tool call and return the result."""
-        ...
+        raise NotImplementedError
 
-    @abstractmethod
     async def health_check(self) -> bool:
         """Check if the service is reachable."""
-        ...
+        raise NotImplementedError
 
-    @abstractmethod
     async def close(self) -> None:
         """Clean up resources."""
-        ...
+        raise NotImplementedError
@@ -2,14 +2,40 @@
 
 from __future__ import annotations
 
+import asyncio
+import copy
 import re
 from typing import Any
 
 import aiohttp
 
-from agentpass.config import ServiceConfig, ToolDefinition
+from agentpass._json import json_dumps, json_loads
+from agentpass.config import ResponseFilter, ServiceConfig, ToolDefinition
 from agentpass.services.base import ServiceHandler
 
+# Connection pool / timeout defaults for service sessions: keep connections
+# alive and cache DNS so short JSON calls reuse sockets instead of reconnecting.
+POOL_LIMIT = 32
+POOL_LIMIT_PER_HOST = 16
+DNS_CACHE_TTL = 300  # seconds
+KEEPALIVE_TIMEOUT = 60  # seconds
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def _inflight_key(tool_name: str, args: dict[str, Any]) -> tuple | None:
+    """Key identifying identical read requests, or None if args are unhashable.
+
+    Value types are part of the key, since ``1``, ``1.0`` and ``True`` compare
+    equal but render differently in the request.
+    """
+    try:
+        return (tool_name, frozenset((k, type(v), v) for k, v in args.items()))
+    except TypeError:
+        return None
+
 
 class HTTPServiceError(Exception):
     """Raised when a generic HTTP service call fails."""
@@ -30,6 +56,15 @@ class GenericHTTPService(ServiceHandler):
         self._session: aiohttp.ClientSession | None = None
         # Index tools by name for fast lookup
         self._tools: dict[str, ToolDefinition] = {t.name: t for t in config.tools}
+        # Full URLs for tools whose path has no {arg} placeholders
+        self._static_urls: dict[str, str] = {
+            t.name: self._base_url + t.request.path
+            for t in config.tools
+            if t.request is not None and not _PLACEHOLDER_RE.search(t.request.path)
+        }
+        self._health_url = self._base_url + config.health.path
+        # Identical GET requests already in flight, shared by concurrent callers
+        self._inflight: dict[tuple, asyncio.Future[dict[str, Any]]] = {}
 
     def _get_session(self) -> aiohttp.ClientSession:
         """Return existing session or create new one with auth headers."""
@@ -45,7 +80,19 @@ class GenericHTTPService(ServiceHandler):
                 auth_obj = aiohttp.BasicAuth(self._config.auth.username, self._config.auth.password)
             # query auth is handled per-request in _execute_request
 
-            self._session = aiohttp.ClientSession(headers=headers, auth=auth_obj)
+            connector = aiohttp.TCPConnector(
+                limit=POOL_LIMIT,
+                limit_per_host=POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                auth=auth_obj,
+                connector=connector,
+                json_serialize=json_dumps,
+                timeout=REQUEST_TIMEOUT,
+            )
         return self._session
 
     async def execute(self, tool_name: str, args: dict[str, Any]) -> dict[str, Any]:
@@ -56,6 +103,22 @@ class GenericHTTPService(ServiceHandler):
         if tool.request is None:
             raise HTTPServiceError(f"Tool {tool_name} has no request definition")
 
+        # Reads are side-effect free, so concurrent identical GETs share one
+        # upstream call.  Never applied to writes.
+        key = _inflight_key(tool_name, args) if tool.request.method == "GET" else None
+        if key is None:
+            return await self._send(tool, args)
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._send(tool, args))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't cancel the shared call.
+        # Each caller gets its own copy so later changes don't leak across.
+        return copy.copy(await asyncio.shield(pending))
+
+    async def _send(self, tool: ToolDefinition, args: dict[str, Any]) -> dict[str, Any]:
+        """Send the tool's request, mapping connection errors to HTTPServiceError."""
         session = self._get_session()
         try:
             return await self._execute_request(session, tool, args)
@@ -71,9 +134,10 @@ class GenericHTTPService(ServiceHandler):
         args: dict[str, Any],
     ) -> dict[str, Any]:
         """Build and send the HTTP request defined by the tool."""
-        # 1. Interpolate path template
-        path = self._interpolate_path(tool.request.path, args)
-        url = f"{self._base_url}{path}"
+        # 1. Interpolate path template (precomputed when it has no placeholders)
+        url = self._static_urls.get(tool.name)
+        if url is None:
+            url = self._base_url + self._interpolate_path(tool.request.path, args)
 
         # 2. Build query params (for query auth)
         params: dict[str, str] = {}
@@ -90,9 +154,13 @@ class GenericHTTPService(ServiceHandler):
         method_fn = getattr(session, method)
         async with method_fn(url, json=body, params=params or None) as resp:
             await self._check_response(resp)
-            data = await resp.json()
+            data = await resp.json(loads=json_loads)
 
-            # 5. Response wrapping
+            # 5. Response filtering (before wrapping, so less is sent to the agent)
+            if tool.response and tool.response.filter and isinstance(data, list):
+                data = self._filter_items(data, tool.response.filter, args)
+
+            # 6. Response wrapping
             if tool.response and tool.response.wrap:
                 return {tool.response.wrap: data}
             return data
@@ -106,14 +174,34 @@ class GenericHTTPService(ServiceHandler):
             val = args.get(key, "")
             return str(val)
 
-        return re.sub(r"\{(\w+)\}", replacer, path)
+        return _PLACEHOLDER_RE.sub(replacer, path)
+
+    @staticmethod
+    def _filter_items(
+        items: list[Any], resp_filter: ResponseFilter, args: dict[str, Any]
+    ) -> list[Any]:
+        """Keep items whose filter field starts with the interpolated prefix.
+
+        The filter is skipped (all items kept) unless every arg referenced by
+        the prefix template was supplied, so filter args stay optional.
+        """
+        if any(key not in args for key in _PLACEHOLDER_RE.findall(resp_filter.prefix)):
+            return items
+        prefix = GenericHTTPService._interpolate_path(resp_filter.prefix, args)
+        field = resp_filter.field
+        return [
+            item
+            for item in items
+            if isinstance(item, dict) and str(item.get(field, "")).startswith(prefix)
+        ]
 
     @staticmethod
     def _build_body(tool: ToolDefinition, args: dict[str, Any]) -> dict[str, Any]:
         """Build request body, excluding specified args."""
-        if tool.request.body_exclude:
-            return {k: v for k, v in args.items() if k not in tool.request.body_exclude}
-        return dict(args)
+        body = dict(args)
+        for key in tool.request.body_exclude or ():
+            body.pop(key, None)
+        return body
 
     async def _check_response(self, resp: aiohttp.ClientResponse) -> None:
         """Check HTTP response status, using service-level error mappings."""
@@ -144,7 +232,7 @@ class GenericHTTPService(ServiceHandler):
             health = self._config.health
             method_fn = getattr(session, health.method.lower())
             async with method_fn(
-                f"{self._base_url}{health.path}",
+                self._health_url,
                 timeout=aiohttp.ClientTimeout(total=5),
             ) as resp:
                 return resp.status == health.expect_status
@@ -4,12 +4,17 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import itertools
 import json
-from unittest.mock import AsyncMock, patch
+import math
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from unittest.mock import patch
 
 import pytest
 import websockets.exceptions
 
+from agentpass._json import json_dumps, json_loads
 from agentpass.client import (
     AgentPassClient,
     AgentPassConnectionError,
@@ -24,45 +29,113 @@ from agentpass.client import (
 
 
 class MockWebSocket:
-    """Simulates a WebSocket for testing the client SDK."""
+    """Simulates a WebSocket for testing the client SDK.
+
+    Incoming frames sit in a deque; the client's single reader parks on a
+    plain Future that feed() resolves, rather than on an asyncio.Queue.
+    """
+
+    __slots__ = ("_buf", "_closed", "_sent", "_waiter")
 
     def __init__(self) -> None:
         self._sent: list[str] = []
-        self._to_receive: asyncio.Queue[str] = asyncio.Queue()
+        self._buf: deque[str] = deque()
+        self._waiter: asyncio.Future[None] | None = None
         self._closed = False
 
     async def send(self, data: str) -> None:
         self._sent.append(data)
 
     async def recv(self) -> str:
-        return await self._to_receive.get()
+        while not self._buf:
+            await self._wait()
+        return self._buf.popleft()
 
     async def close(self) -> None:
         self._closed = True
 
     def feed(self, data: str) -> None:
         """Queue a message for the client to receive."""
-        self._to_receive.put_nowait(data)
+        self._buf.append(data)
+        self._wake()
+
+    def feed_many(self, *data: str) -> None:
+        """Queue several messages, waking the reader once for the batch."""
+        self._buf.extend(data)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Resume the reader if it is waiting."""
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _wait(self) -> None:
+        """Park the (single) reader until _wake() is called."""
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
 
     def __aiter__(self):
         return self
 
     async def __anext__(self) -> str:
+        if self._buf:
+            return self._buf.popleft()  # no timer needed when a frame is waiting
         try:
-            return await asyncio.wait_for(self._to_receive.get(), timeout=0.1)
+            async with asyncio.timeout(0.1):
+                return await self.recv()
         except (TimeoutError, asyncio.CancelledError):
             raise StopAsyncIteration from None
 
 
+class FakeConnect:
+    """Stand-in for websockets.connect: returns or raises the next scripted outcome.
+
+    A plain async callable rather than an AsyncMock, so every connect (one
+    per test, several per reconnect test) skips the mock call-recording
+    machinery.
+    """
+
+    def __init__(self, outcomes: Iterable[MockWebSocket | Exception]) -> None:
+        self._outcomes = iter(outcomes)
+        self.urls: list[str] = []  # one entry per call
+
+    @property
+    def call_count(self) -> int:
+        return len(self.urls)
+
+    async def __call__(self, url: str) -> MockWebSocket:
+        self.urls.append(url)
+        outcome = next(self._outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-AUTH_SUCCESS = json.dumps({"jsonrpc": "2.0", "result": {"status": "authenticated"}, "id": "auth-1"})
+
+def _sent_frames(ws: MockWebSocket) -> list[dict]:
+    """Decode every frame the client has sent on *ws*, once each."""
+    return [json_loads(m) for m in ws._sent]
+
+
+async def _until_pending(client: AgentPassClient, *request_ids: int) -> None:
+    """Yield to the loop until the client is waiting on every given request id."""
+    async with asyncio.timeout(1):
+        while not all(rid in client._pending for rid in request_ids):
+            await asyncio.sleep(0)
+
+
+AUTH_SUCCESS = json_dumps({"jsonrpc": "2.0", "result": {"status": "authenticated"}, "id": "auth-1"})
 
 
 def _tool_result(request_id: int, data: dict) -> str:
-    return json.dumps(
+    return json_dumps(
         {
             "jsonrpc": "2.0",
             "result": {"status": "executed", "data": data},
@@ -72,7 +145,7 @@ def _tool_result(request_id: int, data: dict) -> str:
 
 
 def _tool_error(request_id: int, code: int, message: str) -> str:
-    return json.dumps(
+    return json_dumps(
         {
             "jsonrpc": "2.0",
             "error": {"code": code, "message": message},
@@ -81,6 +154,38 @@ def _tool_error(request_id: int, code: int, message: str) -> str:
     )
 
 
+def _pending_results(request_id: int, results: list[dict]) -> str:
+    return json_dumps({"jsonrpc": "2.0", "result": {"results": results}, "id": request_id})
+
+
+AUTH_INVALID_TOKEN = json_dumps(
+    {"jsonrpc": "2.0", "error": {"code": -32005, "message": "Invalid token"}, "id": "auth-1"}
+)
+AUTH_UNEXPECTED_STATUS = json_dumps(
+    {"jsonrpc": "2.0", "result": {"status": "something_else"}, "id": "auth-1"}
+)
+
+# Canonical gateway responses to request id 1, serialized once at import
+TOOL_OK_1_TEMP = _tool_result(1, {"state": "21.3"})
+TOOL_ERR_1_POLICY_DENIED = _tool_error(1, -32003, "Policy denied")
+TOOL_ERR_1_USER_DENIED = _tool_error(1, -32001, "Denied by user")
+TOOL_ERR_1_APPROVAL_TIMEOUT = _tool_error(1, -32002, "Approval timed out")
+TOOL_ERR_1_EXECUTION_FAILED = _tool_error(1, -32004, "Execution failed")
+TOOL_ERR_1_RATE_LIMITED = _tool_error(1, -32006, "Rate limit exceeded")
+
+# Offline results as the gateway stores them: already-encoded JSON strings
+STORED_EXECUTED_ON = '{"status":"executed","data":{"state":"on"}}'
+STORED_EXECUTED_BRIGHTNESS = '{"status":"executed","data":{"brightness":100}}'
+STORED_DENIED_POLICY = '{"status":"denied","data":"Policy denied"}'
+
+# get_pending_results responses; the reconnect fetch is request id 2
+PENDING_RESULTS_1_EMPTY = _pending_results(1, [])
+PENDING_RESULTS_2_ON = _pending_results(2, [{"request_id": 1, "result": STORED_EXECUTED_ON}])
+PENDING_RESULTS_2_BRIGHTNESS = _pending_results(
+    2, [{"request_id": 1, "result": STORED_EXECUTED_BRIGHTNESS}]
+)
+
+
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -93,9 +198,27 @@ def mock_ws() -> MockWebSocket:
 
 @pytest.fixture
 def patch_connect(mock_ws: MockWebSocket):
-    with patch("agentpass.client.websockets.connect", new_callable=AsyncMock) as m:
-        m.return_value = mock_ws
-        yield m
+    connect = FakeConnect(itertools.repeat(mock_ws))
+    with patch("agentpass.client.websockets.connect", connect):
+        yield connect
+
+
+@pytest.fixture
+async def connected():
+    """(client, mock_ws) after the auth handshake; the client is closed on teardown.
+
+    Self-contained rather than built on mock_ws/patch_connect, so tests that
+    only need a connected client resolve a single fixture.
+    """
+    ws = MockWebSocket()
+    ws.feed(AUTH_SUCCESS)
+    with patch("agentpass.client.websockets.connect", FakeConnect([ws])):
+        client = AgentPassClient("ws://localhost:8443", "test-token")
+        await client.connect()
+    try:
+        yield client, ws
+    finally:
+        await client.close()
 
 
 # ---------------------------------------------------------------------------
@@ -143,11 +266,11 @@ class TestConnectAndAuthenticate:
         await client.connect()
 
         # Verify websockets.connect was called with the URL
-        patch_connect.assert_called_once_with("ws://localhost:8443")
+        assert patch_connect.urls == ["ws://localhost:8443"]
 
         # Verify auth message was sent
         assert len(mock_ws._sent) == 1
-        auth_msg = json.loads(mock_ws._sent[0])
+        (auth_msg,) = _sent_frames(mock_ws)
         assert auth_msg["jsonrpc"] == "2.0"
         assert auth_msg["method"] == "auth"
         assert auth_msg["params"]["token"] == "test-token"
@@ -161,15 +284,7 @@ class TestConnectAndAuthenticate:
 
     async def test_auth_failure_invalid_token(self, mock_ws, patch_connect):
         """Server returns error, client raises AgentPassConnectionError."""
-        mock_ws.feed(
-            json.dumps(
-                {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32005, "message": "Invalid token"},
-                    "id": "auth-1",
-                }
-            )
-        )
+        mock_ws.feed(AUTH_INVALID_TOKEN)
 
         client = AgentPassClient("ws://localhost:8443", "bad-token")
         with pytest.raises(AgentPassConnectionError) as exc_info:
@@ -181,15 +296,7 @@ class TestConnectAndAuthenticate:
 
     async def test_auth_failure_unexpected_response(self, mock_ws, patch_connect):
         """Server returns non-'authenticated' status, raises AgentPassConnectionError."""
-        mock_ws.feed(
-            json.dumps(
-                {
-                    "jsonrpc": "2.0",
-                    "result": {"status": "something_else"},
-                    "id": "auth-1",
-                }
-            )
-        )
+        mock_ws.feed(AUTH_UNEXPECTED_STATUS)
 
         client = AgentPassClient("ws://localhost:8443", "test-token")
         with pytest.raises(AgentPassConnectionError) as exc_info:
@@ -206,152 +313,51 @@ class TestConnectAndAuthenticate:
 
 
 class TestToolRequests:
-    async def test_tool_request_success(self, mock_ws, patch_connect):
+    async def test_tool_request_success(self, connected):
         """Send tool_request, get result back, verify JSON-RPC format."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_result(1, {"state": "21.3"}))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
+        client, mock_ws = connected
+        # Fed up front: tool_request registers its id before it first yields,
+        # so the reader can't see the response before the request is pending
+        mock_ws.feed(TOOL_OK_1_TEMP)
         result = await client.tool_request("ha_get_state", entity_id="sensor.temp")
         assert result == {"state": "21.3"}
 
         # Verify the sent JSON-RPC
-        sent = json.loads(mock_ws._sent[-1])
+        sent = _sent_frames(mock_ws)[-1]
         assert sent["jsonrpc"] == "2.0"
         assert sent["method"] == "tool_request"
         assert sent["params"]["tool"] == "ha_get_state"
         assert sent["params"]["args"] == {"entity_id": "sensor.temp"}
         assert sent["id"] == 1
 
-        await client.close()
-
-    async def test_tool_request_denied_by_policy(self, mock_ws, patch_connect):
-        """Server returns -32003, raises AgentPassDenied."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_error(1, -32003, "Policy denied"))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
-        with pytest.raises(AgentPassDenied) as exc_info:
-            await client.tool_request("ha_call_service", domain="lock", service="lock")
-
-        assert exc_info.value.code == -32003
-        assert "Policy denied" in exc_info.value.message
-
-        await client.close()
-
-    async def test_tool_request_denied_by_user(self, mock_ws, patch_connect):
-        """Server returns -32001, raises AgentPassDenied."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_error(1, -32001, "Denied by user"))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
-        with pytest.raises(AgentPassDenied) as exc_info:
-            await client.tool_request("ha_call_service", domain="lock", service="unlock")
-
-        assert exc_info.value.code == -32001
-        assert "Denied by user" in exc_info.value.message
-
-        await client.close()
-
-    async def test_tool_request_timeout(self, mock_ws, patch_connect):
-        """Server returns -32002, raises AgentPassTimeout."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_error(1, -32002, "Approval timed out"))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
-        with pytest.raises(AgentPassTimeout) as exc_info:
-            await client.tool_request("ha_call_service", domain="light", service="turn_on")
-
-        assert exc_info.value.code == -32002
-        assert "timed out" in exc_info.value.message.lower()
-
-        await client.close()
-
-    async def test_tool_request_execution_error(self, mock_ws, patch_connect):
-        """Server returns -32004, raises AgentPassError."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_error(1, -32004, "Execution failed"))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
-        with pytest.raises(AgentPassError) as exc_info:
-            await client.tool_request("ha_get_state", entity_id="sensor.broken")
-
-        assert exc_info.value.code == -32004
-        assert "Execution failed" in exc_info.value.message
-
-        await client.close()
-
-    async def test_tool_request_rate_limited(self, mock_ws, patch_connect):
-        """Server returns -32006, raises AgentPassError."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_error(1, -32006, "Rate limit exceeded"))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
-        with pytest.raises(AgentPassError) as exc_info:
-            await client.tool_request("ha_get_state", entity_id="sensor.temp")
-
-        assert exc_info.value.code == -32006
-        assert "Rate limit" in exc_info.value.message
-
-        await client.close()
-
-    async def test_tool_request_other_error(self, mock_ws, patch_connect):
-        """Server returns some other error code, raises AgentPassError."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_error(1, -99999, "Unknown server error"))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
+    @pytest.mark.parametrize(
+        ("frame", "exc_type", "code", "message"),
+        [
+            (TOOL_ERR_1_POLICY_DENIED, AgentPassDenied, -32003, "Policy denied"),
+            (TOOL_ERR_1_USER_DENIED, AgentPassDenied, -32001, "Denied by user"),
+            (TOOL_ERR_1_APPROVAL_TIMEOUT, AgentPassTimeout, -32002, "Approval timed out"),
+            (TOOL_ERR_1_EXECUTION_FAILED, AgentPassError, -32004, "Execution failed"),
+            (TOOL_ERR_1_RATE_LIMITED, AgentPassError, -32006, "Rate limit exceeded"),
+            # Unknown codes get the base class, not a subclass-specific exception
+            (
+                _tool_error(1, -99999, "Unknown server error"),
+                AgentPassError,
+                -99999,
+                "Unknown server error",
+            ),
+        ],
+        ids=["policy", "user", "timeout", "execution", "rate_limit", "other"],
+    )
+    async def test_tool_request_error(self, connected, frame, exc_type, code, message):
+        """Server error codes map to the matching exception type, code, and message."""
+        client, mock_ws = connected
+        mock_ws.feed(frame)
         with pytest.raises(AgentPassError) as exc_info:
             await client.tool_request("ha_get_state", entity_id="sensor.temp")
 
-        assert exc_info.value.code == -99999
-        assert "Unknown server error" in exc_info.value.message
-        # Should NOT be a subclass-specific exception for unknown codes
-        assert type(exc_info.value) is AgentPassError
-
-        await client.close()
+        assert type(exc_info.value) is exc_type
+        assert exc_info.value.code == code
+        assert exc_info.value.message == message
 
 
 # ---------------------------------------------------------------------------
@@ -360,19 +366,17 @@ class TestToolRequests:
 
 
 class TestConcurrentRequests:
-    async def test_concurrent_tool_requests(self, mock_ws, patch_connect):
+    async def test_concurrent_tool_requests(self, connected):
         """Two requests sent concurrently, each gets correct response by ID."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
+        client, mock_ws = connected
 
         async def respond():
-            await asyncio.sleep(0.01)
+            await _until_pending(client, 1, 2)
             # Respond to request 2 first, then 1 (out of order)
-            mock_ws.feed(_tool_result(2, {"entity": "light.bedroom", "state": "off"}))
-            await asyncio.sleep(0.01)
-            mock_ws.feed(_tool_result(1, {"entity": "sensor.temp", "state": "22.0"}))
+            mock_ws.feed_many(
+                _tool_result(2, {"entity": "light.bedroom", "state": "off"}),
+                _tool_result(1, {"entity": "sensor.temp", "state": "22.0"}),
+            )
 
         _responder = asyncio.create_task(respond())  # noqa: RUF006
 
@@ -385,8 +389,6 @@ class TestConcurrentRequests:
         assert result1 == {"entity": "sensor.temp", "state": "22.0"}
         assert result2 == {"entity": "light.bedroom", "state": "off"}
 
-        await client.close()
-
 
 # ---------------------------------------------------------------------------
 # T1-5: Context manager
@@ -436,13 +438,9 @@ class TestClose:
 
 
 class TestGetPendingResults:
-    async def test_get_pending_results_with_results(self, mock_ws, patch_connect):
+    async def test_get_pending_results_with_results(self, connected):
         """Returns results list and resolves matching pending futures."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
+        client, mock_ws = connected
         # Simulate a pending future for a request made before disconnect
         loop = asyncio.get_running_loop()
         old_future = loop.create_future()
@@ -451,27 +449,15 @@ class TestGetPendingResults:
         results_data = [
             {
                 "request_id": 42,
-                "result": json.dumps({"status": "executed", "data": {"state": "on"}}),
+                "result": STORED_EXECUTED_ON,
             },
             {
                 "request_id": 99,
-                "result": json.dumps({"status": "denied", "data": "Policy denied"}),
+                "result": STORED_DENIED_POLICY,
             },
         ]
 
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(
-                json.dumps(
-                    {
-                        "jsonrpc": "2.0",
-                        "result": {"results": results_data},
-                        "id": 1,
-                    }
-                )
-            )
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
+        mock_ws.feed(_pending_results(1, results_data))
         results = await client.get_pending_results()
 
         assert len(results) == 2
@@ -482,34 +468,14 @@ class TestGetPendingResults:
         assert old_future.done()
         assert old_future.result() == {"state": "on"}
 
-        await client.close()
-
-    async def test_get_pending_results_empty(self, mock_ws, patch_connect):
+    async def test_get_pending_results_empty(self, connected):
         """Returns empty list when no pending results."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            mock_ws.feed(
-                json.dumps(
-                    {
-                        "jsonrpc": "2.0",
-                        "result": {"results": []},
-                        "id": 1,
-                    }
-                )
-            )
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
+        client, mock_ws = connected
+        mock_ws.feed(PENDING_RESULTS_1_EMPTY)
         results = await client.get_pending_results()
 
         assert results == []
 
-        await client.close()
-
 
 # ---------------------------------------------------------------------------
 # T1-8: _next_id increments
@@ -538,32 +504,24 @@ class ReconnectMockWebSocket(MockWebSocket):
     disconnect() is called, closely mimicking real websocket behavior.
     """
 
+    __slots__ = ("_disconnected",)
+
     def __init__(self) -> None:
         super().__init__()
-        self._disconnect_event = asyncio.Event()
+        self._disconnected = False
 
     def disconnect(self) -> None:
         """Signal that the connection should be closed."""
-        self._disconnect_event.set()
+        self._disconnected = True
+        self._wake()
 
     async def __anext__(self) -> str:
-        # Race: either a message arrives or disconnect is signaled
-        msg_task = asyncio.ensure_future(self._to_receive.get())
-        disc_task = asyncio.ensure_future(self._disconnect_event.wait())
-        done, pending = await asyncio.wait(
-            [msg_task, disc_task], return_when=asyncio.FIRST_COMPLETED
-        )
-        for t in pending:
-            t.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await t
-        if disc_task in done:
-            # If msg_task also completed, put the message back
-            if msg_task in done and not msg_task.cancelled():
-                with contextlib.suppress(Exception):
-                    self._to_receive.put_nowait(msg_task.result())
+        # One waiter, woken by either feed() or disconnect()
+        while not self._disconnected and not self._buf:
+            await self._wait()
+        if self._disconnected:
             raise websockets.exceptions.ConnectionClosed(None, None)
-        return msg_task.result()
+        return self._buf.popleft()
 
 
 def _make_mock_ws(*, auth_success: bool = True) -> ReconnectMockWebSocket:
@@ -574,10 +532,40 @@ def _make_mock_ws(*, auth_success: bool = True) -> ReconnectMockWebSocket:
     return ws
 
 
-async def _yield_control() -> None:
-    """Yield control to the event loop so background tasks can run."""
-    for _ in range(20):
-        await asyncio.sleep(0)
+@contextlib.asynccontextmanager
+async def _reconnect_env(
+    outcomes: Iterable[MockWebSocket | Exception],
+    *,
+    token: str = "test-token",
+    max_retries: int | None = None,
+    backoff_sleep: Callable[[float], Awaitable[None]] | None = None,
+) -> AsyncIterator[tuple[AgentPassClient, FakeConnect, list[float]]]:
+    """Connect a client against scripted connect *outcomes*; close it on exit.
+
+    Yields (client, connect, sleep_delays).  Unless *backoff_sleep* is given,
+    reconnect backoff is instant and each delay is recorded in sleep_delays.
+    """
+    connect = FakeConnect(outcomes)
+    sleep_delays: list[float] = []
+
+    async def record_sleep(delay: float) -> None:
+        sleep_delays.append(delay)
+
+    async with contextlib.AsyncExitStack() as stack:
+        stack.enter_context(patch("agentpass.client.websockets.connect", connect))
+        client = AgentPassClient("ws://localhost:8443", token, max_retries=max_retries)
+        client._backoff_sleep = backoff_sleep or record_sleep
+        await client.connect()
+        stack.push_async_callback(client.close)
+        yield client, connect, sleep_delays
+
+
+async def _until_reconnected(client: AgentPassClient) -> None:
+    """Wait for the reconnect a disconnect triggered to finish (or give up)."""
+    async with asyncio.timeout(1):
+        while client._reconnect_task is None:
+            await asyncio.sleep(0)
+        await client._reconnect_task
 
 
 class TestReconnectOnDisconnect:
@@ -586,183 +574,74 @@ class TestReconnectOnDisconnect:
         ws1 = _make_mock_ws()
         ws2 = _make_mock_ws()
 
-        connect_mock = AsyncMock(side_effect=[ws1, ws2])
-
-        sleep_delays: list[float] = []
-
-        async def fake_sleep(delay: float) -> None:
-            sleep_delays.append(delay)
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
+        async with _reconnect_env([ws1, ws2]) as (client, connect_mock, sleep_delays):
             # Verify initial connection
             assert connect_mock.call_count == 1
 
             # Trigger disconnect
             ws1.disconnect()
-            await _yield_control()
+            await _until_reconnected(client)
 
             # Should have reconnected
             assert connect_mock.call_count == 2
 
             # Verify auth was sent on the second connection
-            found_auth = any(json.loads(m).get("method") == "auth" for m in ws2._sent)
+            found_auth = any(m.get("method") == "auth" for m in _sent_frames(ws2))
             assert found_auth, "Auth message not sent on reconnection"
 
             # sleep was called with initial delay of 1.0
             assert len(sleep_delays) >= 1
             assert sleep_delays[0] == 1.0
 
-            await client.close()
-
-
-class TestReconnectExponentialBackoff:
-    async def test_reconnect_exponential_backoff(self):
-        """Delay doubles on each failed reconnect: 1s, 2s, 4s."""
-        ws1 = _make_mock_ws()
-        ws_final = _make_mock_ws()
-
-        # First connect succeeds, next 3 reconnect attempts fail, 4th succeeds
-        connect_mock = AsyncMock(
-            side_effect=[
-                ws1,
-                OSError("fail 1"),
-                OSError("fail 2"),
-                OSError("fail 3"),
-                ws_final,
-            ]
-        )
-
-        sleep_delays: list[float] = []
-
-        async def fake_sleep(delay: float) -> None:
-            sleep_delays.append(delay)
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
-            # Trigger disconnect
-            ws1.disconnect()
-            await _yield_control()
-
-            # Should have reconnected after 3 failures
-            assert connect_mock.call_count == 5  # 1 initial + 4 reconnect attempts
-
-            # Verify exponential backoff: 1, 2, 4, 8
-            assert sleep_delays[0] == 1.0
-            assert sleep_delays[1] == 2.0
-            assert sleep_delays[2] == 4.0
-            assert sleep_delays[3] == 8.0
-
-            await client.close()
-
-
-class TestReconnectBackoffCapped:
-    async def test_reconnect_backoff_capped_at_30s(self):
-        """After enough retries the delay should not exceed 30s."""
-        ws1 = _make_mock_ws()
-        ws_final = _make_mock_ws()
-
-        # Need enough failures to reach the cap: 1, 2, 4, 8, 16, 32->30, 30
-        failures = [OSError(f"fail {i}") for i in range(7)]
-        connect_mock = AsyncMock(side_effect=[ws1, *failures, ws_final])
-
-        sleep_delays: list[float] = []
-
-        async def fake_sleep(delay: float) -> None:
-            sleep_delays.append(delay)
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
-            ws1.disconnect()
-            await _yield_control()
-
-            # Delays: 1, 2, 4, 8, 16, 30, 30, 30
-            assert all(d <= 30.0 for d in sleep_delays), f"Delays exceeded cap: {sleep_delays}"
-            # The 6th delay (index 5) should be capped at 30
-            assert sleep_delays[5] == 30.0
-
-            await client.close()
-
-
-class TestMaxRetriesExhausted:
-    async def test_max_retries_exhausted(self):
-        """With max_retries=2, after 2 failed attempts raises AgentPassConnectionError."""
-        ws1 = _make_mock_ws()
-
-        connect_mock = AsyncMock(
-            side_effect=[
-                ws1,
-                OSError("fail 1"),
-                OSError("fail 2"),
-            ]
-        )
-
-        sleep_delays: list[float] = []
-
-        async def fake_sleep(delay: float) -> None:
-            sleep_delays.append(delay)
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token", max_retries=2)
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
-            # Create a pending future that should be failed
-            loop = asyncio.get_running_loop()
-            pending_future = loop.create_future()
-            client._pending[999] = pending_future
-
-            ws1.disconnect()
-            await _yield_control()
 
-            # Pending future should have been failed with ConnectionError
-            assert pending_future.done()
-            with pytest.raises(AgentPassConnectionError) as exc_info:
-                pending_future.result()
-            assert "Connection lost" in exc_info.value.message
-
-            await client.close()
-
-
-class TestInfiniteRetriesDefault:
-    async def test_infinite_retries_default(self):
-        """With default max_retries=None, keeps retrying. Succeed on 3rd attempt."""
+class TestReconnectBackoff:
+    @pytest.mark.parametrize(
+        ("failures", "max_retries", "expected_delays"),
+        [
+            # Delay doubles on each failed reconnect
+            (3, None, [1.0, 2.0, 4.0, 8.0]),
+            # ...but is capped at 30s
+            (7, None, [1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0, 30.0]),
+            # No max_retries: keeps retrying until a connect succeeds
+            (2, None, [1.0, 2.0, 4.0]),
+            # max_retries reached: gives up without a final attempt
+            (2, 2, [1.0, 2.0]),
+        ],
+        ids=["exponential", "capped_at_30s", "infinite_by_default", "max_retries_exhausted"],
+    )
+    async def test_reconnect_backoff(self, failures, max_retries, expected_delays):
+        """Reconnect attempts back off 1s, 2s, 4s, ... up to 30s, within max_retries."""
         ws1 = _make_mock_ws()
-        ws_final = _make_mock_ws()
-
-        connect_mock = AsyncMock(
-            side_effect=[
-                ws1,
-                OSError("fail 1"),
-                OSError("fail 2"),
-                ws_final,
-            ]
+        gives_up = max_retries is not None and failures >= max_retries
+        outcomes = itertools.chain(
+            [ws1],
+            (OSError(f"fail {i}") for i in range(failures)),
+            [] if gives_up else [_make_mock_ws()],
         )
 
-        async def fake_sleep(_delay: float) -> None:
-            pass
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
+        async with _reconnect_env(outcomes, max_retries=max_retries) as (
+            client,
+            connect_mock,
+            sleep_delays,
+        ):
+            if gives_up:
+                # A request in flight when the connection drops
+                pending_future = asyncio.get_running_loop().create_future()
+                client._pending[999] = pending_future
 
             ws1.disconnect()
-            await _yield_control()
+            await _until_reconnected(client)
 
-            # Should have eventually reconnected
-            assert connect_mock.call_count == 4  # initial + 3 reconnect attempts
+            assert sleep_delays == expected_delays
+            # Initial connect + one attempt per delay
+            assert connect_mock.call_count == 1 + len(expected_delays)
 
-            await client.close()
+            if gives_up:
+                # Pending future should have been failed with ConnectionError
+                assert pending_future.done()
+                with pytest.raises(AgentPassConnectionError) as exc_info:
+                    pending_future.result()
+                assert "Connection lost" in exc_info.value.message
 
 
 class TestReauthOnReconnect:
@@ -771,30 +650,17 @@ class TestReauthOnReconnect:
         ws1 = _make_mock_ws()
         ws2 = _make_mock_ws()
 
-        connect_mock = AsyncMock(side_effect=[ws1, ws2])
-
-        async def fake_sleep(_delay: float) -> None:
-            pass
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "my-secret-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
+        async with _reconnect_env([ws1, ws2], token="my-secret-token") as (client, _, _):
             # Trigger disconnect
             ws1.disconnect()
-            await _yield_control()
+            await _until_reconnected(client)
 
             # Verify auth was sent on ws2
-            auth_messages = [
-                json.loads(m) for m in ws2._sent if json.loads(m).get("method") == "auth"
-            ]
+            auth_messages = [m for m in _sent_frames(ws2) if m.get("method") == "auth"]
             assert len(auth_messages) == 1
             assert auth_messages[0]["params"]["token"] == "my-secret-token"
             assert auth_messages[0]["id"] == "auth-1"
 
-            await client.close()
-
 
 class TestPendingResultsFetchedOnReconnect:
     async def test_pending_results_fetched_on_reconnect(self):
@@ -802,37 +668,11 @@ class TestPendingResultsFetchedOnReconnect:
         ws1 = _make_mock_ws()
         ws2 = ReconnectMockWebSocket()
 
-        # ws2 auth response + get_pending_results response (fetched via recv)
-        ws2.feed(AUTH_SUCCESS)
-        ws2.feed(
-            json.dumps(
-                {
-                    "jsonrpc": "2.0",
-                    "result": {
-                        "results": [
-                            {
-                                "request_id": 1,
-                                "result": json.dumps(
-                                    {"status": "executed", "data": {"state": "on"}}
-                                ),
-                            },
-                        ]
-                    },
-                    "id": 2,  # ID assigned by _next_id during _fetch_pending_on_reconnect
-                }
-            )
-        )
-
-        connect_mock = AsyncMock(side_effect=[ws1, ws2])
-
-        async def fake_sleep(_delay: float) -> None:
-            pass
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
+        # ws2 auth response + get_pending_results response (fetched via recv);
+        # id 2 is assigned by _next_id during _fetch_pending_on_reconnect
+        ws2.feed_many(AUTH_SUCCESS, PENDING_RESULTS_2_ON)
 
+        async with _reconnect_env([ws1, ws2]) as (client, _, _):
             # Simulate a pending future from a tool_request made before disconnect
             loop = asyncio.get_running_loop()
             pending_future = loop.create_future()
@@ -840,22 +680,18 @@ class TestPendingResultsFetchedOnReconnect:
 
             # Trigger disconnect
             ws1.disconnect()
-            await _yield_control()
+            await _until_reconnected(client)
 
             # The pending future should have been resolved via _fetch_pending_on_reconnect
             assert pending_future.done()
             assert pending_future.result() == {"state": "on"}
 
-            await client.close()
-
 
 class TestCloseStopsReconnection:
     async def test_close_stops_reconnection(self):
         """If close() is called, reconnection loop stops."""
         ws1 = _make_mock_ws()
 
-        connect_mock = AsyncMock(side_effect=[ws1])
-
         close_reached = asyncio.Event()
 
         async def fake_sleep(_delay: float) -> None:
@@ -864,15 +700,12 @@ class TestCloseStopsReconnection:
             # Actually sleep briefly to give close() a chance to set _closed
             await asyncio.sleep(0.1)
 
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
+        async with _reconnect_env([ws1], backoff_sleep=fake_sleep) as (client, connect_mock, _):
             ws1.disconnect()
 
             # Wait for reconnect loop to start
-            await asyncio.wait_for(close_reached.wait(), timeout=1.0)
+            async with asyncio.timeout(1.0):
+                await close_reached.wait()
 
             # Now close the client -- should set _closed flag
             await client.close()
@@ -889,36 +722,9 @@ class TestToolRequestDuringReconnect:
         ws2 = ReconnectMockWebSocket()
 
         # Prepare ws2 with auth + pending results (for the request made on ws1)
-        ws2.feed(AUTH_SUCCESS)
-        ws2.feed(
-            json.dumps(
-                {
-                    "jsonrpc": "2.0",
-                    "result": {
-                        "results": [
-                            {
-                                "request_id": 1,
-                                "result": json.dumps(
-                                    {"status": "executed", "data": {"brightness": 100}}
-                                ),
-                            },
-                        ]
-                    },
-                    "id": 2,
-                }
-            )
-        )
-
-        connect_mock = AsyncMock(side_effect=[ws1, ws2])
-
-        async def fake_sleep(_delay: float) -> None:
-            pass
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
+        ws2.feed_many(AUTH_SUCCESS, PENDING_RESULTS_2_BRIGHTNESS)
 
+        async with _reconnect_env([ws1, ws2]) as (client, _, _):
             # Simulate a pending future from a tool_request that was sent
             # before disconnect (inject it manually to avoid send issues)
             loop = asyncio.get_running_loop()
@@ -929,11 +735,10 @@ class TestToolRequestDuringReconnect:
             ws1.disconnect()
 
             # The pending_future should eventually resolve after reconnect
-            result = await asyncio.wait_for(pending_future, timeout=2.0)
+            async with asyncio.timeout(2.0):
+                result = await pending_future
             assert result == {"brightness": 100}
 
-            await client.close()
-
 
 # ---------------------------------------------------------------------------
 # New tests for review findings
@@ -950,55 +755,29 @@ class TestToolRequestWaitsForReconnect:
         # No pending results to fetch (client._pending will be empty at reconnect time
         # because we haven't added any yet)
 
-        connect_mock = AsyncMock(side_effect=[ws1, ws2])
-
-        reconnect_started = asyncio.Event()
-
-        original_fake_sleep_called = False
-
-        async def fake_sleep(_delay: float) -> None:
-            nonlocal original_fake_sleep_called
-            original_fake_sleep_called = True
-            reconnect_started.set()
-
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
+        async with _reconnect_env([ws1, ws2]) as (client, _, sleep_delays):
             # Trigger disconnect — _connected.clear() happens in _read_loop
             ws1.disconnect()
-            await _yield_control()
-
-            # Wait for reconnect to start (enters sleep)
-            await asyncio.wait_for(reconnect_started.wait(), timeout=2.0)
-
-            # Now the reconnect has completed (fake_sleep is instant)
-            await _yield_control()
+            await _until_reconnected(client)
+            assert sleep_delays  # went through the backoff
 
             # At this point ws2 is connected. Send a tool_request — it should succeed.
             async def respond():
-                await asyncio.sleep(0.01)
+                await _until_pending(client, 1)
                 # request_id is 1 because _next_id was called once for tool_request
                 ws2.feed(_tool_result(1, {"state": "42"}))
 
             _task = asyncio.create_task(respond())  # noqa: RUF006
-            result = await asyncio.wait_for(
-                client.tool_request("ha_get_state", entity_id="sensor.test"),
-                timeout=2.0,
-            )
+            async with asyncio.timeout(2.0):
+                result = await client.tool_request("ha_get_state", entity_id="sensor.test")
             assert result == {"state": "42"}
 
-            await client.close()
-
 
 class TestCloseCancelsReconnectTask:
     async def test_close_cancels_reconnect_task(self):
         """close() cancels a running reconnect task."""
         ws1 = _make_mock_ws()
 
-        connect_mock = AsyncMock(side_effect=[ws1])
-
         reconnect_entered_sleep = asyncio.Event()
 
         async def fake_sleep(_delay: float) -> None:
@@ -1006,16 +785,13 @@ class TestCloseCancelsReconnectTask:
             # Block until cancelled — simulates a long backoff
             await asyncio.sleep(60)
 
-        with patch("agentpass.client.websockets.connect", connect_mock):
-            client = AgentPassClient("ws://localhost:8443", "test-token")
-            client._backoff_sleep = fake_sleep
-            await client.connect()
-
+        async with _reconnect_env([ws1], backoff_sleep=fake_sleep) as (client, _, _):
             # Trigger disconnect so _reconnect starts
             ws1.disconnect()
 
             # Wait for reconnect to enter its sleep
-            await asyncio.wait_for(reconnect_entered_sleep.wait(), timeout=2.0)
+            async with asyncio.timeout(2.0):
+                await reconnect_entered_sleep.wait()
 
             # reconnect_task should exist and be running
             assert client._reconnect_task is not None
@@ -1028,26 +804,24 @@ class TestCloseCancelsReconnectTask:
 
 
 class TestReadLoopSurvivesMalformedJson:
-    async def test_read_loop_survives_malformed_json(self, mock_ws, patch_connect):
+    async def test_read_loop_survives_malformed_json(self, connected):
         """A malformed JSON message is skipped; the next valid message is processed."""
-        mock_ws.feed(AUTH_SUCCESS)
-
-        client = AgentPassClient("ws://localhost:8443", "test-token")
-        await client.connect()
-
-        async def respond():
-            await asyncio.sleep(0.01)
-            # Feed malformed JSON first
-            mock_ws.feed("this is not json {{{")
-            await asyncio.sleep(0.01)
-            # Then a valid response
-            mock_ws.feed(_tool_result(1, {"answer": "ok"}))
-
-        _task = asyncio.create_task(respond())  # noqa: RUF006
-        result = await asyncio.wait_for(
-            client.tool_request("ha_get_state", entity_id="sensor.test"),
-            timeout=2.0,
-        )
+        client, mock_ws = connected
+        # Malformed JSON first, then a valid response
+        mock_ws.feed_many("this is not json {{{", _tool_result(1, {"answer": "ok"}))
+        async with asyncio.timeout(2.0):
+            result = await client.tool_request("ha_get_state", entity_id="sensor.test")
         assert result == {"answer": "ok"}
 
-        await client.close()
+    async def test_non_finite_floats_from_server_are_accepted(self, connected):
+        """The server encodes with the stdlib, which writes NaN/Infinity literals."""
+        client, mock_ws = connected
+        frame = {
+            "jsonrpc": "2.0",
+            "result": {"status": "executed", "data": {"v": float("nan")}},
+            "id": 1,
+        }
+        mock_ws.feed(json.dumps(frame))
+        async with asyncio.timeout(2.0):
+            result = await client.tool_request("ha_get_state", entity_id="sensor.test")
+        assert math.isnan(result["v"])
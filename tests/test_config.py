@@ -1,10 +1,14 @@
 """Tests for agentpass.config — YAML loading, env var substitution, validation."""
 
-import os
+import copy
 import shutil
 import textwrap
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
 
 import pytest
+import yaml
 
 from agentpass.config import (
     ConfigError,
@@ -12,6 +16,7 @@ from agentpass.config import (
     load_config,
     load_permissions,
     substitute_env_vars,
+    substitute_env_vars_in_text,
 )
 
 
@@ -37,12 +42,23 @@ class TestSubstituteEnvVars:
         result = substitute_env_vars(data)
         assert result == ["x", "literal"]
 
-    def test_raises_on_unset_env_var(self):
-        # Ensure the var is not set
-        os.environ.pop("UNSET_VAR_XYZ", None)
+    def test_updates_containers_in_place(self, monkeypatch):
+        monkeypatch.setenv("VAL", "x")
+        shared = ["${VAL}"]
+        data = {"a": shared, "b": [shared, {"c": "${VAL}-${VAL}"}], "d": 1}
+        result = substitute_env_vars(data)
+        assert result is data
+        assert data == {"a": ["x"], "b": [["x"], {"c": "x-x"}], "d": 1}
+
+    def test_raises_on_unset_env_var(self, monkeypatch):
+        monkeypatch.delenv("UNSET_VAR_XYZ", raising=False)
         with pytest.raises(ConfigError, match="UNSET_VAR_XYZ"):
             substitute_env_vars("${UNSET_VAR_XYZ}")
 
+    def test_text_without_placeholders_returned_as_is(self):
+        text = "gateway:\n  port: 8443  # $5 is not a placeholder\n"
+        assert substitute_env_vars_in_text(text) is text
+
     def test_ignores_non_string_values(self):
         assert substitute_env_vars(42) == 42
         assert substitute_env_vars(True) is True
@@ -88,6 +104,19 @@ VALID_CONFIG_YAML = textwrap.dedent("""\
       path: "./data/test.db"
 """)
 
+# Parsed once; tests derive variants by mutating a deep copy (see _write_config)
+_BASE_CONFIG = yaml.safe_load(VALID_CONFIG_YAML)
+
+
+def _write_config(tmp_path: Path, mutate: Callable[[dict[str, Any]], object]) -> Path:
+    """Write a copy of the valid config with *mutate* applied to its parsed dict."""
+    data = copy.deepcopy(_BASE_CONFIG)
+    mutate(data)
+    p = tmp_path / "config.yaml"
+    p.write_text(yaml.safe_dump(data))
+    return p
+
+
 VALID_PERMISSIONS_YAML = textwrap.dedent("""\
     defaults:
       - pattern: "ha_get_*"
@@ -125,9 +154,31 @@ def permissions_file(tmp_path):
     return p
 
 
+# Read-only variants, written once per session.  Tests using these must not
+# modify the files (or the cached objects load_config/load_permissions return);
+# use config_file / permissions_file for that.
+
+
+@pytest.fixture(scope="session")
+def baseline_config_file(tmp_path_factory):
+    d = tmp_path_factory.mktemp("baseline")
+    (d / "tools").mkdir()
+    shutil.copy("tools/homeassistant.yaml", d / "tools" / "homeassistant.yaml")
+    p = d / "config.yaml"
+    p.write_text(VALID_CONFIG_YAML)
+    return p
+
+
+@pytest.fixture(scope="session")
+def baseline_permissions_file(tmp_path_factory):
+    p = tmp_path_factory.mktemp("baseline") / "permissions.yaml"
+    p.write_text(VALID_PERMISSIONS_YAML)
+    return p
+
+
 class TestLoadConfig:
-    def test_valid_config(self, config_file):
-        cfg = load_config(str(config_file))
+    def test_valid_config(self, baseline_config_file):
+        cfg = load_config(str(baseline_config_file))
         assert cfg.gateway.host == "0.0.0.0"
         assert cfg.gateway.port == 8443
         assert cfg.gateway.tls.cert == "/path/cert.pem"
@@ -142,69 +193,77 @@ class TestLoadConfig:
         assert cfg.storage.type == "sqlite"
         assert cfg.storage.path == "./data/test.db"
 
-    def test_default_health_host(self, config_file):
-        cfg = load_config(str(config_file))
+    def test_default_health_host(self, baseline_config_file):
+        cfg = load_config(str(baseline_config_file))
         assert cfg.gateway.health_host == "127.0.0.1"
 
-    def test_default_approval_timeout(self, config_file):
-        cfg = load_config(str(config_file))
+    def test_default_approval_timeout(self, baseline_config_file):
+        cfg = load_config(str(baseline_config_file))
         assert cfg.approval_timeout == 900
 
-    def test_default_rate_limit(self, config_file):
-        cfg = load_config(str(config_file))
+    def test_default_rate_limit(self, baseline_config_file):
+        cfg = load_config(str(baseline_config_file))
         assert cfg.rate_limit.max_pending_approvals == 10
         assert cfg.rate_limit.max_requests_per_minute == 60
+        assert cfg.rate_limit.max_concurrent_per_service == 16
 
     def test_custom_approval_timeout(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML + "approval_timeout: 300\n"
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d.update(approval_timeout=300))
         cfg = load_config(str(p))
         assert cfg.approval_timeout == 300
 
     def test_port_string_coerced_to_int(self, tmp_path, _tools_dir, monkeypatch):
         monkeypatch.setenv("MY_PORT", "9999")
-        yaml_text = VALID_CONFIG_YAML.replace("port: 8443", 'port: "${MY_PORT}"')
+        # Quoted, so the substituted value reaches the parser as a string
         p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p.write_text(VALID_CONFIG_YAML.replace("port: 8443", 'port: "${MY_PORT}"'))
         cfg = load_config(str(p))
         assert cfg.gateway.port == 9999
         assert isinstance(cfg.gateway.port, int)
 
     def test_health_port_equals_gateway_port_rejected(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace("port: 8443", "port: 8443\n  health_port: 8443")
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["gateway"].update(health_port=8443))
         with pytest.raises(ConfigError, match=r"health_port.*must not equal.*port"):
             load_config(str(p))
 
     def test_chat_id_string_coerced_to_int(self, tmp_path, _tools_dir, monkeypatch):
         monkeypatch.setenv("CHAT_ID", "-100999")
-        yaml_text = VALID_CONFIG_YAML.replace("chat_id: -100123", 'chat_id: "${CHAT_ID}"')
         p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p.write_text(VALID_CONFIG_YAML.replace("chat_id: -100123", 'chat_id: "${CHAT_ID}"'))
         cfg = load_config(str(p))
         assert cfg.messenger.telegram.chat_id == -100999
         assert isinstance(cfg.messenger.telegram.chat_id, int)
 
+    def test_edit_on_resolve_defaults_to_true(self, baseline_config_file):
+        cfg = load_config(str(baseline_config_file))
+        assert cfg.messenger.telegram.edit_on_resolve is True
+
+    def test_edit_on_resolve_can_be_disabled(self, tmp_path, _tools_dir):
+        p = _write_config(
+            tmp_path, lambda d: d["messenger"]["telegram"].update(edit_on_resolve=False)
+        )
+        cfg = load_config(str(p))
+        assert cfg.messenger.telegram.edit_on_resolve is False
+
+    def test_edit_on_resolve_must_be_bool(self, tmp_path, _tools_dir):
+        p = _write_config(
+            tmp_path, lambda d: d["messenger"]["telegram"].update(edit_on_resolve="no")
+        )
+        with pytest.raises(ConfigError, match=r"edit_on_resolve"):
+            load_config(str(p))
+
     def test_missing_gateway_host(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace('  host: "0.0.0.0"\n', "")
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["gateway"].pop("host"))
         with pytest.raises(ConfigError, match=r"gateway\.host"):
             load_config(str(p))
 
     def test_missing_agent_token(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace('token: "test-token"', 'token: ""')
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["agent"].update(token=""))
         with pytest.raises(ConfigError, match=r"agent\.token"):
             load_config(str(p))
 
     def test_empty_allowed_users(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace("allowed_users: [111, 222]", "allowed_users: []")
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["messenger"]["telegram"].update(allowed_users=[]))
         with pytest.raises(ConfigError, match="allowed_users"):
             load_config(str(p))
 
@@ -213,110 +272,84 @@ class TestLoadConfig:
             load_config("/nonexistent/config.yaml")
 
     def test_no_tls_config(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace(
-            '  tls:\n    cert: "/path/cert.pem"\n    key: "/path/key.pem"\n', ""
-        )
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["gateway"].pop("tls"))
         cfg = load_config(str(p))
         assert cfg.gateway.tls is None
 
     def test_env_var_in_token(self, tmp_path, _tools_dir, monkeypatch):
         monkeypatch.setenv("AGENT_TOKEN", "secret-from-env")
-        yaml_text = VALID_CONFIG_YAML.replace('token: "test-token"', 'token: "${AGENT_TOKEN}"', 1)
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["agent"].update(token="${AGENT_TOKEN}"))
         cfg = load_config(str(p))
         assert cfg.agent.token == "secret-from-env"
 
     def test_unsupported_messenger_type(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace('type: "telegram"', 'type: "slack"')
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["messenger"].update(type="slack"))
         with pytest.raises(ConfigError, match="Unsupported messenger type"):
             load_config(str(p))
 
     def test_unsupported_storage_type(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace('type: "sqlite"', 'type: "postgres"')
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["storage"].update(type="postgres"))
         with pytest.raises(ConfigError, match="Unsupported storage type"):
             load_config(str(p))
 
     def test_negative_approval_timeout(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML + "approval_timeout: -1\n"
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d.update(approval_timeout=-1))
         with pytest.raises(ConfigError, match="approval_timeout"):
             load_config(str(p))
 
     def test_zero_approval_timeout(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML + "approval_timeout: 0\n"
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d.update(approval_timeout=0))
         with pytest.raises(ConfigError, match="approval_timeout"):
             load_config(str(p))
 
-    def test_no_services_section(self, tmp_path, _tools_dir):
-        yaml_text = VALID_CONFIG_YAML.replace(
-            "services:\n"
-            "  homeassistant:\n"
-            '    url: "http://ha.local:8123"\n'
-            "    auth:\n"
-            "      type: bearer\n"
-            '      token: "ha-token"\n'
-            "    health:\n"
-            "      method: GET\n"
-            '      path: "/api/"\n'
-            "      expect_status: 200\n"
-            "    tools: tools/homeassistant.yaml\n"
-            "    errors:\n"
-            "      - status: 401\n"
-            '        message: "Service authentication failed (HA token expired?)"\n'
-            "      - status: 404\n"
-            '        message: "Entity not found"\n',
-            "",
+    def test_zero_max_concurrent_per_service(self, tmp_path, _tools_dir):
+        p = _write_config(
+            tmp_path, lambda d: d.update(rate_limit={"max_concurrent_per_service": 0})
         )
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        with pytest.raises(ConfigError, match="max_concurrent_per_service"):
+            load_config(str(p))
+
+    def test_no_services_section(self, tmp_path, _tools_dir):
+        p = _write_config(tmp_path, lambda d: d.pop("services"))
         with pytest.raises(ConfigError, match=r"services"):
             load_config(str(p))
 
     def test_env_var_in_ha_token(self, tmp_path, _tools_dir, monkeypatch):
         monkeypatch.setenv("HA_TOKEN", "ha-secret-from-env")
-        yaml_text = VALID_CONFIG_YAML.replace('token: "ha-token"', 'token: "${HA_TOKEN}"')
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(
+            tmp_path,
+            lambda d: d["services"]["homeassistant"]["auth"].update(token="${HA_TOKEN}"),
+        )
         cfg = load_config(str(p))
         assert cfg.services["homeassistant"].auth.token == "ha-secret-from-env"
 
-    def test_service_auth_parsed(self, config_file):
+    def test_service_auth_parsed(self, baseline_config_file):
         """Auth config fields are parsed correctly."""
-        cfg = load_config(str(config_file))
+        cfg = load_config(str(baseline_config_file))
         auth = cfg.services["homeassistant"].auth
         assert auth.type == "bearer"
         assert auth.token == "ha-token"
 
-    def test_service_health_parsed(self, config_file):
+    def test_service_health_parsed(self, baseline_config_file):
         """Health check config fields are parsed correctly."""
-        cfg = load_config(str(config_file))
+        cfg = load_config(str(baseline_config_file))
         health = cfg.services["homeassistant"].health
         assert health.method == "GET"
         assert health.path == "/api/"
         assert health.expect_status == 200
 
-    def test_service_tools_loaded(self, config_file):
+    def test_service_tools_loaded(self, baseline_config_file):
         """Tools list is populated from the YAML file."""
-        cfg = load_config(str(config_file))
+        cfg = load_config(str(baseline_config_file))
         svc = cfg.services["homeassistant"]
         tool_names = [t.name for t in svc.tools]
         assert "ha_get_state" in tool_names
         assert "ha_call_service" in tool_names
         assert "ha_fire_event" in tool_names
 
-    def test_service_errors_parsed(self, config_file):
+    def test_service_errors_parsed(self, baseline_config_file):
         """Error mappings are parsed correctly."""
-        cfg = load_config(str(config_file))
+        cfg = load_config(str(baseline_config_file))
         errors = cfg.services["homeassistant"].errors
         assert len(errors) == 2
         assert errors[0].status == 401
@@ -325,21 +358,11 @@ class TestLoadConfig:
 
     def test_multiple_services(self, tmp_path, _tools_dir):
         """Multiple services in config are all loaded."""
-        # Insert weather service inside the services block (before storage)
-        weather_service = (
-            "  weather:\n"
-            '    url: "http://weather.local:5000"\n'
-            "    auth:\n"
-            "      type: header\n"
-            '      token: "weather-key"\n'
-            '      header_name: "X-Api-Key"\n'
-        )
-        yaml_text = VALID_CONFIG_YAML.replace(
-            "storage:\n",
-            weather_service + "storage:\n",
-        )
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        weather_service = {
+            "url": "http://weather.local:5000",
+            "auth": {"type": "header", "token": "weather-key", "header_name": "X-Api-Key"},
+        }
+        p = _write_config(tmp_path, lambda d: d["services"].update(weather=weather_service))
         cfg = load_config(str(p))
         assert "homeassistant" in cfg.services
         assert "weather" in cfg.services
@@ -349,59 +372,21 @@ class TestLoadConfig:
 
     def test_service_not_a_mapping(self, tmp_path, _tools_dir):
         """Non-mapping service value raises ConfigError."""
-        yaml_text = VALID_CONFIG_YAML.replace(
-            "  homeassistant:\n"
-            '    url: "http://ha.local:8123"\n'
-            "    auth:\n"
-            "      type: bearer\n"
-            '      token: "ha-token"\n'
-            "    health:\n"
-            "      method: GET\n"
-            '      path: "/api/"\n'
-            "      expect_status: 200\n"
-            "    tools: tools/homeassistant.yaml\n"
-            "    errors:\n"
-            "      - status: 401\n"
-            '        message: "Service authentication failed (HA token expired?)"\n'
-            "      - status: 404\n"
-            '        message: "Entity not found"\n',
-            "  homeassistant: not-a-mapping\n",
-        )
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        p = _write_config(tmp_path, lambda d: d["services"].update(homeassistant="not-a-mapping"))
         with pytest.raises(ConfigError, match="must be a mapping"):
             load_config(str(p))
 
     def test_empty_services_dict(self, tmp_path, _tools_dir):
         """Empty services dict raises ConfigError."""
-        yaml_text = VALID_CONFIG_YAML.replace(
-            "  homeassistant:\n"
-            '    url: "http://ha.local:8123"\n'
-            "    auth:\n"
-            "      type: bearer\n"
-            '      token: "ha-token"\n'
-            "    health:\n"
-            "      method: GET\n"
-            '      path: "/api/"\n'
-            "      expect_status: 200\n"
-            "    tools: tools/homeassistant.yaml\n"
-            "    errors:\n"
-            "      - status: 401\n"
-            '        message: "Service authentication failed (HA token expired?)"\n'
-            "      - status: 404\n"
-            '        message: "Entity not found"\n',
-            "",
-        )
-        # The YAML now has "services:" with nothing under it
-        p = tmp_path / "config.yaml"
-        p.write_text(yaml_text)
+        # "services:" with nothing under it
+        p = _write_config(tmp_path, lambda d: d.update(services=None))
         with pytest.raises(ConfigError):
             load_config(str(p))
 
 
 class TestLoadPermissions:
-    def test_valid_permissions(self, permissions_file):
-        perms = load_permissions(str(permissions_file))
+    def test_valid_permissions(self, baseline_permissions_file):
+        perms = load_permissions(str(baseline_permissions_file))
         assert isinstance(perms, Permissions)
         assert len(perms.defaults) == 2
         assert perms.defaults[0].pattern == "ha_get_*"
@@ -478,3 +463,35 @@ class TestLoadPermissions:
         p.write_text(yaml_text)
         perms = load_permissions(str(p))
         assert perms.rules[0].description == ""
+
+
+class TestLoadCache:
+    def test_unchanged_file_returns_cached_object(self, config_file):
+        assert load_config(str(config_file)) is load_config(str(config_file))
+
+    def test_force_bypasses_cache(self, permissions_file):
+        first = load_permissions(str(permissions_file))
+        assert load_permissions(str(permissions_file), force=True) is not first
+
+    def test_modified_file_is_reparsed(self, permissions_file):
+        first = load_permissions(str(permissions_file))
+        permissions_file.write_text(VALID_PERMISSIONS_YAML + "  - pattern: x\n    action: ask\n")
+        second = load_permissions(str(permissions_file))
+        assert second is not first
+        assert len(second.rules) == 2
+
+    def test_modified_tools_file_is_reparsed(self, config_file, _tools_dir):
+        first = load_config(str(config_file))
+        (_tools_dir / "homeassistant.yaml").write_text("tools:\n  only_tool: {}\n")
+        second = load_config(str(config_file))
+        assert [t.name for t in second.services["homeassistant"].tools] == ["only_tool"]
+        assert second is not first
+
+    def test_changed_env_var_is_reparsed(self, tmp_path, _tools_dir, monkeypatch):
+        monkeypatch.setenv("MY_PORT", "9999")
+        # Quoted, so the substituted value reaches the parser as a string
+        p = tmp_path / "config.yaml"
+        p.write_text(VALID_CONFIG_YAML.replace("port: 8443", 'port: "${MY_PORT}"'))
+        assert load_config(str(p)).gateway.port == 9999
+        monkeypatch.setenv("MY_PORT", "9998")
+        assert load_config(str(p)).gateway.port == 9998
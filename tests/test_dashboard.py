@@ -1,7 +1,9 @@
 """Tests for agentpass.dashboard — audit dashboard routes and API."""
 
 import time
+from unittest.mock import patch
 
+import jinja2
 import pytest
 from aiohttp import web
 from aiohttp.test_utils import TestClient, TestServer
@@ -12,9 +14,8 @@ from agentpass.models import AuditEntry
 
 
 @pytest.fixture()
-async def db(tmp_path):
-    db_path = str(tmp_path / "test.db")
-    database = Database(db_path)
+async def db():
+    database = Database(":memory:")
     await database.initialize()
     yield database
     await database.close()
@@ -32,8 +33,8 @@ async def _seed_entries(db, count=5):
     """Insert sample audit entries for testing."""
     tools = ["ha_get_state", "ha_call_service", "ha_get_history"]
     decisions = ["allow", "deny", "ask"]
-    for i in range(count):
-        entry = AuditEntry(
+    await db.log_audit_many(
+        AuditEntry(
             request_id=f"req-{i}",
             tool_name=tools[i % len(tools)],
             args={"entity_id": f"sensor.test_{i}"},
@@ -42,7 +43,8 @@ async def _seed_entries(db, count=5):
             resolution="executed" if decisions[i % len(decisions)] == "allow" else None,
             resolved_by="policy" if decisions[i % len(decisions)] == "allow" else None,
         )
-        await db.log_audit(entry)
+        for i in range(count)
+    )
 
 
 class TestApiLog:
@@ -163,6 +165,12 @@ class TestAuditPage:
         text = await resp.text()
         assert "No entries match your filters" in text
 
+    async def test_render_does_no_template_file_io(self, client):
+        """The template is compiled at setup, so page views never hit the loader."""
+        with patch.object(jinja2.FileSystemLoader, "get_source", side_effect=AssertionError):
+            resp = await client.get("/audit/")
+        assert resp.status == 200
+
 
 class TestFilteredQuery:
     async def test_combined_filters(self, db):
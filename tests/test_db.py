@@ -9,23 +9,38 @@ from datetime import UTC, datetime
 
 import pytest
 
-from agentpass.db import Database
+from agentpass.db import Database, _epoch_to_iso
 from agentpass.models import AuditEntry
 
 
 @pytest.fixture()
-async def db(tmp_path):
-    db_path = str(tmp_path / "test.db")
-    database = Database(db_path)
+async def db():
+    database = Database(":memory:")
     await database.initialize()
     yield database
     await database.close()
 
 
+@pytest.fixture()
+async def file_db(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    await database.initialize()
+    yield database
+    await database.close()
+
+
+class TestEpochToIso:
+    def test_consecutive_seconds_format_correctly(self):
+        assert _epoch_to_iso(1700000000.2) == "2023-11-14T22:13:20Z"
+        assert _epoch_to_iso(1700000000.9) == "2023-11-14T22:13:20Z"
+        assert _epoch_to_iso(1700000001.0) == "2023-11-14T22:13:21Z"
+        assert _epoch_to_iso(1700000000.5) == "2023-11-14T22:13:20Z"
+
+
 class TestInitialize:
-    async def test_creates_tables(self, db):
+    async def test_creates_tables(self, file_db):
         # Verify tables exist by querying sqlite_master
-        conn = db._get_conn()
+        conn = file_db._get_conn()
         cursor = await conn.execute(
             "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
         )
@@ -33,8 +48,8 @@ class TestInitialize:
         assert "audit_log" in tables
         assert "pending_requests" in tables
 
-    async def test_creates_indexes(self, db):
-        conn = db._get_conn()
+    async def test_creates_indexes(self, file_db):
+        conn = file_db._get_conn()
         cursor = await conn.execute(
             "SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'idx_%'"
         )
@@ -52,6 +67,23 @@ class TestInitialize:
         assert mode == 0o600
         await database.close()
 
+    async def test_in_memory_creates_no_file(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        database = Database(":memory:")
+        await database.initialize()
+        await database.log_audit(
+            AuditEntry(
+                request_id="req-1",
+                tool_name="ha_get_state",
+                args={},
+                signature="ha_get_state()",
+                decision="allow",
+            )
+        )
+        assert len(await database.get_audit_log()) == 1
+        assert list(tmp_path.iterdir()) == []
+        await database.close()
+
 
 class TestAuditLog:
     async def test_log_and_query(self, db):
@@ -97,22 +129,44 @@ class TestAuditLog:
         assert entries[0].args == args
 
     async def test_reverse_chronological_order(self, db):
-        for i in range(3):
-            entry = AuditEntry(request_id=f"req-{i}", decision="allow")
-            await db.log_audit(entry)
+        await db.log_audit_many(
+            AuditEntry(request_id=f"req-{i}", decision="allow") for i in range(3)
+        )
 
         entries = await db.get_audit_log()
         ids = [e.request_id for e in entries]
         assert ids == ["req-2", "req-1", "req-0"]
 
     async def test_limit(self, db):
-        for i in range(5):
-            entry = AuditEntry(request_id=f"req-{i}", decision="allow")
-            await db.log_audit(entry)
+        await db.log_audit_many(
+            AuditEntry(request_id=f"req-{i}", decision="allow") for i in range(5)
+        )
 
         entries = await db.get_audit_log(limit=2)
         assert len(entries) == 2
 
+    async def test_log_audit_many_matches_log_audit(self, db):
+        entry = AuditEntry(
+            request_id="req-1",
+            tool_name="ha_call_service",
+            args={"domain": "light", "service": "turn_on"},
+            signature="ha_call_service(light.turn_on)",
+            decision="ask",
+            resolution="approved",
+            resolved_by="12345",
+            resolved_at=1700000000.0,
+            execution_result={"ok": True},
+        )
+        await db.log_audit(entry)
+        await db.log_audit_many([entry])
+
+        single, batched = await db.get_audit_log()
+        assert single == batched
+
+    async def test_log_audit_many_empty(self, db):
+        await db.log_audit_many([])
+        assert await db.get_audit_log() == []
+
     async def test_empty_audit_log(self, db):
         entries = await db.get_audit_log()
         assert entries == []
@@ -14,9 +14,9 @@ from agentpass.models import Decision
 from agentpass.registry import build_registry
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def ha_registry():
-    """Build a ToolRegistry from the actual HA tools YAML file."""
+    """Build a ToolRegistry from the actual HA tools YAML file (read-only, so shared)."""
     tools = load_tools_file("tools/homeassistant.yaml", "homeassistant")
     svc = ServiceConfig(
         name="homeassistant",
@@ -27,6 +27,16 @@ def ha_registry():
     return build_registry({"homeassistant": svc})
 
 
+def _make_permissions(
+    defaults: list[tuple[str, str]] | None = None,
+    rules: list[tuple[str, str]] | None = None,
+) -> Permissions:
+    return Permissions(
+        defaults=[PermissionRule(pattern=p, action=a) for p, a in (defaults or [])],
+        rules=[PermissionRule(pattern=p, action=a) for p, a in (rules or [])],
+    )
+
+
 class TestBuildSignature:
     def test_unknown_tool_sorted_keys(self):
         sig = build_signature("unknown_tool", {"b": "2", "a": "1"})
@@ -38,33 +48,22 @@ class TestBuildSignature:
 
 
 class TestValidateArgs:
-    def test_rejects_asterisk(self):
-        with pytest.raises(ValueError, match="forbidden"):
-            validate_args("ha_get_state", {"entity_id": "light.*"})
-
-    def test_rejects_question_mark(self):
-        with pytest.raises(ValueError, match="forbidden"):
-            validate_args("ha_get_state", {"entity_id": "light.?"})
-
-    def test_rejects_bracket(self):
-        with pytest.raises(ValueError, match="forbidden"):
-            validate_args("ha_get_state", {"entity_id": "light.[a]"})
-
-    def test_rejects_parenthesis(self):
-        with pytest.raises(ValueError, match="forbidden"):
-            validate_args("ha_get_state", {"entity_id": "light.(x)"})
-
-    def test_rejects_comma(self):
-        with pytest.raises(ValueError, match="forbidden"):
-            validate_args("ha_get_state", {"entity_id": "a,b"})
-
-    def test_rejects_null_byte(self):
-        with pytest.raises(ValueError, match="forbidden"):
-            validate_args("ha_get_state", {"entity_id": "light\x00hack"})
-
-    def test_rejects_control_char(self):
+    @pytest.mark.parametrize(
+        "value",
+        ["light.*", "light.?", "light.[a]", "light.(x)", "a,b", "light\x00hack", "light\x01"],
+        ids=[
+            "asterisk",
+            "question_mark",
+            "bracket",
+            "parenthesis",
+            "comma",
+            "null_byte",
+            "control",
+        ],
+    )
+    def test_rejects_forbidden_char(self, value):
         with pytest.raises(ValueError, match="forbidden"):
-            validate_args("ha_get_state", {"entity_id": "light\x01"})
+            validate_args("ha_get_state", {"entity_id": value})
 
     def test_skips_non_string_values(self):
         # Should not raise — non-string values are skipped
@@ -76,18 +75,8 @@ class TestValidateArgs:
 
 
 class TestPermissionEngine:
-    @staticmethod
-    def _make_permissions(
-        defaults: list[tuple[str, str]] | None = None,
-        rules: list[tuple[str, str]] | None = None,
-    ) -> Permissions:
-        return Permissions(
-            defaults=[PermissionRule(pattern=p, action=a) for p, a in (defaults or [])],
-            rules=[PermissionRule(pattern=p, action=a) for p, a in (rules or [])],
-        )
-
     def test_deny_rule_wins(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             rules=[
                 ("ha_call_service(lock.*)", "deny"),
                 ("ha_call_service(lock.front_door)", "allow"),
@@ -105,7 +94,7 @@ class TestPermissionEngine:
         assert result == Decision.DENY
 
     def test_allow_rule_when_no_deny(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             rules=[("ha_get_state(sensor.*)", "allow")],
         )
         engine = PermissionEngine(perms, registry=ha_registry)
@@ -113,7 +102,7 @@ class TestPermissionEngine:
         assert result == Decision.ALLOW
 
     def test_ask_rule_when_no_deny_or_allow(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             rules=[("ha_call_service(light.*)", "ask")],
         )
         engine = PermissionEngine(perms, registry=ha_registry)
@@ -128,7 +117,7 @@ class TestPermissionEngine:
         assert result == Decision.ASK
 
     def test_falls_through_to_defaults(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             defaults=[
                 ("ha_get_*", "allow"),
                 ("*", "ask"),
@@ -139,7 +128,7 @@ class TestPermissionEngine:
         assert result == Decision.ALLOW
 
     def test_defaults_first_match_wins(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             defaults=[
                 ("ha_call_service*", "ask"),
                 ("*", "deny"),
@@ -157,14 +146,14 @@ class TestPermissionEngine:
         assert result == Decision.ASK
 
     def test_global_fallback_is_ask(self):
-        perms = self._make_permissions()  # No rules, no defaults
+        perms = _make_permissions()  # No rules, no defaults
         engine = PermissionEngine(perms)
         result = engine.evaluate("unknown_tool", {"key": "value"})
         assert result == Decision.ASK
 
     def test_deny_overrides_more_specific_allow(self, ha_registry):
         # Broad deny + specific allow → deny wins
-        perms = self._make_permissions(
+        perms = _make_permissions(
             rules=[
                 ("ha_call_service(lock.*)", "deny"),
                 ("ha_call_service(lock.front_door, lock.front_door)", "allow"),
@@ -182,7 +171,7 @@ class TestPermissionEngine:
         assert result == Decision.DENY
 
     def test_rules_checked_before_defaults(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             defaults=[("ha_get_*", "ask")],
             rules=[("ha_get_state(sensor.*)", "allow")],
         )
@@ -191,7 +180,7 @@ class TestPermissionEngine:
         assert result == Decision.ALLOW
 
     def test_no_args_tool_matching(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             defaults=[("ha_get_*", "allow")],
         )
         engine = PermissionEngine(perms, registry=ha_registry)
@@ -199,71 +188,104 @@ class TestPermissionEngine:
         assert result == Decision.ALLOW
 
     def test_ha_fire_event_deny_default(self, ha_registry):
-        perms = self._make_permissions(
+        perms = _make_permissions(
             defaults=[("ha_fire_event(*)", "deny")],
         )
         engine = PermissionEngine(perms, registry=ha_registry)
         result = engine.evaluate("ha_fire_event", {"event_type": "test_event"})
         assert result == Decision.DENY
 
+    def test_glob_charset_and_single_char_patterns(self):
+        perms = _make_permissions(
+            rules=[("tool(light.bed?oom)", "deny"), ("tool(light.[ab]*)", "allow")],
+        )
+        engine = PermissionEngine(perms)
+        assert engine.evaluate("tool", {"x": "light.bedroom"}) == Decision.DENY
+        assert engine.evaluate("tool", {"x": "light.attic"}) == Decision.ALLOW
+        assert engine.evaluate("tool", {"x": "light.cellar"}) == Decision.ASK
 
-# --- Registry-aware tests ---
+    def test_tool_specific_rule_does_not_match_other_tools(self):
+        perms = _make_permissions(
+            rules=[("tool_a(*)", "deny"), ("tool_*", "allow")],
+        )
+        engine = PermissionEngine(perms)
+        assert engine.evaluate("tool_a", {"x": "1"}) == Decision.DENY
+        assert engine.evaluate("tool_ab", {"x": "1"}) == Decision.ALLOW
+        assert engine.evaluate("tool_b", {"x": "1"}) == Decision.ALLOW
 
+    def test_prebuilt_signature_is_used(self):
+        perms = _make_permissions(rules=[("tool(given)", "deny")])
+        engine = PermissionEngine(perms)
+        assert engine.evaluate("tool", {"x": "other"}, signature="tool(given)") == Decision.DENY
 
-class TestBuildSignatureWithRegistry:
-    """Tests for build_signature() when a ToolRegistry is provided."""
+    def test_reloaded_engine_reuses_compiled_patterns(self):
+        perms = _make_permissions(rules=[("tool(cached.*)", "deny")])
+        first = PermissionEngine(perms)
+        second = PermissionEngine(perms)
+        assert first._policy_by_tool["tool"] is second._policy_by_tool["tool"]
 
-    def test_ha_call_service(self, ha_registry):
-        sig = build_signature(
-            "ha_call_service",
-            {
-                "domain": "light",
-                "service": "turn_on",
-                "entity_id": "light.bedroom",
-            },
-            registry=ha_registry,
+    def test_repeat_decisions_are_cached(self):
+        perms = _make_permissions(rules=[("tool(light.*)", "allow")])
+        engine = PermissionEngine(perms)
+        assert engine.evaluate("tool", {"x": "light.a"}) == Decision.ALLOW
+        assert engine.evaluate("tool", {"x": "light.a"}) == Decision.ALLOW
+        assert engine.evaluate("tool", {"x": "lock.a"}) == Decision.ASK
+        info = engine._decide.cache_info()
+        assert (info.hits, info.misses) == (1, 2)
+
+    def test_tool_bucket_also_checks_any_tool_patterns(self):
+        perms = _make_permissions(
+            rules=[("tool_a(safe)", "deny"), ("*(secret)", "deny"), ("tool_a(*)", "allow")],
         )
-        assert sig == "ha_call_service(light.turn_on, light.bedroom)"
-
-    def test_ha_get_state(self, ha_registry):
-        sig = build_signature(
-            "ha_get_state",
-            {"entity_id": "sensor.temp"},
-            registry=ha_registry,
+        engine = PermissionEngine(perms)
+        assert engine.evaluate("tool_a", {"x": "safe"}) == Decision.DENY
+        assert engine.evaluate("tool_a", {"x": "secret"}) == Decision.DENY
+        assert engine.evaluate("tool_a", {"x": "other"}) == Decision.ALLOW
+        assert engine.evaluate("tool_b", {"x": "secret"}) == Decision.DENY
+
+    def test_combined_policy_keeps_precedence(self):
+        perms = _make_permissions(
+            rules=[("tool(*)", "ask"), ("tool(a*)", "allow"), ("tool(ab*)", "deny")],
+            defaults=[("other(x*)", "deny"), ("other(*)", "allow")],
         )
-        assert sig == "ha_get_state(sensor.temp)"
+        engine = PermissionEngine(perms)
+        assert engine.evaluate("tool", {"x": "abc"}) == Decision.DENY
+        assert engine.evaluate("tool", {"x": "acc"}) == Decision.ALLOW
+        assert engine.evaluate("tool", {"x": "ccc"}) == Decision.ASK
+        assert engine.evaluate("other", {"x": "xyz"}) == Decision.DENY
+        assert engine.evaluate("other", {"x": "yyy"}) == Decision.ALLOW
+        assert engine.evaluate("none", {}) == Decision.ASK
 
-    def test_ha_get_states(self, ha_registry):
-        sig = build_signature("ha_get_states", {}, registry=ha_registry)
-        assert sig == "ha_get_states"
 
-    def test_ha_fire_event(self, ha_registry):
-        sig = build_signature(
-            "ha_fire_event",
-            {"event_type": "my_event"},
-            registry=ha_registry,
-        )
-        assert sig == "ha_fire_event(my_event)"
+# --- Registry-aware tests ---
 
-    def test_unknown_tool_falls_back_to_sorted_keys(self, ha_registry):
-        """Tool not in registry uses sorted keys fallback."""
-        sig = build_signature(
-            "unknown_tool",
-            {"b": "2", "a": "1"},
-            registry=ha_registry,
-        )
-        assert sig == "unknown_tool(1, 2)"
 
-    def test_ha_call_service_without_entity_id(self, ha_registry):
-        sig = build_signature(
-            "ha_call_service",
-            {
-                "domain": "homeassistant",
-                "service": "restart",
-            },
-            registry=ha_registry,
-        )
-        assert sig == "ha_call_service(homeassistant.restart, )"
+class TestBuildSignatureWithRegistry:
+    """Tests for build_signature() when a ToolRegistry is provided."""
+
+    @pytest.mark.parametrize(
+        ("tool", "args", "expected"),
+        [
+            (
+                "ha_call_service",
+                {"domain": "light", "service": "turn_on", "entity_id": "light.bedroom"},
+                "ha_call_service(light.turn_on, light.bedroom)",
+            ),
+            ("ha_get_state", {"entity_id": "sensor.temp"}, "ha_get_state(sensor.temp)"),
+            ("ha_get_states", {}, "ha_get_states"),
+            ("ha_fire_event", {"event_type": "my_event"}, "ha_fire_event(my_event)"),
+            # Tool not in registry uses sorted keys fallback
+            ("unknown_tool", {"b": "2", "a": "1"}, "unknown_tool(1, 2)"),
+            # Optional entity_id left out
+            (
+                "ha_call_service",
+                {"domain": "homeassistant", "service": "restart"},
+                "ha_call_service(homeassistant.restart, )",
+            ),
+        ],
+    )
+    def test_build_signature(self, ha_registry, tool, args, expected):
+        assert build_signature(tool, args, registry=ha_registry) == expected
 
     def test_ha_call_service_field_order_irrelevant(self, ha_registry):
         sig1 = build_signature(
@@ -352,21 +374,25 @@ class TestValidateArgsWithRegistry:
 class TestPermissionEngineWithRegistry:
     """Tests for PermissionEngine when a ToolRegistry is provided."""
 
-    @staticmethod
-    def _make_permissions(
-        defaults: list[tuple[str, str]] | None = None,
-        rules: list[tuple[str, str]] | None = None,
-    ) -> Permissions:
-        return Permissions(
-            defaults=[PermissionRule(pattern=p, action=a) for p, a in (defaults or [])],
-            rules=[PermissionRule(pattern=p, action=a) for p, a in (rules or [])],
-        )
-
     def test_evaluate_uses_registry_signature(self, ha_registry):
         """Engine with registry evaluates correctly using registry-built signature."""
-        perms = self._make_permissions(
+        perms = _make_permissions(
             rules=[("ha_get_state(sensor.*)", "allow")],
         )
         engine = PermissionEngine(perms, registry=ha_registry)
         result = engine.evaluate("ha_get_state", {"entity_id": "sensor.temp"})
         assert result == Decision.ALLOW
+
+    def test_build_signature_uses_engine_registry(self, ha_registry):
+        """The engine's signature matches its template rules; evaluating it agrees."""
+        perms = _make_permissions(rules=[("ha_call_service(lock.*)", "deny")])
+        engine = PermissionEngine(perms, registry=ha_registry)
+        args = {"domain": "lock", "service": "unlock", "entity_id": "lock.front"}
+        signature = engine.build_signature("ha_call_service", args)
+        assert signature == build_signature("ha_call_service", args, registry=ha_registry)
+        assert engine.evaluate("ha_call_service", args, signature=signature) == Decision.DENY
+
+    def test_build_signature_validates_with_engine_registry(self, ha_registry):
+        engine = PermissionEngine(_make_permissions(), registry=ha_registry)
+        with pytest.raises(ValueError, match="entity_id"):
+            engine.build_signature("ha_get_state", {})
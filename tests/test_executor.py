@@ -1,5 +1,7 @@
 """Tests for agentpass.executor — action dispatch routing."""
 
+import asyncio
+
 import pytest
 
 from agentpass.config import AuthConfig, ServiceConfig, load_tools_file
@@ -12,10 +14,18 @@ class MockServiceHandler(ServiceHandler):
     """Mock service handler that records calls."""
 
     def __init__(self):
-        self.calls: list[tuple[str, dict]] = []
+        # Kept as parallel lists; most tests only look at the tool names
+        self.tool_names: list[str] = []
+        self.args_list: list[dict] = []
+
+    @property
+    def calls(self) -> list[tuple[str, dict]]:
+        """Recorded (tool_name, args) pairs, in call order."""
+        return list(zip(self.tool_names, self.args_list, strict=True))
 
     async def execute(self, tool_name: str, args: dict) -> dict:
-        self.calls.append((tool_name, args))
+        self.tool_names.append(tool_name)
+        self.args_list.append(args)
         return {"mock": True, "tool": tool_name}
 
     async def health_check(self) -> bool:
@@ -64,7 +74,7 @@ class TestExecutor:
         handler = MockServiceHandler()
         executor = Executor({"homeassistant": handler}, ha_registry)
         await executor.execute("ha_fire_event", {"event_type": "test"})
-        assert handler.calls[0][0] == "ha_fire_event"
+        assert handler.tool_names == ["ha_fire_event"]
 
     async def test_unknown_tool_raises(self, ha_registry):
         handler = MockServiceHandler()
@@ -83,7 +93,7 @@ class TestExecutor:
         executor = Executor({"homeassistant": handler}, ha_registry)
         args = {"entity_id": "light.kitchen", "extra": "data"}
         await executor.execute("ha_get_state", args)
-        assert handler.calls[0][1] is args
+        assert handler.args_list[0] is args
 
     async def test_multiple_services(self, ha_registry):
         ha_handler = MockServiceHandler()
@@ -100,6 +110,27 @@ class TestExecutor:
         with pytest.raises(ExecutionError, match="Unknown tool"):
             await executor.execute("ha_get_state", {"entity_id": "sensor.temp"})
 
+    async def test_concurrency_capped_per_service(self, ha_registry):
+        in_flight = 0
+        peak = 0
+
+        class SlowHandler(MockServiceHandler):
+            async def execute(self, tool_name: str, args: dict) -> dict:
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+                return {}
+
+        executor = Executor(
+            {"homeassistant": SlowHandler()}, ha_registry, max_concurrent_per_service=2
+        )
+        await asyncio.gather(
+            *(executor.execute("ha_get_state", {"entity_id": "sensor.temp"}) for _ in range(6))
+        )
+        assert peak == 2
+
 
 class TestExecutorWithRegistry:
     """Tests for Executor with an explicit ToolRegistry."""
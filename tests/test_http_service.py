@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
+import functools
+import json
 from unittest.mock import AsyncMock, MagicMock
 
 import aiohttp
 import pytest
 
+from agentpass._json import json_loads
 from agentpass.config import (
     AuthConfig,
     ErrorMapping,
@@ -20,15 +24,20 @@ from agentpass.services.http import GenericHTTPService, HTTPServiceError
 # --- Test helpers ---
 
 
+@functools.cache
+def _ha_tools() -> list[ToolDefinition]:
+    """HA tool definitions, parsed from the tools YAML once per module (never mutated)."""
+    return load_tools_file("tools/homeassistant.yaml", "homeassistant")
+
+
 def _make_ha_config(base_url: str = "http://ha-test:8123") -> ServiceConfig:
-    """Build a ServiceConfig with HA tools loaded from the tools YAML file."""
-    tools = load_tools_file("tools/homeassistant.yaml", "homeassistant")
+    """Build a ServiceConfig with the HA tools from the tools YAML file."""
     return ServiceConfig(
         name="homeassistant",
         url=base_url,
         auth=AuthConfig(type="bearer", token="test-token"),
         health=HealthCheckConfig(method="GET", path="/api/", expect_status=200),
-        tools=tools,
+        tools=_ha_tools(),
         errors=[
             ErrorMapping(status=401, message="Service authentication failed (HA token expired?)"),
             ErrorMapping(status=404, message="Entity not found"),
@@ -36,17 +45,41 @@ def _make_ha_config(base_url: str = "http://ha-test:8123") -> ServiceConfig:
     )
 
 
-def _mock_response(*, status: int = 200, json_data: dict | list | None = None, text: str = ""):
-    """Create a mock aiohttp response as an async context manager."""
-    resp = AsyncMock()
-    resp.status = status
-    resp.json = AsyncMock(return_value=json_data if json_data is not None else {})
-    resp.text = AsyncMock(return_value=text)
-    # Make it usable as async context manager
-    cm = AsyncMock()
-    cm.__aenter__ = AsyncMock(return_value=resp)
-    cm.__aexit__ = AsyncMock(return_value=False)
-    return cm
+class _FakeResponse:
+    """The slice of aiohttp.ClientResponse the service reads: status, json(), text()."""
+
+    def __init__(self, status: int, json_data: dict | list, text: str) -> None:
+        self.status = status
+        self._json = json_data
+        self._text = text
+        self.loads = None  # decoder the service passed to json()
+
+    async def json(self, *, loads=json.loads, **kwargs) -> dict | list:
+        self.loads = loads
+        return self._json
+
+    async def text(self) -> str:
+        return self._text
+
+
+class _ResponseContext:
+    """``async with session.get(...)`` stand-in yielding *resp*."""
+
+    def __init__(self, resp: _FakeResponse) -> None:
+        self.resp = resp
+
+    async def __aenter__(self) -> _FakeResponse:
+        return self.resp
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+
+def _mock_response(
+    *, status: int = 200, json_data: dict | list | None = None, text: str = ""
+) -> _ResponseContext:
+    """Create a fake aiohttp response as an async context manager."""
+    return _ResponseContext(_FakeResponse(status, {} if json_data is None else json_data, text))
 
 
 def _mock_session() -> MagicMock:
@@ -56,17 +89,41 @@ def _mock_session() -> MagicMock:
     return session
 
 
+@pytest.fixture()
+def session() -> MagicMock:
+    return _mock_session()
+
+
+@pytest.fixture()
+def svc(session: MagicMock) -> GenericHTTPService:
+    """HA service wired to the mock *session*; built per test, as it caches in-flight calls."""
+    svc = GenericHTTPService(_make_ha_config())
+    svc._session = session
+    return svc
+
+
+@pytest.fixture()
+def session_cls(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Stand-in for aiohttp.ClientSession, so _get_session tests skip real session setup."""
+
+    def _new_session(**kwargs) -> MagicMock:
+        session = _mock_session()
+        session.close = AsyncMock()
+        return session
+
+    cls = MagicMock(side_effect=_new_session)
+    monkeypatch.setattr(aiohttp, "ClientSession", cls)
+    return cls
+
+
 # --- TestGenericHTTPServiceGetState ---
 
 
 class TestGenericHTTPServiceGetState:
-    async def test_get_state_url_and_auth(self):
+    async def test_get_state_url_and_auth(self, svc, session):
         """Correct URL built and Bearer auth header used."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         json_data = {"entity_id": "sensor.temp", "state": "22.5"}
         session.get = MagicMock(return_value=_mock_response(json_data=json_data))
-        svc._session = session
 
         result = await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
 
@@ -75,13 +132,19 @@ class TestGenericHTTPServiceGetState:
         assert call_args[0][0] == "http://ha-test:8123/api/states/sensor.temp"
         assert result == json_data
 
-    async def test_get_state_returns_raw_json(self):
+    async def test_decodes_response_with_shared_json_loads(self, svc, session):
+        """The response body goes through agentpass._json (orjson when installed)."""
+        cm = _mock_response(json_data={"state": "on"})
+        session.get = MagicMock(return_value=cm)
+
+        await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
+
+        assert cm.resp.loads is json_loads
+
+    async def test_get_state_returns_raw_json(self, svc, session):
         """ha_get_state has no response.wrap, so raw JSON is returned."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         json_data = {"entity_id": "sensor.temp", "state": "22.5", "attributes": {"unit": "C"}}
         session.get = MagicMock(return_value=_mock_response(json_data=json_data))
-        svc._session = session
 
         result = await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
 
@@ -89,17 +152,51 @@ class TestGenericHTTPServiceGetState:
         assert result == json_data
         assert "states" not in result
 
+    async def test_concurrent_identical_gets_share_one_request(self, svc, session):
+        cm = _mock_response(json_data={"state": "on"})
+
+        async def slow_json(**kwargs):
+            await asyncio.sleep(0.01)
+            return {"state": "on"}
+
+        cm.resp.json = slow_json
+        session.get = MagicMock(return_value=cm)
+
+        args = {"entity_id": "light.a"}
+        results = await asyncio.gather(*(svc.execute("ha_get_state", args) for _ in range(3)))
+
+        session.get.assert_called_once()
+        assert results == [{"state": "on"}] * 3
+        assert results[0] is not results[1]
+        assert svc._inflight == {}
+
+    async def test_concurrent_gets_with_equal_but_differently_typed_args(self, svc, session):
+        """1 and True compare equal but are different requests."""
+        session.get = MagicMock(return_value=_mock_response(json_data={"state": "on"}))
+
+        await asyncio.gather(
+            svc.execute("ha_get_state", {"entity_id": 1}),
+            svc.execute("ha_get_state", {"entity_id": True}),
+        )
+
+        assert session.get.call_count == 2
+
+    async def test_concurrent_posts_are_not_coalesced(self, svc, session):
+        session.post = MagicMock(return_value=_mock_response(json_data=[]))
+
+        args = {"event_type": "doorbell"}
+        await asyncio.gather(*(svc.execute("ha_fire_event", args) for _ in range(2)))
+
+        assert session.post.call_count == 2
+
 
 # --- TestGenericHTTPServiceGetStates ---
 
 
 class TestGenericHTTPServiceGetStates:
-    async def test_get_states_url(self):
+    async def test_get_states_url(self, svc, session):
         """GET /api/states endpoint."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.get = MagicMock(return_value=_mock_response(json_data=[]))
-        svc._session = session
 
         await svc.execute("ha_get_states", {})
 
@@ -107,29 +204,37 @@ class TestGenericHTTPServiceGetStates:
         call_url = session.get.call_args[0][0]
         assert call_url == "http://ha-test:8123/api/states"
 
-    async def test_get_states_wraps_response(self):
+    async def test_get_states_wraps_response(self, svc, session):
         """Returns {"states": [...]} because response.wrap is "states"."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         json_data = [{"entity_id": "sensor.temp", "state": "22.5"}]
         session.get = MagicMock(return_value=_mock_response(json_data=json_data))
-        svc._session = session
 
         result = await svc.execute("ha_get_states", {})
 
         assert result == {"states": json_data}
 
+    async def test_get_states_domain_filter(self, svc, session):
+        """Optional domain arg keeps only that domain's entities (prefix "light.")."""
+        json_data = [
+            {"entity_id": "light.kitchen", "state": "on"},
+            {"entity_id": "lightning.sensor", "state": "off"},
+            {"entity_id": "sensor.temp", "state": "22.5"},
+        ]
+        session.get = MagicMock(return_value=_mock_response(json_data=json_data))
+
+        result = await svc.execute("ha_get_states", {"domain": "light"})
+
+        assert result == {"states": [{"entity_id": "light.kitchen", "state": "on"}]}
+        assert session.get.call_args[0][0] == "http://ha-test:8123/api/states"
+
 
 # --- TestGenericHTTPServiceCallService ---
 
 
 class TestGenericHTTPServiceCallService:
-    async def test_call_service_url(self):
+    async def test_call_service_url(self, svc, session):
         """POST /api/services/{domain}/{service}."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.post = MagicMock(return_value=_mock_response(json_data=[]))
-        svc._session = session
 
         await svc.execute(
             "ha_call_service",
@@ -140,12 +245,9 @@ class TestGenericHTTPServiceCallService:
         call_url = session.post.call_args[0][0]
         assert call_url == "http://ha-test:8123/api/services/light/turn_on"
 
-    async def test_call_service_body_excludes_domain_service(self):
+    async def test_call_service_body_excludes_domain_service(self, svc, session):
         """Body only has entity_id and other args (domain/service excluded)."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.post = MagicMock(return_value=_mock_response(json_data=[]))
-        svc._session = session
 
         await svc.execute(
             "ha_call_service",
@@ -167,13 +269,10 @@ class TestGenericHTTPServiceCallService:
         assert "domain" not in body
         assert "service" not in body
 
-    async def test_call_service_wraps_response(self):
+    async def test_call_service_wraps_response(self, svc, session):
         """Returns {"result": [...]} because response.wrap is "result"."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         json_data = [{"entity_id": "light.bedroom", "state": "on"}]
         session.post = MagicMock(return_value=_mock_response(json_data=json_data))
-        svc._session = session
 
         result = await svc.execute(
             "ha_call_service",
@@ -187,13 +286,10 @@ class TestGenericHTTPServiceCallService:
 
 
 class TestGenericHTTPServiceFireEvent:
-    async def test_fire_event_url(self):
+    async def test_fire_event_url(self, svc, session):
         """POST /api/events/{event_type}."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         json_data = {"message": "Event fired."}
         session.post = MagicMock(return_value=_mock_response(json_data=json_data))
-        svc._session = session
 
         await svc.execute(
             "ha_fire_event",
@@ -204,12 +300,9 @@ class TestGenericHTTPServiceFireEvent:
         call_url = session.post.call_args[0][0]
         assert call_url == "http://ha-test:8123/api/events/custom_event"
 
-    async def test_fire_event_body_excludes_event_type(self):
+    async def test_fire_event_body_excludes_event_type(self, svc, session):
         """Body only contains non-excluded args."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.post = MagicMock(return_value=_mock_response(json_data={}))
-        svc._session = session
 
         await svc.execute(
             "ha_fire_event",
@@ -226,40 +319,43 @@ class TestGenericHTTPServiceFireEvent:
 
 
 class TestGenericHTTPServiceErrors:
-    async def test_401_uses_error_mapping(self):
-        """401 triggers the configured error mapping message."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
-        session.get = MagicMock(return_value=_mock_response(status=401, text="Unauthorized"))
-        svc._session = session
-
-        with pytest.raises(HTTPServiceError, match="HA token expired"):
-            await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
-
-    async def test_404_uses_error_mapping(self):
-        """404 triggers the configured error mapping message."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
-        session.get = MagicMock(return_value=_mock_response(status=404, text="Not Found"))
-        svc._session = session
-
-        with pytest.raises(HTTPServiceError, match="Entity not found"):
-            await svc.execute("ha_get_state", {"entity_id": "sensor.nonexistent"})
-
-    async def test_500_uses_default_error(self):
-        """500 has no mapping, falls through to default 'API error 500: ...'."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
-        session.post = MagicMock(
-            return_value=_mock_response(status=500, text="Internal Server Error")
-        )
-        svc._session = session
-
-        with pytest.raises(HTTPServiceError, match="API error 500"):
-            await svc.execute(
+    @pytest.mark.parametrize(
+        ("method", "tool", "args", "status", "text", "match"),
+        [
+            # Mapped statuses use the configured message
+            (
+                "get",
+                "ha_get_state",
+                {"entity_id": "sensor.temp"},
+                401,
+                "Unauthorized",
+                "HA token expired",
+            ),
+            (
+                "get",
+                "ha_get_state",
+                {"entity_id": "sensor.x"},
+                404,
+                "Not Found",
+                "Entity not found",
+            ),
+            # No mapping for 500: default 'API error 500: ...'
+            (
+                "post",
                 "ha_call_service",
                 {"domain": "light", "service": "turn_on", "entity_id": "light.x"},
-            )
+                500,
+                "Internal Server Error",
+                "API error 500",
+            ),
+        ],
+        ids=["401_mapped", "404_mapped", "500_default"],
+    )
+    async def test_http_error_status(self, svc, session, method, tool, args, status, text, match):
+        setattr(session, method, MagicMock(return_value=_mock_response(status=status, text=text)))
+
+        with pytest.raises(HTTPServiceError, match=match):
+            await svc.execute(tool, args)
 
     async def test_unknown_tool_raises(self):
         """An unregistered tool name raises HTTPServiceError."""
@@ -273,16 +369,13 @@ class TestGenericHTTPServiceErrors:
 
 
 class TestGenericHTTPServiceAuth:
-    async def test_bearer_auth(self):
+    async def test_bearer_auth(self, session_cls):
         """Bearer auth sets Authorization header on the session."""
-        config = _make_ha_config()
-        svc = GenericHTTPService(config)
-        session = svc._get_session()
+        GenericHTTPService(_make_ha_config())._get_session()
 
-        assert session._default_headers["Authorization"] == "Bearer test-token"
-        await session.close()
+        assert session_cls.call_args.kwargs["headers"]["Authorization"] == "Bearer test-token"
 
-    async def test_header_auth(self):
+    async def test_header_auth(self, session_cls):
         """Custom header auth sets the specified header on the session."""
         config = ServiceConfig(
             name="custom",
@@ -290,11 +383,9 @@ class TestGenericHTTPServiceAuth:
             auth=AuthConfig(type="header", header_name="X-Api-Key", token="my-api-key"),
             tools=[],
         )
-        svc = GenericHTTPService(config)
-        session = svc._get_session()
+        GenericHTTPService(config)._get_session()
 
-        assert session._default_headers["X-Api-Key"] == "my-api-key"
-        await session.close()
+        assert session_cls.call_args.kwargs["headers"]["X-Api-Key"] == "my-api-key"
 
     async def test_query_auth(self):
         """Query auth appends token as a query parameter to each request."""
@@ -314,7 +405,7 @@ class TestGenericHTTPServiceAuth:
         call_kwargs = session.get.call_args[1]
         assert call_kwargs["params"]["api_key"] == "my-key"
 
-    async def test_basic_auth(self):
+    async def test_basic_auth(self, session_cls):
         """Basic auth uses aiohttp.BasicAuth on the session."""
         config = ServiceConfig(
             name="custom",
@@ -322,25 +413,21 @@ class TestGenericHTTPServiceAuth:
             auth=AuthConfig(type="basic", username="user", password="pass"),
             tools=[],
         )
-        svc = GenericHTTPService(config)
-        session = svc._get_session()
+        GenericHTTPService(config)._get_session()
 
-        assert session._default_auth is not None
-        assert session._default_auth.login == "user"
-        assert session._default_auth.password == "pass"
-        await session.close()
+        auth = session_cls.call_args.kwargs["auth"]
+        assert auth is not None
+        assert auth.login == "user"
+        assert auth.password == "pass"
 
 
 # --- TestGenericHTTPServiceHealth ---
 
 
 class TestGenericHTTPServiceHealth:
-    async def test_health_check_success(self):
+    async def test_health_check_success(self, svc, session):
         """Returns True when health endpoint returns expected status."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.get = MagicMock(return_value=_mock_response(status=200))
-        svc._session = session
 
         result = await svc.health_check()
         assert result is True
@@ -348,12 +435,9 @@ class TestGenericHTTPServiceHealth:
         call_url = session.get.call_args[0][0]
         assert call_url == "http://ha-test:8123/api/"
 
-    async def test_health_check_failure(self):
+    async def test_health_check_failure(self, svc, session):
         """Returns False when health endpoint returns non-expected status."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.get = MagicMock(return_value=_mock_response(status=503))
-        svc._session = session
 
         result = await svc.health_check()
         assert result is False
@@ -378,27 +462,21 @@ class TestGenericHTTPServiceHealth:
         call_url = session.get.call_args[0][0]
         assert call_url == "http://example.com/healthz"
 
-    async def test_health_check_connection_error(self):
+    async def test_health_check_connection_error(self, svc, session):
         """Returns False when service is unreachable."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.get = MagicMock(
             side_effect=aiohttp.ClientConnectorError(
                 connection_key=MagicMock(),
                 os_error=OSError("Connection refused"),
             )
         )
-        svc._session = session
 
         result = await svc.health_check()
         assert result is False
 
-    async def test_health_check_uses_5_second_timeout(self):
+    async def test_health_check_uses_5_second_timeout(self, svc, session):
         """Health check uses a 5-second timeout."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.get = MagicMock(return_value=_mock_response(status=200))
-        svc._session = session
 
         await svc.health_check()
 
@@ -430,13 +508,13 @@ class TestGenericHTTPServiceHealth:
 
 
 class TestGenericHTTPServiceMisc:
-    async def test_close_session(self):
+    async def test_close_session(self, session_cls):
         """Closing the service closes the aiohttp session."""
         svc = GenericHTTPService(_make_ha_config())
         session = svc._get_session()
-        assert not session.closed
 
         await svc.close()
+        session.close.assert_awaited_once()
         assert svc._session is None
 
     async def test_close_is_idempotent(self):
@@ -478,24 +556,18 @@ class TestGenericHTTPServiceMisc:
         body = GenericHTTPService._build_body(tool, {"a": 1, "b": 2, "c": 3})
         assert body == {"a": 1, "b": 2, "c": 3}
 
-    async def test_response_no_wrap(self):
+    async def test_response_no_wrap(self, svc, session):
         """Raw response when tool has no response.wrap defined."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         json_data = {"entity_id": "sensor.temp", "state": "22.5"}
         session.get = MagicMock(return_value=_mock_response(json_data=json_data))
-        svc._session = session
 
         # ha_get_state has no response.wrap
         result = await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
         assert result == json_data
 
-    async def test_service_unreachable(self):
+    async def test_service_unreachable(self, svc, session):
         """aiohttp.ClientError is wrapped in HTTPServiceError with 'unreachable'."""
-        svc = GenericHTTPService(_make_ha_config())
-        session = _mock_session()
         session.get = MagicMock(side_effect=aiohttp.ClientError("some error"))
-        svc._session = session
 
         with pytest.raises(HTTPServiceError, match=r"(?i)unreachable"):
             await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
@@ -527,24 +599,32 @@ class TestGenericHTTPServiceMisc:
         call_url = session.get.call_args[0][0]
         assert call_url == "http://ha-test:8123/api/states/sensor.temp"
 
-    async def test_get_session_reuses_existing(self):
+    async def test_get_session_reuses_existing(self, session_cls):
         """_get_session returns the same session when not closed."""
         svc = GenericHTTPService(_make_ha_config())
         session1 = svc._get_session()
         session2 = svc._get_session()
         assert session1 is session2
-        await session1.close()
+        session_cls.assert_called_once()
 
-    async def test_get_session_creates_new_if_closed(self):
+    async def test_get_session_pool_and_timeout(self):
+        """Sessions use a tuned keep-alive connector and a default request timeout."""
+        svc = GenericHTTPService(_make_ha_config())
+        session = svc._get_session()
+        assert session.connector.limit == 32
+        assert session.connector.limit_per_host == 16
+        assert session.timeout.total == 30
+        await session.close()
+
+    async def test_get_session_creates_new_if_closed(self, session_cls):
         """_get_session creates a new session if the previous one was closed."""
         svc = GenericHTTPService(_make_ha_config())
         session1 = svc._get_session()
-        await session1.close()
+        session1.closed = True
 
         session2 = svc._get_session()
         assert session2 is not session1
-        assert not session2.closed
-        await session2.close()
+        assert session_cls.call_count == 2
 
     async def test_error_mapping_with_templates(self):
         """Error mapping message supports {status} and {body} templates."""
@@ -568,25 +648,12 @@ class TestGenericHTTPServiceMisc:
         with pytest.raises(HTTPServiceError, match=r"status=422.*body=bad input"):
             await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
 
-    async def test_no_error_mapping_401_default(self):
-        """Without error mapping, 401 falls through to default auth error."""
-        config = ServiceConfig(
-            name="custom",
-            url="http://example.com",
-            auth=AuthConfig(type="bearer", token="tok"),
-            tools=load_tools_file("tools/homeassistant.yaml", "custom"),
-            errors=[],  # no mappings
-        )
-        svc = GenericHTTPService(config)
-        session = _mock_session()
-        session.get = MagicMock(return_value=_mock_response(status=401, text="Unauthorized"))
-        svc._session = session
-
-        with pytest.raises(HTTPServiceError, match="authentication failed"):
-            await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
-
-    async def test_no_error_mapping_404_default(self):
-        """Without error mapping, 404 falls through to default not-found error."""
+    @pytest.mark.parametrize(
+        ("status", "text", "match"),
+        [(401, "Unauthorized", "authentication failed"), (404, "Not Found", "not found")],
+    )
+    async def test_no_error_mapping_uses_default(self, status, text, match):
+        """Without error mappings, 401/404 fall through to the default errors."""
         config = ServiceConfig(
             name="custom",
             url="http://example.com",
@@ -596,8 +663,8 @@ class TestGenericHTTPServiceMisc:
         )
         svc = GenericHTTPService(config)
         session = _mock_session()
-        session.get = MagicMock(return_value=_mock_response(status=404, text="Not Found"))
+        session.get = MagicMock(return_value=_mock_response(status=status, text=text))
         svc._session = session
 
-        with pytest.raises(HTTPServiceError, match="not found"):
+        with pytest.raises(HTTPServiceError, match=match):
             await svc.execute("ha_get_state", {"entity_id": "sensor.temp"})
@@ -9,7 +9,6 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import json
-import tempfile
 import time
 from collections.abc import AsyncIterator
 from typing import Any
@@ -122,70 +121,68 @@ TOKEN = "test-token"
 @pytest.fixture
 async def gateway_env() -> AsyncIterator[tuple[str, MockMessenger, GatewayServer, Database]]:
     """Start a full gateway with real WS server, return (url, messenger, gateway, db)."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        db_path = f"{tmpdir}/test.db"
-        db = Database(db_path)
-        await db.initialize()
-
-        # Build registry from HA tools YAML
-        tools = load_tools_file("tools/homeassistant.yaml", "homeassistant")
-        svc_config = ServiceConfig(
-            name="homeassistant",
-            url="http://ha",
-            auth=AuthConfig(type="bearer", token="x"),
-            tools=tools,
-        )
-        registry = build_registry({"homeassistant": svc_config})
-
-        # Mock services
-        ha = MockHAService()
-        executor = Executor({"homeassistant": ha}, registry)
-        messenger = MockMessenger()
-
-        # Permission rules:
-        #   ha_get_* -> allow (default)
-        #   ha_call_service(lock.*) -> deny (rule)
-        #   everything else -> ask (default fallback)
-        permissions = Permissions(
-            defaults=[
-                PermissionRule(pattern="ha_get_state(*)", action="allow"),
-                PermissionRule(pattern="*", action="ask"),
-            ],
-            rules=[
-                PermissionRule(pattern="ha_call_service(lock.*)", action="deny"),
-            ],
-        )
-        engine = PermissionEngine(permissions, registry=registry)
-
-        gateway = GatewayServer(
-            agent_token=TOKEN,
-            engine=engine,
-            executor=executor,
-            messenger=messenger,
-            db=db,
-            approval_timeout=60,
-            registry=registry,
-        )
-
-        # Wire approval callback
-        await messenger.on_approval_callback(gateway.resolve_approval)
-
-        # Start real WS server
-        server = await websockets.asyncio.server.serve(
-            gateway.handle_connection,
-            "127.0.0.1",
-            0,  # Random port
-        )
-
-        # Get the assigned port
-        port = server.sockets[0].getsockname()[1]
-        url = f"ws://127.0.0.1:{port}"
-
-        yield url, messenger, gateway, db
-
-        server.close()
-        await server.wait_closed()
-        await db.close()
+    db = Database(":memory:")
+    await db.initialize()
+
+    # Build registry from HA tools YAML
+    tools = load_tools_file("tools/homeassistant.yaml", "homeassistant")
+    svc_config = ServiceConfig(
+        name="homeassistant",
+        url="http://ha",
+        auth=AuthConfig(type="bearer", token="x"),
+        tools=tools,
+    )
+    registry = build_registry({"homeassistant": svc_config})
+
+    # Mock services
+    ha = MockHAService()
+    executor = Executor({"homeassistant": ha}, registry)
+    messenger = MockMessenger()
+
+    # Permission rules:
+    #   ha_get_* -> allow (default)
+    #   ha_call_service(lock.*) -> deny (rule)
+    #   everything else -> ask (default fallback)
+    permissions = Permissions(
+        defaults=[
+            PermissionRule(pattern="ha_get_state(*)", action="allow"),
+            PermissionRule(pattern="*", action="ask"),
+        ],
+        rules=[
+            PermissionRule(pattern="ha_call_service(lock.*)", action="deny"),
+        ],
+    )
+    engine = PermissionEngine(permissions, registry=registry)
+
+    gateway = GatewayServer(
+        agent_token=TOKEN,
+        engine=engine,
+        executor=executor,
+        messenger=messenger,
+        db=db,
+        approval_timeout=60,
+        registry=registry,
+    )
+
+    # Wire approval callback
+    await messenger.on_approval_callback(gateway.resolve_approval)
+
+    # Start real WS server
+    server = await websockets.asyncio.server.serve(
+        gateway.handle_connection,
+        "127.0.0.1",
+        0,  # Random port
+    )
+
+    # Get the assigned port
+    port = server.sockets[0].getsockname()[1]
+    url = f"ws://127.0.0.1:{port}"
+
+    yield url, messenger, gateway, db
+
+    server.close()
+    await server.wait_closed()
+    await db.close()
 
 
 # ---------------------------------------------------------------------------
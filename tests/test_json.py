@@ -0,0 +1,58 @@
+"""Tests for agentpass._json — shared JSON encoding with optional orjson."""
+
+import json
+import math
+
+import pytest
+
+from agentpass import _json
+from agentpass._json import json_dumps, json_loads
+
+
+@pytest.fixture(autouse=True, params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    """Run every test with and without orjson; results must not differ."""
+    if request.param == "orjson":
+        monkeypatch.setattr(_json, "orjson", pytest.importorskip("orjson"))
+    else:
+        monkeypatch.setattr(_json, "orjson", None)
+    return request.param
+
+
+class TestJsonDumps:
+    def test_round_trips_through_json(self):
+        data = {"entity_id": "light.kitchen", "brightness": 255, "nested": [1, None]}
+        assert json.loads(json_dumps(data)) == data
+
+    def test_non_str_keys_coerced_like_stdlib(self):
+        assert json.loads(json_dumps({1: "x"})) == {"1": "x"}
+
+    @pytest.mark.parametrize("n", [2**64, -(2**63) - 1, 10**30])
+    def test_int_beyond_64_bits_written_exactly(self, n):
+        assert json.loads(json_dumps({"n": n})) == {"n": n}
+
+    def test_non_finite_floats_written_as_stdlib_literals(self):
+        text = json_dumps({"a": math.nan, "b": math.inf, "c": -math.inf, "d": None})
+        parsed = json.loads(text)
+        assert math.isnan(parsed["a"])
+        assert (parsed["b"], parsed["c"], parsed["d"]) == (math.inf, -math.inf, None)
+
+
+class TestJsonLoads:
+    def test_parses_document(self):
+        assert json_loads('{"a": [1, 2.5, null]}') == {"a": [1, 2.5, None]}
+
+    def test_accepts_stdlib_non_finite_literals(self):
+        parsed = json_loads('{"a": NaN, "b": Infinity, "c": -Infinity}')
+        assert math.isnan(parsed["a"])
+        assert (parsed["b"], parsed["c"]) == (math.inf, -math.inf)
+
+    @pytest.mark.parametrize("n", [2**64, -(2**63) - 1, -9999999999999999999, 10**30])
+    def test_int_beyond_64_bits_parsed_exactly(self, n):
+        parsed = json_loads(f'{{"n": {n}}}')
+        assert parsed == {"n": n}
+        assert isinstance(parsed["n"], int)
+
+    def test_malformed_raises_json_decode_error(self):
+        with pytest.raises(json.JSONDecodeError):
+            json_loads("not json {{{")
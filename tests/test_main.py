@@ -1,10 +1,12 @@
-"""Tests for agentpass.__main__ — CLI entrypoint and orchestration."""
+"""Tests for agentpass.__main__ (CLI entrypoint) and agentpass.serve (orchestration)."""
 
 from __future__ import annotations
 
 import argparse
 import logging
 import signal
+import subprocess
+import sys
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -76,6 +78,7 @@ def _make_mock_config(*, tls=None):
     config.storage.path = "/tmp/test-gate.db"
     config.approval_timeout = 900
     config.rate_limit = MagicMock()
+    config.rate_limit.max_concurrent_per_service = 16
     return config
 
 
@@ -132,7 +135,10 @@ def _patch_health_server():
 # ---------------------------------------------------------------------------
 
 # Common patch targets for run() tests
-_PATCH_PREFIX = "agentpass.__main__"
+_PATCH_PREFIX = "agentpass.serve"
+
+# Patch target for main() / parse_args() tests
+_MAIN_PREFIX = "agentpass.__main__"
 
 
 class TestRunTlsCheck:
@@ -141,7 +147,7 @@ class TestRunTlsCheck:
     @pytest.mark.asyncio
     async def test_no_tls_no_insecure_exits(self):
         """NFR1-AC1: Without TLS config and without --insecure, run() calls sys.exit(1)."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=False)
         mock_config = _make_mock_config(tls=None)
@@ -160,7 +166,7 @@ class TestRunTlsCheck:
     @pytest.mark.asyncio
     async def test_no_tls_with_insecure_proceeds(self):
         """NFR1-AC1: With --insecure, startup proceeds even without TLS."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -209,7 +215,7 @@ class TestRunStartupSequence:
         """FR10-AC2: Startup calls components in correct order:
         config -> db -> services -> health checks -> PTB start -> WS serve -> log ready.
         """
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -250,7 +256,7 @@ class TestRunStartupSequence:
         async def track_ptb_start():
             call_order.append("ptb.start")
 
-        async def track_ptb_start_polling():
+        async def track_ptb_start_polling(**kwargs):
             call_order.append("ptb.updater.start_polling")
 
         async def track_stop_wait():
@@ -286,7 +292,7 @@ class TestRunStartupSequence:
     @pytest.mark.asyncio
     async def test_logs_ready_message(self, caplog):
         """FR10-AC2: Logs 'ready' when startup completes."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -324,6 +330,47 @@ class TestRunStartupSequence:
 
         assert any("ready" in record.message for record in caplog.records)
 
+    @pytest.mark.asyncio
+    async def test_telegram_adapter_built_off_loop_thread(self):
+        """The adapter (PTB HTTP client + CA bundle load) is built in a worker thread."""
+        import threading
+
+        from agentpass.serve import run
+
+        args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
+        mock_config = _make_mock_config(tls=None)
+        mock_ha = AsyncMock()
+        mock_ha.health_check = AsyncMock(return_value=True)
+        mock_telegram = AsyncMock()
+        mock_telegram.application = _make_mock_ptb_app()
+        mock_stop_event = AsyncMock()
+        mock_stop_event.set = MagicMock()
+
+        built_in = []
+
+        def build_adapter(cfg):
+            built_in.append(threading.current_thread())
+            return mock_telegram
+
+        with (
+            patch(f"{_PATCH_PREFIX}.load_config", return_value=mock_config),
+            patch(f"{_PATCH_PREFIX}.load_permissions", return_value=_make_mock_permissions()),
+            patch(f"{_PATCH_PREFIX}.Database", return_value=AsyncMock()),
+            patch(f"{_PATCH_PREFIX}.GenericHTTPService", return_value=mock_ha),
+            patch(f"{_PATCH_PREFIX}.build_registry", return_value=MagicMock()),
+            patch(f"{_PATCH_PREFIX}.TelegramAdapter", side_effect=build_adapter),
+            patch(f"{_PATCH_PREFIX}.GatewayServer", return_value=AsyncMock()),
+            patch(
+                f"{_PATCH_PREFIX}.websockets.asyncio.server.serve",
+                return_value=_make_ws_serve_cm(),
+            ),
+            patch(f"{_PATCH_PREFIX}.asyncio.Event", return_value=mock_stop_event),
+        ):
+            await run(args)
+
+        assert built_in and built_in[0] is not threading.main_thread()
+        mock_telegram.on_approval_callback.assert_awaited_once()
+
 
 class TestRunHealthCheck:
     """NFR3-AC1: HA health check failure is non-fatal."""
@@ -331,7 +378,7 @@ class TestRunHealthCheck:
     @pytest.mark.asyncio
     async def test_failed_health_check_logs_warning(self, caplog):
         """NFR3-AC1: Failed HA health check logs warning but does not prevent startup."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -372,10 +419,87 @@ class TestRunHealthCheck:
         # But startup should still complete (db.close confirms clean shutdown)
         mock_db.close.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_raising_health_check_logs_warning(self, caplog):
+        """NFR3-AC1: A health check that raises is treated as unreachable, not fatal."""
+        from agentpass.serve import run
+
+        args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
+        mock_config = _make_mock_config(tls=None)
+        mock_ptb = _make_mock_ptb_app()
+        mock_ws_cm = _make_ws_serve_cm()
+
+        mock_db = AsyncMock()
+        mock_ha = AsyncMock()
+        mock_ha.health_check = AsyncMock(side_effect=RuntimeError("boom"))
+        mock_telegram = AsyncMock()
+        mock_telegram.application = mock_ptb
+        mock_telegram.on_approval_callback = AsyncMock()
+        mock_telegram.stop = AsyncMock()
+        mock_gateway = AsyncMock()
+        mock_gateway.resolve_all_pending = AsyncMock()
+        mock_gateway.handle_connection = AsyncMock()
+
+        mock_stop_event = AsyncMock()
+        mock_stop_event.wait = AsyncMock()
+        mock_stop_event.set = MagicMock()
+
+        with (
+            patch(f"{_PATCH_PREFIX}.load_config", return_value=mock_config),
+            patch(f"{_PATCH_PREFIX}.load_permissions", return_value=_make_mock_permissions()),
+            patch(f"{_PATCH_PREFIX}.Database", return_value=mock_db),
+            patch(f"{_PATCH_PREFIX}.GenericHTTPService", return_value=mock_ha),
+            patch(f"{_PATCH_PREFIX}.build_registry", return_value=MagicMock()),
+            patch(f"{_PATCH_PREFIX}.TelegramAdapter", return_value=mock_telegram),
+            patch(f"{_PATCH_PREFIX}.GatewayServer", return_value=mock_gateway),
+            patch(f"{_PATCH_PREFIX}.websockets.asyncio.server.serve", return_value=mock_ws_cm),
+            patch(f"{_PATCH_PREFIX}.asyncio.Event", return_value=mock_stop_event),
+            caplog.at_level(logging.WARNING, logger="agentpass"),
+        ):
+            await run(args)
+
+        # The warning names the service and carries the exception
+        assert any(
+            "unreachable" in r.message.lower() and "RuntimeError('boom')" in r.message
+            for r in caplog.records
+        )
+        # But startup should still complete (db.close confirms clean shutdown)
+        mock_db.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_db_init_failure_closes_services(self):
+        """Services built before a failed DB init are closed before the error propagates."""
+        from agentpass.serve import run
+
+        args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
+        mock_config = _make_mock_config(tls=None)
+
+        mock_db = AsyncMock()
+        mock_db.initialize = AsyncMock(side_effect=OSError("disk full"))
+        mock_ha = AsyncMock()
+        mock_ha.health_check = AsyncMock(return_value=True)
+        mock_stop_event = AsyncMock()
+        mock_stop_event.set = MagicMock()
+
+        with (
+            patch(f"{_PATCH_PREFIX}.load_config", return_value=mock_config),
+            patch(f"{_PATCH_PREFIX}.load_permissions", return_value=_make_mock_permissions()),
+            patch(f"{_PATCH_PREFIX}.Database", return_value=mock_db),
+            patch(f"{_PATCH_PREFIX}.GenericHTTPService", return_value=mock_ha),
+            patch(f"{_PATCH_PREFIX}.build_registry", return_value=MagicMock()),
+            patch(f"{_PATCH_PREFIX}.TelegramAdapter", return_value=AsyncMock()),
+            patch(f"{_PATCH_PREFIX}.asyncio.Event", return_value=mock_stop_event),
+            pytest.raises(OSError, match="disk full"),
+        ):
+            await run(args)
+
+        mock_ha.close.assert_awaited_once()
+        mock_db.close.assert_awaited_once()
+
     @pytest.mark.asyncio
     async def test_successful_health_check_no_warning(self, caplog):
         """NFR3-AC1: Successful HA health check does NOT log a warning."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -421,7 +545,7 @@ class TestRunShutdownSequence:
     @pytest.mark.asyncio
     async def test_shutdown_resolves_pending_and_closes_all(self):
         """FR10-AC4: Shutdown resolves pending, stops telegram, stops PTB, closes HA, closes DB."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -464,6 +588,53 @@ class TestRunShutdownSequence:
         mock_ha.close.assert_awaited_once()
         mock_db.close.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_shutdown_step_failure_does_not_block_others(self, caplog):
+        """FR10-AC4: A failing shutdown step is logged; the remaining steps still run."""
+        from agentpass.serve import run
+
+        args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
+        mock_config = _make_mock_config(tls=None)
+        mock_ptb = _make_mock_ptb_app()
+        mock_ws_cm = _make_ws_serve_cm()
+
+        mock_db = AsyncMock()
+        mock_ha = AsyncMock()
+        mock_ha.health_check = AsyncMock(return_value=True)
+        mock_ha.close = AsyncMock(side_effect=RuntimeError("close failed"))
+        mock_telegram = AsyncMock()
+        mock_telegram.application = mock_ptb
+        mock_telegram.on_approval_callback = AsyncMock()
+        mock_telegram.stop = AsyncMock()
+        mock_gateway = AsyncMock()
+        mock_gateway.resolve_all_pending = AsyncMock()
+        mock_gateway.handle_connection = AsyncMock()
+
+        mock_stop_event = AsyncMock()
+        mock_stop_event.wait = AsyncMock()
+        mock_stop_event.set = MagicMock()
+
+        with (
+            patch(f"{_PATCH_PREFIX}.load_config", return_value=mock_config),
+            patch(f"{_PATCH_PREFIX}.load_permissions", return_value=_make_mock_permissions()),
+            patch(f"{_PATCH_PREFIX}.Database", return_value=mock_db),
+            patch(f"{_PATCH_PREFIX}.GenericHTTPService", return_value=mock_ha),
+            patch(f"{_PATCH_PREFIX}.build_registry", return_value=MagicMock()),
+            patch(f"{_PATCH_PREFIX}.TelegramAdapter", return_value=mock_telegram),
+            patch(f"{_PATCH_PREFIX}.GatewayServer", return_value=mock_gateway),
+            patch(f"{_PATCH_PREFIX}.websockets.asyncio.server.serve", return_value=mock_ws_cm),
+            patch(f"{_PATCH_PREFIX}.asyncio.Event", return_value=mock_stop_event),
+            caplog.at_level(logging.ERROR, logger="agentpass"),
+        ):
+            await run(args)
+
+        assert any("Error stopping service" in r.message for r in caplog.records)
+        mock_telegram.stop.assert_awaited_once()
+        mock_ptb.updater.stop.assert_awaited_once()
+        mock_ptb.stop.assert_awaited_once()
+        mock_ha.close.assert_awaited_once()
+        mock_db.close.assert_awaited_once()
+
 
 class TestRunSignalHandling:
     """FR10-AC3: Signal handling registration."""
@@ -471,7 +642,7 @@ class TestRunSignalHandling:
     @pytest.mark.asyncio
     async def test_signal_handlers_registered(self):
         """FR10-AC3: SIGTERM and SIGINT handlers are registered."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -518,6 +689,11 @@ class TestRunSignalHandling:
         assert signal.SIGTERM in registered_signals
         assert signal.SIGINT in registered_signals
 
+        # Blocking I/O goes to a bounded, named default executor
+        (pool,), _ = mock_loop.set_default_executor.call_args
+        assert pool._thread_name_prefix == "agentpass-io"
+        pool.shutdown()
+
 
 class TestRunPtbLifecycle:
     """FR10-AC5: PTB uses manual lifecycle, NOT run_polling()."""
@@ -525,7 +701,7 @@ class TestRunPtbLifecycle:
     @pytest.mark.asyncio
     async def test_ptb_manual_lifecycle(self):
         """FR10-AC5: PTB Application is used as async context manager with start/stop."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -566,7 +742,7 @@ class TestRunPtbLifecycle:
 
         # start() and start_polling() called (NOT run_polling)
         mock_ptb.start.assert_awaited_once()
-        mock_ptb.updater.start_polling.assert_awaited_once()
+        mock_ptb.updater.start_polling.assert_awaited_once_with(timeout=30)
 
         # stop() and updater.stop() called in shutdown
         mock_ptb.stop.assert_awaited_once()
@@ -579,7 +755,7 @@ class TestRunTlsContext:
     @pytest.mark.asyncio
     async def test_tls_ssl_context_built(self):
         """When config has TLS, an SSLContext is created and passed to websockets.serve."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=False)
         mock_tls = MagicMock()
@@ -641,7 +817,7 @@ class TestRunTokenNeverLogged:
     @pytest.mark.asyncio
     async def test_token_not_in_logs(self, caplog):
         """NFR1-AC2: The agent token does not appear in any log message."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -688,7 +864,7 @@ class TestRunGatewayServerWiring:
     @pytest.mark.asyncio
     async def test_gateway_server_creation(self):
         """GatewayServer is wired with engine, executor, messenger, db, etc."""
-        from agentpass.__main__ import run
+        from agentpass.serve import run
 
         args = argparse.Namespace(config="c.yaml", permissions="p.yaml", insecure=True)
         mock_config = _make_mock_config(tls=None)
@@ -755,9 +931,9 @@ class TestMain:
         mock_args = argparse.Namespace(command="serve")
 
         with (
-            patch(f"{_PATCH_PREFIX}.parse_args", return_value=mock_args),
-            patch(f"{_PATCH_PREFIX}.asyncio.run") as mock_run,
-            patch(f"{_PATCH_PREFIX}.sys") as mock_sys,
+            patch(f"{_MAIN_PREFIX}.parse_args", return_value=mock_args),
+            patch(f"{_MAIN_PREFIX}.asyncio.run") as mock_run,
+            patch(f"{_MAIN_PREFIX}.sys") as mock_sys,
         ):
             from agentpass.config import ConfigError
 
@@ -769,6 +945,16 @@ class TestMain:
 
             mock_sys.exit.assert_called_once_with(1)
 
+    def test_import_does_not_load_server_stack(self):
+        """Importing the entrypoint must not pull in Telegram/aiohttp/server modules."""
+        code = (
+            "import sys, agentpass.__main__; "
+            "heavy = {'telegram', 'aiohttp', 'yaml', 'agentpass.serve'} & set(sys.modules); "
+            "sys.exit(sorted(heavy) or 0)"
+        )
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr
+
 
 # ---------------------------------------------------------------------------
 # Subcommand parsing tests
@@ -863,8 +1049,8 @@ class TestLogLevel:
         mock_args = argparse.Namespace(command="serve")
         env = {"LOG_LEVEL": level} if level else {}
         with (
-            patch(f"{_PATCH_PREFIX}.parse_args", return_value=mock_args),
-            patch(f"{_PATCH_PREFIX}.asyncio.run"),
+            patch(f"{_MAIN_PREFIX}.parse_args", return_value=mock_args),
+            patch(f"{_MAIN_PREFIX}.asyncio.run"),
             patch.dict("os.environ", env, clear=False),
         ):
             if level is None:
@@ -10,6 +10,29 @@ from agentpass.messenger.base import (
 )
 
 
+async def _send_approval(self, request, choices):
+    return "msg-1"
+
+
+async def _noop(self, *args):
+    pass
+
+
+# Sample approval values; never mutated by the tests that share them
+_SAMPLE_REQUEST = ApprovalRequest(request_id="r1", tool_name="test", args={}, signature="test()")
+_ALLOW = ApprovalChoice(label="Allow", action="allow")
+_DENY = ApprovalChoice(label="Deny", action="deny")
+
+# A full MessengerAdapter implementation, as class attributes for type()
+_ADAPTER_METHODS = {
+    "send_approval": _send_approval,
+    "update_approval": _noop,
+    "on_approval_callback": _noop,
+    "start": _noop,
+    "stop": _noop,
+}
+
+
 class TestApprovalRequest:
     def test_construction(self):
         req = ApprovalRequest(
@@ -40,22 +63,10 @@ class TestApprovalRequest:
         assert hasattr(req, "signature")
 
     def test_args_is_dict(self):
-        req = ApprovalRequest(
-            request_id="r1",
-            tool_name="test",
-            args={},
-            signature="test()",
-        )
-        assert isinstance(req.args, dict)
+        assert isinstance(_SAMPLE_REQUEST.args, dict)
 
     def test_empty_args(self):
-        req = ApprovalRequest(
-            request_id="r1",
-            tool_name="test",
-            args={},
-            signature="test()",
-        )
-        assert req.args == {}
+        assert _SAMPLE_REQUEST.args == {}
 
 
 class TestApprovalChoice:
@@ -65,14 +76,12 @@ class TestApprovalChoice:
         assert choice.action == "allow"
 
     def test_field_access(self):
-        choice = ApprovalChoice(label="Deny", action="deny")
-        assert hasattr(choice, "label")
-        assert hasattr(choice, "action")
+        assert hasattr(_DENY, "label")
+        assert hasattr(_DENY, "action")
 
     def test_deny_choice(self):
-        choice = ApprovalChoice(label="Deny", action="deny")
-        assert choice.label == "Deny"
-        assert choice.action == "deny"
+        assert _DENY.label == "Deny"
+        assert _DENY.action == "deny"
 
 
 class TestApprovalResult:
@@ -147,100 +156,13 @@ class TestMessengerAdapterABC:
         messenger = ConcreteMessenger()
         assert isinstance(messenger, MessengerAdapter)
 
-    def test_partial_implementation_missing_send_approval(self):
-        """A subclass missing send_approval cannot be instantiated."""
-
-        class PartialMessenger(MessengerAdapter):
-            async def update_approval(self, message_id, status, detail):
-                pass
-
-            async def on_approval_callback(self, callback):
-                pass
-
-            async def start(self):
-                pass
-
-            async def stop(self):
-                pass
-
-        with pytest.raises(TypeError):
-            PartialMessenger()
-
-    def test_partial_implementation_missing_update_approval(self):
-        """A subclass missing update_approval cannot be instantiated."""
-
-        class PartialMessenger(MessengerAdapter):
-            async def send_approval(self, request, choices):
-                return "msg-1"
-
-            async def on_approval_callback(self, callback):
-                pass
-
-            async def start(self):
-                pass
-
-            async def stop(self):
-                pass
-
+    @pytest.mark.parametrize("missing", list(_ADAPTER_METHODS))
+    def test_partial_implementation_missing_method(self, missing):
+        """A subclass missing any one abstract method cannot be instantiated."""
+        methods = {name: fn for name, fn in _ADAPTER_METHODS.items() if name != missing}
+        partial = type("PartialMessenger", (MessengerAdapter,), methods)
         with pytest.raises(TypeError):
-            PartialMessenger()
-
-    def test_partial_implementation_missing_on_approval_callback(self):
-        """A subclass missing on_approval_callback cannot be instantiated."""
-
-        class PartialMessenger(MessengerAdapter):
-            async def send_approval(self, request, choices):
-                return "msg-1"
-
-            async def update_approval(self, message_id, status, detail):
-                pass
-
-            async def start(self):
-                pass
-
-            async def stop(self):
-                pass
-
-        with pytest.raises(TypeError):
-            PartialMessenger()
-
-    def test_partial_implementation_missing_start(self):
-        """A subclass missing start cannot be instantiated."""
-
-        class PartialMessenger(MessengerAdapter):
-            async def send_approval(self, request, choices):
-                return "msg-1"
-
-            async def update_approval(self, message_id, status, detail):
-                pass
-
-            async def on_approval_callback(self, callback):
-                pass
-
-            async def stop(self):
-                pass
-
-        with pytest.raises(TypeError):
-            PartialMessenger()
-
-    def test_partial_implementation_missing_stop(self):
-        """A subclass missing stop cannot be instantiated."""
-
-        class PartialMessenger(MessengerAdapter):
-            async def send_approval(self, request, choices):
-                return "msg-1"
-
-            async def update_approval(self, message_id, status, detail):
-                pass
-
-            async def on_approval_callback(self, callback):
-                pass
-
-            async def start(self):
-                pass
-
-        with pytest.raises(TypeError):
-            PartialMessenger()
+            partial()
 
     async def test_concrete_subclass_methods_are_callable(self):
         """Verify that the concrete subclass methods can actually be called."""
@@ -264,17 +186,7 @@ class TestMessengerAdapterABC:
         messenger = ConcreteMessenger()
 
         # Test send_approval
-        req = ApprovalRequest(
-            request_id="r1",
-            tool_name="test",
-            args={},
-            signature="test()",
-        )
-        choices = [
-            ApprovalChoice(label="Allow", action="allow"),
-            ApprovalChoice(label="Deny", action="deny"),
-        ]
-        msg_id = await messenger.send_approval(req, choices)
+        msg_id = await messenger.send_approval(_SAMPLE_REQUEST, [_ALLOW, _DENY])
         assert msg_id == "msg-1"
 
         # Test update_approval
@@ -1,6 +1,8 @@
 """Tests for agentpass.models — shared data models."""
 
 import asyncio
+import subprocess
+import sys
 import time
 
 from agentpass.models import (
@@ -53,27 +55,22 @@ class TestToolResult:
 
 
 class TestPendingApproval:
-    def test_construction(self):
+    async def test_construction(self):
         req = ToolRequest(id="req-1", tool_name="test", args={})
-        loop = asyncio.new_event_loop()
-        future = loop.create_future()
+        future = asyncio.get_running_loop().create_future()
         before = time.time()
         pending = PendingApproval(request=req, future=future)
         after = time.time()
         assert pending.request is req
         assert pending.future is future
         assert before <= pending.created_at <= after
-        loop.close()
 
-    def test_defaults(self):
+    async def test_defaults(self):
         req = ToolRequest(id="req-1", tool_name="test", args={})
-        loop = asyncio.new_event_loop()
-        future = loop.create_future()
+        future = asyncio.get_running_loop().create_future()
         pending = PendingApproval(request=req, future=future)
         assert pending.message_id is None
-        assert pending.timeout_task is None
         assert pending.expires_at == 0
-        loop.close()
 
 
 class TestAuditEntry:
@@ -102,3 +99,15 @@ class TestAuditEntry:
         assert entry.resolved_at is None
         assert entry.execution_result is None
         assert entry.agent_id == "default"
+
+
+class TestImportCost:
+    def test_models_do_not_load_io_stack(self):
+        """The shared models and messenger base must not pull in aiohttp/Telegram/YAML."""
+        code = (
+            "import sys, agentpass.models, agentpass.messenger.base; "
+            "heavy = {'telegram', 'aiohttp', 'yaml', 'aiosqlite'} & set(sys.modules); "
+            "sys.exit(sorted(heavy) or 0)"
+        )
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr
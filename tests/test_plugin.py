@@ -36,6 +36,16 @@ class MockPluginService(ServiceHandler):
         pass
 
 
+class IncompletePluginService(ServiceHandler):
+    """A plugin that forgot to implement health_check and close."""
+
+    def __init__(self, config: ServiceConfig, tools: list[ToolDefinition]) -> None:
+        pass
+
+    async def execute(self, tool_name: str, args: dict[str, Any]) -> dict[str, Any]:
+        return {}
+
+
 # ---------------------------------------------------------------------------
 # Unit tests for _load_plugin_service()
 # ---------------------------------------------------------------------------
@@ -60,7 +70,7 @@ class TestLoadPluginService:
 
     def test_loads_valid_plugin(self):
         """Valid handler_class is imported and instantiated correctly."""
-        from agentpass.__main__ import _load_plugin_service
+        from agentpass.serve import _load_plugin_service
 
         config = self._make_config()
         service = _load_plugin_service(config)
@@ -70,7 +80,7 @@ class TestLoadPluginService:
 
     def test_missing_handler_class_raises(self):
         """handler=python with empty handler_class raises ConfigError."""
-        from agentpass.__main__ import _load_plugin_service
+        from agentpass.serve import _load_plugin_service
 
         config = self._make_config(handler_class="")
         with pytest.raises(ConfigError, match="no handler_class"):
@@ -78,7 +88,7 @@ class TestLoadPluginService:
 
     def test_invalid_format_raises(self):
         """handler_class without ':' separator raises ConfigError."""
-        from agentpass.__main__ import _load_plugin_service
+        from agentpass.serve import _load_plugin_service
 
         config = self._make_config(handler_class="module.without.colon")
         with pytest.raises(ConfigError, match=r"expected 'module\.path:ClassName'"):
@@ -86,7 +96,7 @@ class TestLoadPluginService:
 
     def test_non_importable_module_raises(self):
         """Non-existent module in handler_class raises ConfigError."""
-        from agentpass.__main__ import _load_plugin_service
+        from agentpass.serve import _load_plugin_service
 
         config = self._make_config(handler_class="nonexistent.module:SomeClass")
         with pytest.raises(ConfigError, match="Cannot import"):
@@ -94,12 +104,20 @@ class TestLoadPluginService:
 
     def test_missing_class_in_module_raises(self):
         """Existing module but missing class name raises ConfigError."""
-        from agentpass.__main__ import _load_plugin_service
+        from agentpass.serve import _load_plugin_service
 
         config = self._make_config(handler_class="tests.test_plugin:NonexistentClass")
         with pytest.raises(ConfigError, match="not found"):
             _load_plugin_service(config)
 
+    def test_incomplete_plugin_raises(self):
+        """A class missing required ServiceHandler methods raises ConfigError."""
+        from agentpass.serve import _load_plugin_service
+
+        config = self._make_config(handler_class="tests.test_plugin:IncompletePluginService")
+        with pytest.raises(ConfigError, match="does not implement: health_check, close"):
+            _load_plugin_service(config)
+
     def test_default_handler_uses_http(self):
         """handler='http' (default) should NOT trigger plugin loading."""
         config = ServiceConfig(
@@ -108,22 +126,22 @@ class TestLoadPluginService:
             auth=AuthConfig(type="bearer", token="x"),
             handler="http",
         )
-        # This just verifies the config field; actual dispatch is in __main__.py
+        # This just verifies the config field; actual dispatch is in serve.py
         assert config.handler == "http"
 
 
 # ---------------------------------------------------------------------------
-# Integration tests for plugin dispatch in __main__.py
+# Integration tests for plugin dispatch in serve.py
 # ---------------------------------------------------------------------------
 
 
 class TestPluginIntegration:
-    """Test that __main__.py correctly dispatches to plugin when handler=python."""
+    """Test that serve.py correctly dispatches to plugin when handler=python."""
 
     @pytest.mark.asyncio
     async def test_plugin_service_execute(self):
         """When loaded via _load_plugin_service, the plugin can execute tools."""
-        from agentpass.__main__ import _load_plugin_service
+        from agentpass.serve import _load_plugin_service
 
         config = ServiceConfig(
             name="test_svc",
@@ -140,7 +158,7 @@ class TestPluginIntegration:
     @pytest.mark.asyncio
     async def test_plugin_health_check(self):
         """Plugin service health_check is callable."""
-        from agentpass.__main__ import _load_plugin_service
+        from agentpass.serve import _load_plugin_service
 
         config = ServiceConfig(
             name="test_svc",
@@ -156,6 +156,12 @@ class TestToolRegistrySignatureParts:
         )
         assert parts == ["light.turn_on", ""]
 
+    def test_get_signature_parts_keeps_literal_text(self):
+        tool = _make_tool("query", signature="db:{table} , {a}-{b}-{a}, fixed")
+        registry = ToolRegistry({"query": tool})
+        parts = registry.get_signature_parts("query", {"table": "t", "a": 1, "b": "x"})
+        assert parts == ["db:t", "1-x-1", "fixed"]
+
 
 class TestToolRegistryArgValidators:
     def test_get_arg_validators(self, registry):
@@ -6,11 +6,12 @@ import asyncio
 import contextlib
 import json
 import time
+from collections.abc import Callable
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from agentpass.config import RateLimitConfig
 from agentpass.db import Database
-from agentpass.engine import PermissionEngine
+from agentpass.engine import PermissionEngine, build_signature
 from agentpass.executor import ExecutionError, Executor
 from agentpass.messenger.base import ApprovalResult, MessengerAdapter
 from agentpass.models import Decision, PendingApproval, ToolRequest
@@ -62,7 +63,8 @@ class MockWebSocket:
         if self.closed:
             raise StopAsyncIteration
         try:
-            data = await asyncio.wait_for(self.to_recv.get(), timeout=self._iter_timeout)
+            async with asyncio.timeout(self._iter_timeout):
+                data = await self.to_recv.get()
         except TimeoutError:
             raise StopAsyncIteration from None
         return data
@@ -103,6 +105,11 @@ def _make_server(**overrides) -> GatewayServer:
         "rate_limit_config",
         RateLimitConfig(max_pending_approvals=10, max_requests_per_minute=60),
     )
+    if isinstance(engine, MagicMock):
+        # Mocked engines still validate and build signatures for real
+        engine.build_signature.side_effect = lambda tool, args: build_signature(
+            tool, args, registry
+        )
 
     return GatewayServer(
         agent_token=overrides.pop("agent_token", TOKEN),
@@ -141,6 +148,18 @@ def _tool_request_msg(
     }
 
 
+async def _until(condition: Callable[[], object]) -> None:
+    """Yield to the loop until *condition* holds, instead of sleeping a fixed time."""
+    async with asyncio.timeout(1):
+        while not condition():
+            await asyncio.sleep(0)
+
+
+def _prompted(server: GatewayServer) -> bool:
+    """Whether an approval is pending and its prompt has been sent."""
+    return any(p.message_id for p in server._pending.values())
+
+
 async def _cancel_task(task: asyncio.Task) -> None:
     """Cancel a task and suppress CancelledError."""
     task.cancel()
@@ -307,7 +326,7 @@ class TestToolRequests:
         task = asyncio.create_task(server.handle_connection(ws))
 
         # Wait for the approval to be pending
-        await asyncio.sleep(0.2)
+        await _until(lambda: _prompted(server))
 
         # Verify approval was sent to messenger
         messenger.send_approval.assert_called_once()
@@ -327,9 +346,8 @@ class TestToolRequests:
         await server.resolve_approval(approval_result)
 
         # Wait for task to complete
-        await asyncio.sleep(0.2)
+        await _until(lambda: not server._pending)
         ws.closed = True  # Allow iteration to stop
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
         responses = ws.get_responses()
@@ -340,6 +358,80 @@ class TestToolRequests:
         assert len(tool_responses) == 1
         assert tool_responses[0]["result"]["status"] == "executed"
 
+    async def test_ask_stores_pending_and_sends_prompt_concurrently(self):
+        """The DB insert and the messenger prompt overlap instead of running serially."""
+        engine = MagicMock(spec=PermissionEngine)
+        engine.evaluate.return_value = Decision.ASK
+        sent = asyncio.Event()
+        db = AsyncMock(spec=Database)
+
+        async def insert_pending(**kwargs):
+            # Serial insert-then-send never sets *sent*, so this times out
+            async with asyncio.timeout(1):
+                await sent.wait()
+
+        db.insert_pending.side_effect = insert_pending
+        messenger = AsyncMock(spec=MessengerAdapter)
+
+        async def send_approval(*args):
+            sent.set()
+            return "msg-123"
+
+        messenger.send_approval.side_effect = send_approval
+        server = _make_server(engine=engine, messenger=messenger, db=db)
+
+        ws = MockWebSocket()
+        ws.enqueue(_auth_msg())
+        ws.enqueue(_tool_request_msg(msg_id="ask-c"))
+        task = asyncio.create_task(server.handle_connection(ws))
+        await _until(lambda: _prompted(server))
+
+        # insert_pending only returns once send_approval ran, so serial code never gets here
+        assert sent.is_set()
+        assert len(server._pending) == 1
+        db.insert_pending.assert_awaited_once()
+
+        ws.closed = True
+        await server.resolve_all_pending("test")
+        await _cancel_task(task)
+
+    async def test_ask_resolved_while_pending_insert_in_flight(self):
+        """A tap that lands before insert_pending returns still resolves the request."""
+        engine = MagicMock(spec=PermissionEngine)
+        engine.evaluate.return_value = Decision.ASK
+        inserted = asyncio.Event()
+        db = AsyncMock(spec=Database)
+
+        async def insert_pending(**kwargs):
+            await inserted.wait()
+
+        db.insert_pending.side_effect = insert_pending
+        messenger = AsyncMock(spec=MessengerAdapter)
+        messenger.send_approval.return_value = "msg-123"
+        executor = AsyncMock(spec=Executor)
+        executor.execute.return_value = {"state": "on"}
+        server = _make_server(engine=engine, messenger=messenger, executor=executor, db=db)
+
+        ws = MockWebSocket()
+        ws.enqueue(_auth_msg())
+        ws.enqueue(_tool_request_msg(msg_id="ask-r"))
+        task = asyncio.create_task(server.handle_connection(ws))
+        await _until(lambda: messenger.send_approval.await_count)
+
+        # The guardian taps Allow while the DB insert is still running
+        request_id = messenger.send_approval.call_args[0][0].request_id
+        await server.resolve_approval(
+            ApprovalResult(request_id=request_id, action="allow", user_id="12345", timestamp=1.0)
+        )
+        inserted.set()
+
+        await _until(lambda: not server._pending)
+        ws.closed = True
+        await _cancel_task(task)
+
+        tool_responses = [r for r in ws.get_responses() if r.get("id") == "ask-r"]
+        assert tool_responses[0]["result"]["status"] == "executed"
+
     async def test_ask_denied_by_user(self):
         """FR3-AC3: ask -> denied by user returns -32001."""
         engine = MagicMock(spec=PermissionEngine)
@@ -354,7 +446,7 @@ class TestToolRequests:
         ws.enqueue(_tool_request_msg(msg_id="deny-1"))
 
         task = asyncio.create_task(server.handle_connection(ws))
-        await asyncio.sleep(0.2)
+        await _until(lambda: _prompted(server))
 
         # Get the server-generated request_id
         call_args = messenger.send_approval.call_args
@@ -369,9 +461,8 @@ class TestToolRequests:
         )
         await server.resolve_approval(approval_result)
 
-        await asyncio.sleep(0.2)
+        await _until(lambda: not server._pending)
         ws.closed = True
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
         tool_responses = [r for r in ws.get_responses() if r.get("id") == "deny-1"]
@@ -392,7 +483,7 @@ class TestToolRequests:
         ws.enqueue(_tool_request_msg(msg_id="timeout-1"))
 
         task = asyncio.create_task(server.handle_connection(ws))
-        await asyncio.sleep(0.2)
+        await _until(lambda: _prompted(server))
 
         # Get the server-generated request_id
         call_args = messenger.send_approval.call_args
@@ -407,9 +498,8 @@ class TestToolRequests:
         )
         await server.resolve_approval(approval_result)
 
-        await asyncio.sleep(0.2)
+        await _until(lambda: not server._pending)
         ws.closed = True
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
         tool_responses = [r for r in ws.get_responses() if r.get("id") == "timeout-1"]
@@ -504,6 +594,61 @@ class TestToolRequests:
         error_resp = responses[1]
         assert error_resp["error"]["code"] == INVALID_REQUEST
 
+    async def test_registry_validation_error_returns_invalid_request(self):
+        """Missing required args (per the engine's registry) are rejected before evaluation."""
+        from agentpass.config import AuthConfig, ServiceConfig, load_tools_file
+        from agentpass.registry import build_registry
+
+        tools = load_tools_file("tools/homeassistant.yaml", "homeassistant")
+        svc = ServiceConfig(
+            name="homeassistant", url="http://ha", auth=AuthConfig(type="bearer"), tools=tools
+        )
+        engine = MagicMock(spec=PermissionEngine)
+        server = _make_server(engine=engine, registry=build_registry({"homeassistant": svc}))
+        ws = MockWebSocket()
+        ws.enqueue(_auth_msg())
+        ws.enqueue(_tool_request_msg(args={}))
+
+        await server.handle_connection(ws)
+
+        error_resp = ws.get_responses()[1]
+        assert error_resp["error"]["code"] == INVALID_REQUEST
+        assert "entity_id" in error_resp["error"]["message"]
+        engine.evaluate.assert_not_called()
+
+    async def test_signature_passed_to_engine(self):
+        """The signature the engine builds is the one it evaluates."""
+        engine = MagicMock(spec=PermissionEngine)
+        engine.evaluate.return_value = Decision.DENY
+        server = _make_server(engine=engine)
+        ws = MockWebSocket()
+        ws.enqueue(_auth_msg())
+        ws.enqueue(_tool_request_msg())
+
+        await server.handle_connection(ws)
+
+        engine.evaluate.assert_called_once_with(
+            "ha_get_state", {"entity_id": "sensor.temp"}, signature="ha_get_state(sensor.temp)"
+        )
+
+    async def test_audit_uses_engine_signature(self):
+        """The audit log records the signature from the engine's registry, not the server's."""
+        engine = MagicMock(spec=PermissionEngine)
+        engine.evaluate.return_value = Decision.DENY
+        db = AsyncMock(spec=Database)
+        server = _make_server(engine=engine, db=db)
+        engine.build_signature.side_effect = None
+        engine.build_signature.return_value = "ha_get_state(from-engine)"
+        ws = MockWebSocket()
+        ws.enqueue(_auth_msg())
+        ws.enqueue(_tool_request_msg())
+
+        await server.handle_connection(ws)
+
+        engine.build_signature.assert_called_once_with("ha_get_state", {"entity_id": "sensor.temp"})
+        assert engine.evaluate.call_args.kwargs["signature"] == "ha_get_state(from-engine)"
+        assert db.log_audit.call_args.args[0].signature == "ha_get_state(from-engine)"
+
     async def test_execution_error_returns_execution_failed(self):
         """Execution error returns -32004."""
         engine = MagicMock(spec=PermissionEngine)
@@ -577,7 +722,7 @@ class TestRateLimiting:
         ws.enqueue(_tool_request_msg(msg_id="p2"))  # Should hit pending limit
 
         task = asyncio.create_task(server.handle_connection(ws))
-        await asyncio.sleep(0.3)
+        await _until(lambda: server._pending and len(ws.sent) == 2)
 
         # p2 should have been rejected with rate limit error
         responses = ws.get_responses()
@@ -589,7 +734,6 @@ class TestRateLimiting:
         # Clean up pending futures
         await server.resolve_all_pending("test_cleanup")
         ws.closed = True
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
 
@@ -612,7 +756,7 @@ class TestConnectionManagement:
 
         # Start first connection (will wait in message loop)
         task1 = asyncio.create_task(server.handle_connection(ws1))
-        await asyncio.sleep(0.15)
+        await _until(lambda: ws1.sent)  # authenticated
 
         # Try second connection — should be immediately rejected
         await server.handle_connection(ws2)
@@ -753,7 +897,8 @@ class TestRealWebSocket:
             port = ws_server.sockets[0].getsockname()[1]
             async with ws_connect(f"ws://127.0.0.1:{port}") as client:
                 await client.send(json.dumps(_auth_msg()))
-                raw = await asyncio.wait_for(client.recv(), timeout=2)
+                async with asyncio.timeout(2):
+                    raw = await client.recv()
                 resp = json.loads(raw)
                 assert resp["result"]["status"] == "authenticated"
 
@@ -779,11 +924,13 @@ class TestRealWebSocket:
             async with ws_connect(f"ws://127.0.0.1:{port}") as client:
                 # Authenticate
                 await client.send(json.dumps(_auth_msg()))
-                await asyncio.wait_for(client.recv(), timeout=2)
+                async with asyncio.timeout(2):
+                    await client.recv()
 
                 # Send tool request
                 await client.send(json.dumps(_tool_request_msg()))
-                raw = await asyncio.wait_for(client.recv(), timeout=2)
+                async with asyncio.timeout(2):
+                    raw = await client.recv()
                 resp = json.loads(raw)
                 assert resp["result"]["status"] == "executed"
                 assert resp["result"]["data"] == {"brightness": 100}
@@ -808,11 +955,13 @@ class TestRealWebSocket:
             async with ws_connect(f"ws://127.0.0.1:{port}") as client:
                 # Authenticate
                 await client.send(json.dumps(_auth_msg()))
-                await asyncio.wait_for(client.recv(), timeout=2)
+                async with asyncio.timeout(2):
+                    await client.recv()
 
                 # Send tool request
                 await client.send(json.dumps(_tool_request_msg()))
-                raw = await asyncio.wait_for(client.recv(), timeout=2)
+                async with asyncio.timeout(2):
+                    raw = await client.recv()
                 resp = json.loads(raw)
                 assert resp["error"]["code"] == POLICY_DENIED
 
@@ -834,11 +983,13 @@ class TestRealWebSocket:
             async with ws_connect(f"ws://127.0.0.1:{port}") as client:
                 # Authenticate first
                 await client.send(json.dumps(_auth_msg()))
-                await asyncio.wait_for(client.recv(), timeout=2)
+                async with asyncio.timeout(2):
+                    await client.recv()
 
                 # Send malformed JSON
                 await client.send("not json {{{")
-                raw = await asyncio.wait_for(client.recv(), timeout=2)
+                async with asyncio.timeout(2):
+                    raw = await client.recv()
                 resp = json.loads(raw)
                 assert resp["error"]["code"] == PARSE_ERROR
 
@@ -942,7 +1093,7 @@ class TestTimeoutScheduling:
         ws.enqueue(_tool_request_msg(msg_id="st-1"))
 
         task = asyncio.create_task(server.handle_connection(ws))
-        await asyncio.sleep(0.2)
+        await _until(lambda: _prompted(server))
 
         # Verify schedule_timeout was called with server-generated request_id
         messenger.schedule_timeout.assert_called_once()
@@ -953,7 +1104,6 @@ class TestTimeoutScheduling:
         # Clean up
         await server.resolve_all_pending("test_cleanup")
         ws.closed = True
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
 
@@ -1050,7 +1200,7 @@ class TestAuditResolution:
         ws.enqueue(_tool_request_msg(msg_id="audit-1"))
 
         task = asyncio.create_task(server.handle_connection(ws))
-        await asyncio.sleep(0.2)
+        await _until(lambda: _prompted(server))
 
         # Get server-generated request_id
         request_id = messenger.send_approval.call_args[0][0].request_id
@@ -1064,9 +1214,8 @@ class TestAuditResolution:
         )
         await server.resolve_approval(approval_result)
 
-        await asyncio.sleep(0.2)
+        await _until(lambda: not server._pending)
         ws.closed = True
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
         # Verify audit resolution was called
@@ -1092,7 +1241,7 @@ class TestAuditResolution:
         ws.enqueue(_tool_request_msg(msg_id="audit-2"))
 
         task = asyncio.create_task(server.handle_connection(ws))
-        await asyncio.sleep(0.2)
+        await _until(lambda: _prompted(server))
 
         # Get server-generated request_id
         request_id = messenger.send_approval.call_args[0][0].request_id
@@ -1105,9 +1254,8 @@ class TestAuditResolution:
         )
         await server.resolve_approval(approval_result)
 
-        await asyncio.sleep(0.2)
+        await _until(lambda: not server._pending)
         ws.closed = True
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
         db.update_audit_resolution.assert_called_once()
@@ -1132,7 +1280,7 @@ class TestAuditResolution:
         ws.enqueue(_tool_request_msg(msg_id="audit-3"))
 
         task = asyncio.create_task(server.handle_connection(ws))
-        await asyncio.sleep(0.2)
+        await _until(lambda: _prompted(server))
 
         # Get server-generated request_id
         request_id = messenger.send_approval.call_args[0][0].request_id
@@ -1145,9 +1293,8 @@ class TestAuditResolution:
         )
         await server.resolve_approval(approval_result)
 
-        await asyncio.sleep(0.2)
+        await _until(lambda: not server._pending)
         ws.closed = True
-        await asyncio.sleep(0.1)
         await _cancel_task(task)
 
         db.update_audit_resolution.assert_called_once()
@@ -1,7 +1,6 @@
 """Tests for agentpass.messenger.telegram — TelegramAdapter."""
 
 import asyncio
-import contextlib
 import logging
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -36,26 +35,26 @@ def mock_app():
 
 
 @pytest.fixture
-def adapter(mock_app, telegram_config, tmp_path):
+def adapter(mock_app, telegram_config):
     """Build a TelegramAdapter with a fully mocked PTB Application."""
-    with (
-        patch("agentpass.messenger.telegram.Application") as mock_app_cls,
-        patch("agentpass.messenger.telegram.PicklePersistence"),
-    ):
+    with patch("agentpass.messenger.telegram.Application") as mock_app_cls:
         mock_builder = MagicMock()
         mock_app_cls.builder.return_value = mock_builder
         mock_builder.token.return_value = mock_builder
-        mock_builder.persistence.return_value = mock_builder
-        mock_builder.arbitrary_callback_data.return_value = mock_builder
         mock_builder.build.return_value = mock_app
 
         from agentpass.messenger.telegram import TelegramAdapter
 
-        adp = TelegramAdapter(telegram_config, persistence_path=str(tmp_path / "cb.pickle"))
+        adp = TelegramAdapter(telegram_config)
 
     return adp
 
 
+def _callback_data(adapter, request_id: str, action: str) -> str:
+    """Register *request_id* with the adapter and return a button's callback data."""
+    return f"{adapter._cb_prefix}:{adapter._callback_id(request_id)}:{action}"
+
+
 @pytest.fixture
 def approval_request():
     return ApprovalRequest(
@@ -103,6 +102,44 @@ class TestSendApproval:
         assert msg_id == "42"
         assert isinstance(msg_id, str)
 
+    async def test_buttons_carry_compact_callback_data(
+        self, adapter, mock_app, approval_request, choices
+    ):
+        """Buttons encode a short "<prefix>:<id>:<action>" string mapped to the request."""
+        await adapter.send_approval(approval_request, choices)
+
+        markup = mock_app.bot.send_message.call_args.kwargs["reply_markup"]
+        data = [button.callback_data for button in markup.inline_keyboard[0]]
+        prefix, cid, _ = data[0].split(":")
+        assert prefix == adapter._cb_prefix
+        assert data == [f"{prefix}:{cid}:allow", f"{prefix}:{cid}:deny"]
+        assert adapter._cb_map[int(cid)] == "req-1"
+        assert all(len(d.encode()) <= 64 for d in data)
+
+    async def test_callback_map_is_bounded(self, adapter):
+        with patch("agentpass.messenger.telegram.CALLBACK_MAP_SIZE", 2):
+            first = adapter._callback_id("req-a")
+            adapter._callback_id("req-b")
+            adapter._callback_id("req-c")
+        assert first not in adapter._cb_map
+        assert list(adapter._cb_map.values()) == ["req-b", "req-c"]
+
+    async def test_resolved_state_is_bounded(self, adapter):
+        """Tapped and timed-out approvals drop their state; only recent resolutions are kept."""
+        await adapter.on_approval_callback(AsyncMock())
+        with patch("agentpass.messenger.telegram.CALLBACK_MAP_SIZE", 2):
+            for i in range(3):
+                adapter.schedule_timeout(f"req-tap{i}", 10, str(i))
+                update = TestHandleCallback()._make_update(
+                    adapter, 111, "alice", f"req-tap{i}", "allow"
+                )
+                await adapter._handle_callback(update, MagicMock())
+            adapter.schedule_timeout("req-timeout", 0, "9")
+            await asyncio.sleep(0.05)
+        assert adapter._approvals == {}
+        assert list(adapter._resolved) == ["req-tap2", "req-timeout"]
+        await adapter.stop()
+
 
 # ---------------------------------------------------------------------------
 # Test: update_approval
@@ -153,14 +190,16 @@ class TestOnApprovalCallback:
 
 
 class TestHandleCallback:
-    def _make_update(self, user_id: int, username: str | None, request_id: str, action: str):
+    def _make_update(
+        self, adapter, user_id: int, username: str | None, request_id: str, action: str
+    ):
         """Create a mock Update with a callback_query for testing."""
         update = MagicMock()
         query = AsyncMock()
         query.from_user = MagicMock()
         query.from_user.id = user_id
         query.from_user.username = username
-        query.data = {"request_id": request_id, "action": action}
+        query.data = _callback_data(adapter, request_id, action)
         query.message = MagicMock()
         query.message.message_id = 99
         query.message.text = (
@@ -179,7 +218,7 @@ class TestHandleCallback:
 
         await adapter.on_approval_callback(cb)
 
-        update = self._make_update(111, "alice", "req-1", "allow")
+        update = self._make_update(adapter, 111, "alice", "req-1", "allow")
         context = MagicMock()
 
         await adapter._handle_callback(update, context)
@@ -199,7 +238,7 @@ class TestHandleCallback:
 
         await adapter.on_approval_callback(cb)
 
-        update = self._make_update(999, "hacker", "req-1", "allow")
+        update = self._make_update(adapter, 999, "hacker", "req-1", "allow")
         context = MagicMock()
 
         await adapter._handle_callback(update, context)
@@ -207,27 +246,37 @@ class TestHandleCallback:
         assert len(results) == 0
         update.callback_query.answer.assert_not_awaited()
 
-    async def test_cancels_timeout_task(self, adapter):
-        """_handle_callback cancels the timeout task for the resolved request_id."""
+    async def test_marks_pending_timeout_resolved(self, adapter):
+        """_handle_callback marks the request resolved so its timeout won't fire."""
         await adapter.on_approval_callback(AsyncMock())
 
-        mock_task = MagicMock()
-        mock_task.cancel = MagicMock()
-        adapter._pending["req-1"] = mock_task
+        adapter.schedule_timeout("req-1", 10, "99")
 
-        update = self._make_update(111, "alice", "req-1", "allow")
+        update = self._make_update(adapter, 111, "alice", "req-1", "allow")
         context = MagicMock()
 
         await adapter._handle_callback(update, context)
 
-        mock_task.cancel.assert_called_once()
-        assert "req-1" not in adapter._pending
+        assert "req-1" not in adapter._approvals
+        assert "req-1" in adapter._resolved
+        await adapter.stop()
+
+    async def test_tap_before_timeout_is_scheduled(self, adapter):
+        """A timeout scheduled after the guardian already tapped is not armed."""
+        await adapter.on_approval_callback(AsyncMock())
+        update = self._make_update(adapter, 111, "alice", "req-early", "allow")
+        await adapter._handle_callback(update, MagicMock())
+
+        adapter.schedule_timeout("req-early", 10, "99")
+
+        assert "req-early" not in adapter._approvals
+        assert adapter._timer is None
 
     async def test_edits_message_after_allow(self, adapter, mock_app):
         """FR5-AC5: edits message to compact 'Approved' with tool name."""
         await adapter.on_approval_callback(AsyncMock())
 
-        update = self._make_update(111, "alice", "req-2", "allow")
+        update = self._make_update(adapter, 111, "alice", "req-2", "allow")
         context = MagicMock()
 
         await adapter._handle_callback(update, context)
@@ -241,7 +290,7 @@ class TestHandleCallback:
         """FR5-AC5: edits message to compact 'Denied' with tool name."""
         await adapter.on_approval_callback(AsyncMock())
 
-        update = self._make_update(222, "bob", "req-3", "deny")
+        update = self._make_update(adapter, 222, "bob", "req-3", "deny")
         context = MagicMock()
 
         await adapter._handle_callback(update, context)
@@ -251,11 +300,23 @@ class TestHandleCallback:
         assert "Denied" in call_kwargs["text"]
         assert "ha_call_service" in call_kwargs["text"]
 
+    async def test_resolved_message_replaces_only_header(self, adapter, mock_app):
+        """Every detail line below the header survives the edit unchanged."""
+        await adapter.on_approval_callback(AsyncMock())
+
+        update = self._make_update(adapter, 111, "alice", "req-5", "deny")
+        update.callback_query.message.text = "\U0001f6a8 tool\nsig(a)\n  extra: 1\n"
+
+        await adapter._handle_callback(update, MagicMock())
+
+        call_kwargs = mock_app.bot.edit_message_text.call_args.kwargs
+        assert call_kwargs["text"] == "\u274c Denied\nsig(a)\n  extra: 1"
+
     async def test_resolved_message_includes_tool_name(self, adapter, mock_app):
         """Resolved message includes the tool name from the original message."""
         await adapter.on_approval_callback(AsyncMock())
 
-        update = self._make_update(111, None, "req-4", "allow")
+        update = self._make_update(adapter, 111, None, "req-4", "allow")
         context = MagicMock()
 
         await adapter._handle_callback(update, context)
@@ -263,11 +324,32 @@ class TestHandleCallback:
         call_kwargs = mock_app.bot.edit_message_text.call_args.kwargs
         assert "ha_call_service" in call_kwargs["text"]
 
+    async def test_callback_runs_alongside_message_edit(self, adapter, mock_app):
+        """The resolution callback doesn't wait for the best-effort message edit."""
+        called = asyncio.Event()
+
+        async def cb(result: ApprovalResult) -> None:
+            called.set()
+
+        async def slow_edit(**kwargs):
+            # Would time out if the edit had to finish before the callback ran
+            async with asyncio.timeout(1):
+                await called.wait()
+
+        mock_app.bot.edit_message_text.side_effect = slow_edit
+        await adapter.on_approval_callback(cb)
+
+        update = self._make_update(adapter, 111, "alice", "req-6", "allow")
+        await adapter._handle_callback(update, MagicMock())
+
+        assert called.is_set()
+        mock_app.bot.edit_message_text.assert_awaited_once()
+
     async def test_answers_callback_query(self, adapter):
         """Handler calls query.answer() for allowed users."""
         await adapter.on_approval_callback(AsyncMock())
 
-        update = self._make_update(111, "alice", "req-5", "allow")
+        update = self._make_update(adapter, 111, "alice", "req-5", "allow")
         context = MagicMock()
 
         await adapter._handle_callback(update, context)
@@ -280,17 +362,33 @@ class TestHandleCallback:
 # ---------------------------------------------------------------------------
 
 
-class TestHandleInvalidCallback:
-    async def test_answers_with_expired_message(self, adapter):
-        """FR5-AC4: InvalidCallbackData answers with 'expired' message."""
+class TestHandleExpiredCallback:
+    @pytest.mark.parametrize(
+        "data",
+        [
+            "deadbeef:0:allow",
+            "{prefix}:12345:allow",
+            "{prefix}:\u00b2:allow",  # superscript two: isdigit() but not int()-able
+            "{prefix}:\u0660:allow",  # Arabic-Indic zero: int() would read it as id 0
+        ],
+    )
+    async def test_answers_with_expired_message(self, adapter, data):
+        """FR5-AC4: buttons from before a restart (or evicted, or forged) answer 'expired'."""
+        callback = AsyncMock()
+        await adapter.on_approval_callback(callback)
+        assert adapter._callback_id("req-live") == 0  # id 0 is live, but only in ASCII
         update = MagicMock()
         query = AsyncMock()
+        query.from_user = MagicMock()
+        query.from_user.id = 111
+        query.data = data.format(prefix=adapter._cb_prefix)
         query.answer = AsyncMock()
         update.callback_query = query
 
-        await adapter._handle_invalid_callback(update, MagicMock())
+        await adapter._handle_callback(update, MagicMock())
 
         query.answer.assert_awaited_once_with("This button has expired")
+        callback.assert_not_awaited()
 
 
 # ---------------------------------------------------------------------------
@@ -350,22 +448,49 @@ class TestTimeout:
         assert len(results) == 1
         assert results[0].action == "deny"
 
-    async def test_schedule_timeout_creates_tracked_task(self, adapter):
-        """schedule_timeout creates a task tracked in _pending."""
+    async def test_schedule_timeout_uses_single_timer(self, adapter):
+        """Timeouts share one timer armed for the earliest deadline, with no tasks."""
+        tasks_before = len(asyncio.all_tasks())
         adapter.schedule_timeout("req-t4", 10, "53")
+        first = adapter._timer
+        adapter.schedule_timeout("req-t5", 5, "54")
+
+        assert {k: a.message_id for k, a in adapter._approvals.items()} == {
+            "req-t4": "53",
+            "req-t5": "54",
+        }
+        assert isinstance(adapter._timer, asyncio.TimerHandle)
+        assert first.cancelled()  # re-armed for the earlier deadline
+        assert adapter._timer.when() == adapter._approvals["req-t5"].deadline
+        assert adapter._deadlines[0][1] == "req-t5"
+        assert len(asyncio.all_tasks()) == tasks_before
+
+        # A later deadline leaves the armed timer alone
+        timer = adapter._timer
+        adapter.schedule_timeout("req-t6", 20, "55")
+        assert adapter._timer is timer
+
+        await adapter.stop()
+        assert timer.cancelled()
+
+    async def test_timeouts_fire_in_deadline_order(self, adapter, mock_app):
+        """A shorter timeout scheduled later still fires first."""
+        results = []
 
-        assert "req-t4" in adapter._pending
-        task = adapter._pending["req-t4"]
-        assert isinstance(task, asyncio.Task)
+        async def cb(result: ApprovalResult) -> None:
+            results.append(result.request_id)
+
+        await adapter.on_approval_callback(cb)
 
-        # Cleanup
-        task.cancel()
-        with contextlib.suppress(asyncio.CancelledError):
-            await task
+        adapter.schedule_timeout("req-late", 0.05, "55")
+        adapter.schedule_timeout("req-early", 0, "56")
+        await asyncio.sleep(0.1)
+
+        assert results == ["req-early", "req-late"]
 
 
 # ---------------------------------------------------------------------------
-# Test: Race-safe resolution (asyncio.Lock)
+# Test: Race-safe resolution (check-and-set in _settle)
 # ---------------------------------------------------------------------------
 
 
@@ -389,7 +514,7 @@ class TestRaceSafeResolution:
         query.from_user = MagicMock()
         query.from_user.id = 111
         query.from_user.username = "alice"
-        query.data = {"request_id": "req-race1", "action": "allow"}
+        query.data = _callback_data(adapter, "req-race1", "allow")
         query.message = MagicMock()
         query.message.message_id = 60
         query.answer = AsyncMock()
@@ -422,9 +547,10 @@ class TestRaceSafeResolution:
         query.from_user = MagicMock()
         query.from_user.id = 111
         query.from_user.username = "alice"
-        query.data = {"request_id": "req-race2", "action": "allow"}
+        query.data = _callback_data(adapter, "req-race2", "allow")
         query.message = MagicMock()
         query.message.message_id = 61
+        query.message.text = "\U0001f6a8 ha_call_service"
         query.answer = AsyncMock()
         update.callback_query = query
 
@@ -435,8 +561,55 @@ class TestRaceSafeResolution:
         assert results[0].action == "allow"
         assert results[0].user_id == "111"
 
-        # The timeout task should have been cancelled
-        assert "req-race2" not in adapter._pending
+        # The pending timeout should have been dropped
+        assert "req-race2" not in adapter._approvals
+        await adapter.stop()
+
+
+# ---------------------------------------------------------------------------
+# Test: edit_on_resolve disabled
+# ---------------------------------------------------------------------------
+
+
+class TestNoEditOnResolve:
+    @pytest.fixture
+    def telegram_config(self):
+        return TelegramConfig(
+            token="test-token", chat_id=12345, allowed_users=[111, 222], edit_on_resolve=False
+        )
+
+    async def test_callback_answers_with_toast_instead_of_editing(self, adapter, mock_app):
+        """A tap is acknowledged in the toast only; the message is not edited."""
+        callback = AsyncMock()
+        await adapter.on_approval_callback(callback)
+
+        update = TestHandleCallback()._make_update(adapter, 111, "alice", "req-n1", "deny")
+        await adapter._handle_callback(update, MagicMock())
+
+        update.callback_query.answer.assert_awaited_once_with("\u274c Denied")
+        mock_app.bot.edit_message_text.assert_not_awaited()
+        callback.assert_awaited_once()
+        assert callback.call_args.args[0].action == "deny"
+
+    async def test_timeout_skips_message_edit(self, adapter, mock_app):
+        """A timeout still resolves as deny but makes no Telegram call."""
+        callback = AsyncMock()
+        await adapter.on_approval_callback(callback)
+
+        adapter.schedule_timeout("req-n2", 0, "80")
+        await asyncio.sleep(0.05)
+
+        callback.assert_awaited_once()
+        assert callback.call_args.args[0].user_id == "timeout"
+        mock_app.bot.edit_message_text.assert_not_awaited()
+
+    async def test_stop_leaves_open_messages_unedited(self, adapter, mock_app):
+        """Shutdown makes no edit calls either."""
+        adapter.schedule_timeout("req-n3", 10, "81")
+
+        await adapter.stop()
+
+        mock_app.bot.edit_message_text.assert_not_awaited()
 
 
 # ---------------------------------------------------------------------------
@@ -445,21 +618,43 @@ class TestRaceSafeResolution:
 
 
 class TestStop:
-    async def test_cancels_all_pending_timeout_tasks(self, adapter):
-        """stop() cancels all pending timeout tasks and clears _pending."""
-        task1 = MagicMock()
-        task1.cancel = MagicMock()
-        task2 = MagicMock()
-        task2.cancel = MagicMock()
+    async def test_cancels_timer_and_clears_pending(self, adapter):
+        """stop() cancels the timeout timer and clears pending timeouts."""
+        adapter.schedule_timeout("req-s1", 10, "70")
+        adapter.schedule_timeout("req-s2", 10, "71")
+        timer = adapter._timer
 
-        adapter._pending["req-s1"] = task1
-        adapter._pending["req-s2"] = task2
+        await adapter.stop()
+
+        assert timer.cancelled()
+        assert adapter._timer is None
+        assert len(adapter._approvals) == 0
+        assert adapter._deadlines == []
+
+    async def test_expires_open_messages_concurrently(self, adapter, mock_app):
+        """stop() marks every unresolved prompt expired, with the edits in flight together."""
+        in_flight = 0
+        peak = 0
 
+        async def edit(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        mock_app.bot.edit_message_text = AsyncMock(side_effect=edit)
+        await adapter.on_approval_callback(AsyncMock())
+        adapter.schedule_timeout("req-s3", 10, "72")
+        adapter.schedule_timeout("req-s4", 10, "73")
+        adapter._settle("req-s4")  # already answered
+        adapter.schedule_timeout("req-s5", 10, "74")
         await adapter.stop()
 
-        task1.cancel.assert_called_once()
-        task2.cancel.assert_called_once()
-        assert len(adapter._pending) == 0
+        edited = {c.kwargs["message_id"] for c in mock_app.bot.edit_message_text.call_args_list}
+        assert edited == {72, 74}
+        assert peak == 2
+        assert "Expired" in mock_app.bot.edit_message_text.call_args.kwargs["text"]
 
 
 # ---------------------------------------------------------------------------
@@ -474,68 +669,23 @@ class TestApplicationProperty:
 
 
 # ---------------------------------------------------------------------------
-# Test: Major 4 — handler registration order + guard
+# Test: Major 4 — callback data guard
 # ---------------------------------------------------------------------------
 
 
-class TestHandlerRegistrationOrder:
-    def test_invalid_callback_handler_registered_before_valid(
-        self, mock_app, telegram_config, tmp_path
-    ):
-        """Major 4: InvalidCallbackData handler registered before valid."""
-        from telegram.ext import InvalidCallbackData
-
-        with (
-            patch("agentpass.messenger.telegram.Application") as mock_app_cls,
-            patch("agentpass.messenger.telegram.PicklePersistence"),
-        ):
-            mock_builder = MagicMock()
-            mock_app_cls.builder.return_value = mock_builder
-            mock_builder.token.return_value = mock_builder
-            mock_builder.persistence.return_value = mock_builder
-            mock_builder.arbitrary_callback_data.return_value = mock_builder
-            mock_builder.build.return_value = mock_app
-
-            from agentpass.messenger.telegram import TelegramAdapter
-
-            TelegramAdapter(
-                telegram_config,
-                persistence_path=str(tmp_path / "cb.pickle"),
-            )
-
-        # Check add_handler was called at least twice
-        calls = mock_app.add_handler.call_args_list
-        assert len(calls) >= 2
-
-        # Find the InvalidCallbackData handler call
-        invalid_idx = None
-        valid_idx = None
-        for i, call in enumerate(calls):
-            handler = call[0][0]
-            has_pattern = hasattr(handler, "pattern")
-            if has_pattern and handler.pattern is InvalidCallbackData:
-                invalid_idx = i
-            elif not has_pattern or handler.pattern is None:
-                valid_idx = i
-            else:
-                valid_idx = i
-
-        assert invalid_idx is not None, "InvalidCallbackData not registered"
-        assert valid_idx is not None, "Valid callback handler not registered"
-        assert invalid_idx < valid_idx, "InvalidCallbackData handler must be registered first"
-
-
 class TestCallbackDataGuard:
-    async def test_non_dict_data_does_not_crash(self, adapter):
-        """Major 4: _handle_callback guards against non-dict data (e.g. InvalidCallbackData)."""
-        await adapter.on_approval_callback(AsyncMock())
+    @pytest.mark.parametrize("data", ["not_callback_data", "a:b:c:d", "", None])
+    async def test_malformed_data_does_not_crash(self, adapter, data):
+        """Major 4: _handle_callback guards against malformed callback data."""
+        callback = AsyncMock()
+        await adapter.on_approval_callback(callback)
 
         update = MagicMock()
         query = AsyncMock()
         query.from_user = MagicMock()
         query.from_user.id = 111
         query.from_user.username = "alice"
-        query.data = "not_a_dict"  # Simulate non-dict callback data
+        query.data = data  # Simulate malformed callback data
         query.message = MagicMock()
         query.message.message_id = 99
         query.answer = AsyncMock()
@@ -546,3 +696,4 @@ class TestCallbackDataGuard:
 
         # Should answer with "Invalid callback data"
         query.answer.assert_awaited_once_with("Invalid callback data")
+        callback.assert_not_awaited()
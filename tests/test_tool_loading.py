@@ -234,6 +234,34 @@ class TestLoadToolsFileEdgeCases:
         assert tools[0].name == "simple_tool"
         assert tools[0].description == "A tool with no request"
 
+    def test_response_filter_parsed(self, tmp_path):
+        yaml_text = textwrap.dedent("""\
+            tools:
+              list_tool:
+                response:
+                  filter:
+                    field: id
+                    prefix: "{kind}."
+        """)
+        p = tmp_path / "tools.yaml"
+        p.write_text(yaml_text)
+        resp = load_tools_file(str(p), "test")[0].response
+        assert resp.filter.field == "id"
+        assert resp.filter.prefix == "{kind}."
+
+    def test_response_filter_missing_field_raises(self, tmp_path):
+        yaml_text = textwrap.dedent("""\
+            tools:
+              list_tool:
+                response:
+                  filter:
+                    prefix: "{kind}."
+        """)
+        p = tmp_path / "tools.yaml"
+        p.write_text(yaml_text)
+        with pytest.raises(ConfigError, match=r"response\.filter\.field"):
+            load_tools_file(str(p), "test")
+
     def test_tool_with_description_only(self, tmp_path):
         """Minimal tool definition with just a description."""
         yaml_text = textwrap.dedent("""\